@@ -3,24 +3,204 @@ API REST para Sistema de Controle de Gado de Corte
 FastAPI + PostgreSQL
 """
 
-from fastapi import FastAPI, Body, HTTPException, Depends, status, Header
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Body, HTTPException, Depends, status, Header, Query
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel, Field
+from starlette.datastructures import Headers, MutableHeaders
+from pydantic import BaseModel, Field, ValidationError
 from typing import Optional, List
 from datetime import datetime, timedelta, date
+from decimal import Decimal
+import anyio
 import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg2.extensions
+from psycopg2.extras import RealDictCursor, execute_values
+from array import array
+from collections import OrderedDict, deque
+import bisect
+import concurrent.futures
+import contextvars
+import csv
+import io
 import secrets
+import tempfile
 import hashlib
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import numpy as np
+import orjson
 import os
+import re
+import select
+import threading
+import time
+import zlib
 from dotenv import load_dotenv
 
+from estado_reprodutivo import recalcular_estado_reprodutivo
+from relatorios_pdf import RE_JOB_ID, agora_iso, gravar_job, ler_job, renderizar_relatorio_pdf
+
+try:
+    import brotli
+except ImportError:  # sem o pacote, a compressão fica só em gzip
+    brotli = None
+
 load_dotenv()
 
+# ==================== RESPOSTAS (JSON E COMPRESSÃO) ====================
+
+def _orjson_default(obj):
+    """Tipos que o orjson não serializa sozinho, com a mesma saída do jsonable_encoder"""
+    if isinstance(obj, Decimal):
+        return int(obj) if obj.as_tuple().exponent >= 0 else float(obj)
+    if isinstance(obj, timedelta):
+        return obj.total_seconds()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Tipo não serializável em JSON: {type(obj).__name__}")
+
+class RespostaJSON(JSONResponse):
+    """
+    JSONResponse serializada com orjson.
+
+    Linhas do RealDictCursor (subclasse de dict), date/datetime e Decimal
+    vão direto para o orjson. Endpoints que devolvem RespostaJSON pulam
+    também o jsonable_encoder do FastAPI e as cópias dict(linha).
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS)
+
+def _resposta_json(conteudo, response: Optional[Response] = None) -> RespostaJSON:
+    """RespostaJSON com os cabeçalhos (ETag etc.) já definidos em `response`"""
+    cabecalhos = None
+    if response is not None:
+        cabecalhos = {k: v for k, v in response.headers.items() if k != 'content-length'}
+    return RespostaJSON(conteudo, headers=cabecalhos)
+
+# Tipos que já chegam comprimidos
+TIPOS_SEM_COMPRESSAO = (
+    'image/', 'application/pdf', 'application/zip', 'application/gzip',
+    'application/vnd.openxmlformats', 'text/event-stream'
+)
+
+def _codificacoes_aceitas(accept_encoding: str) -> set:
+    """Codificações do Accept-Encoding com q > 0"""
+    aceitas = set()
+    for parte in accept_encoding.split(','):
+        nome, _, params = parte.strip().partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            chave, _, valor = param.strip().partition('=')
+            if chave == 'q':
+                try:
+                    q = float(valor)
+                except ValueError:
+                    q = 0.0
+        if nome and q > 0:
+            aceitas.add(nome.strip().lower())
+    return aceitas
+
+class CompressaoMiddleware:
+    """
+    Comprime respostas com brotli ou gzip a partir de `minimo` bytes.
+
+    br quando o cliente aceita e o pacote brotli está instalado; senão gzip.
+    Respostas em streaming são comprimidas pedaço a pedaço. Ao comprimir, o
+    ETag vira fraco (W/), como faz o nginx: o If-None-Match continua batendo.
+    """
+
+    def __init__(self, app, minimo: int = 1000, nivel_gzip: int = 6, qualidade_br: int = 4):
+        self.app = app
+        self.minimo = minimo
+        self.nivel_gzip = nivel_gzip
+        self.qualidade_br = qualidade_br
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or self.minimo < 0:
+            await self.app(scope, receive, send)
+            return
+
+        aceitas = set()
+        for nome, valor in scope['headers']:
+            if nome == b'accept-encoding':
+                aceitas |= _codificacoes_aceitas(valor.decode('latin-1'))
+        if brotli is not None and 'br' in aceitas:
+            codificacao = 'br'
+        elif 'gzip' in aceitas:
+            codificacao = 'gzip'
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        inicio = None
+        compressor = None
+        direto = False
+
+        def comprimir(dados: bytes, fim: bool) -> bytes:
+            if codificacao == 'br':
+                return compressor.process(dados) + (compressor.finish() if fim else b'')
+            return compressor.compress(dados) + (compressor.flush() if fim else b'')
+
+        async def send_comprimido(message):
+            nonlocal inicio, compressor, direto
+            if message['type'] == 'http.response.start':
+                inicio = message
+                return
+            if message['type'] != 'http.response.body' or direto:
+                await send(message)
+                return
+
+            corpo = message.get('body', b'')
+            mais = message.get('more_body', False)
+
+            if compressor is None:
+                cabecalhos = Headers(raw=inicio['headers'])
+                tipo = cabecalhos.get('content-type', '')
+                if ('content-encoding' in cabecalhos or inicio['status'] in (204, 304)
+                        or tipo.startswith(TIPOS_SEM_COMPRESSAO)
+                        or (not mais and len(corpo) < self.minimo)):
+                    direto = True
+                    await send(inicio)
+                    await send(message)
+                    return
+
+                if codificacao == 'br':
+                    compressor = brotli.Compressor(quality=self.qualidade_br)
+                else:
+                    compressor = zlib.compressobj(self.nivel_gzip, zlib.DEFLATED, 31)
+
+                novos = MutableHeaders(raw=inicio['headers'])
+                novos['Content-Encoding'] = codificacao
+                novos.add_vary_header('Accept-Encoding')
+                etag = novos.get('etag')
+                if etag and not etag.startswith('W/'):
+                    novos['ETag'] = 'W/' + etag
+                if 'content-length' in novos:
+                    del novos['content-length']
+                if not mais:
+                    corpo = comprimir(corpo, True)
+                    novos['Content-Length'] = str(len(corpo))
+                    await send(inicio)
+                    await send({'type': 'http.response.body', 'body': corpo})
+                    return
+                await send(inicio)
+
+            dados = comprimir(corpo, not mais)
+            if dados or not mais:
+                await send({'type': 'http.response.body', 'body': dados, 'more_body': mais})
+
+        await self.app(scope, receive, send_comprimido)
+
 # Configuração do FastAPI com customização
 app = FastAPI(
+    default_response_class=RespostaJSON,
     title="🐮 Controle de Gado API",
     description="""## Sistema de Gestão de Rebanho Bovino - Gado de Corte
 
@@ -79,6 +259,7 @@ API REST completa para controle de gado de corte com funcionalidades avançadas.
         {"name": "📦 Movimentações", "description": "Transferências entre pastos/lotes"},
         {"name": "📍 Lotes e Pastos", "description": "Consulta de localizações"},
         {"name": "📊 Relatórios", "description": "Análises e estatísticas"},
+        {"name": "🔄 Sincronização", "description": "Réplica local do app offline"},
         {"name": "⚙️ Sistema", "description": "Health check e informações"}
     ],
     swagger_ui_parameters={
@@ -168,6 +349,68 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD', 'postgres')
 }
 
+# Configurações do pool de conexões (tempos em segundos)
+DB_POOL_CONFIG = {
+    'min_size': int(os.getenv('DB_POOL_MIN', '2')),
+    'max_size': int(os.getenv('DB_POOL_MAX', '20')),
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+    'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', '300')),
+    'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', '3600')),
+    'health_check_after': float(os.getenv('DB_POOL_HEALTH_CHECK', '30'))
+}
+
+# Máximo de linhas aceitas por POST /api/pesagens/lote
+PESAGEM_LOTE_MAX = int(os.getenv('PESAGEM_LOTE_MAX', '2000'))
+
+# Resumo do rebanho materializado: recalcula no máximo uma vez por
+# janela de debounce após escritas em animais, e no mínimo a cada TTL
+RESUMO_REBANHO_DEBOUNCE = float(os.getenv('RESUMO_REBANHO_DEBOUNCE', '15'))
+RESUMO_REBANHO_TTL = float(os.getenv('RESUMO_REBANHO_TTL', '300'))
+
+# Cache de sessões do verify_token (TTL em segundos)
+SESSION_CACHE_TTL = float(os.getenv('SESSION_CACHE_TTL', '60'))
+SESSION_CACHE_MAX = int(os.getenv('SESSION_CACHE_MAX', '1000'))
+
+# Log de queries lentas: limite em ms (negativo desativa), arquivo rotativo
+# e captura opcional do plano (EXPLAIN ANALYZE só em leituras), no máximo
+# uma vez por SQL normalizado a cada SLOW_QUERY_EXPLAIN_INTERVALO segundos
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '200'))
+SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG', 'logs/slow_queries.log')
+SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv('SLOW_QUERY_LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUPS = int(os.getenv('SLOW_QUERY_LOG_BACKUPS', '5'))
+SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'false').lower() in ('1', 'true', 'sim')
+SLOW_QUERY_EXPLAIN_INTERVALO = float(os.getenv('SLOW_QUERY_EXPLAIN_INTERVALO', '300'))
+
+# Relatórios PDF gerados em segundo plano (processos separados)
+RELATORIOS_PDF_DIR = os.getenv('RELATORIOS_PDF_DIR', 'relatorios_pdf')
+RELATORIOS_PDF_WORKERS = int(os.getenv('RELATORIOS_PDF_WORKERS', '2'))
+RELATORIOS_PDF_TTL = float(os.getenv('RELATORIOS_PDF_TTL', '3600'))
+RELATORIOS_PDF_TIMEOUT = float(os.getenv('RELATORIOS_PDF_TIMEOUT', '900'))
+RELATORIOS_PDF_MAX_FILA = int(os.getenv('RELATORIOS_PDF_MAX_FILA', '20'))
+
+# Cache das tabelas de cadastro (raças, categorias, lotes, pastos, touros),
+# invalidado por LISTEN/NOTIFY; sem a escuta, as entradas vivem só o TTL curto
+CACHE_CADASTROS_TTL = float(os.getenv('CACHE_CADASTROS_TTL', '600'))
+CACHE_CADASTROS_TTL_SEM_ESCUTA = float(os.getenv('CACHE_CADASTROS_TTL_SEM_ESCUTA', '5'))
+
+# Compressão das respostas: tamanho mínimo em bytes (negativo desativa),
+# nível do gzip e qualidade do brotli (baixos o bastante para respostas dinâmicas)
+COMPRESSAO_MIN_BYTES = int(os.getenv('COMPRESSAO_MIN_BYTES', '1000'))
+COMPRESSAO_NIVEL_GZIP = int(os.getenv('COMPRESSAO_NIVEL_GZIP', '6'))
+COMPRESSAO_QUALIDADE_BR = int(os.getenv('COMPRESSAO_QUALIDADE_BR', '4'))
+
+# Máximo de entradas do sync_log entregues por chamada de GET /api/sync
+SYNC_LIMITE = int(os.getenv('SYNC_LIMITE', '5000'))
+
+# Máximo de mutações aceitas por POST /api/sync/push
+SYNC_PUSH_MAX = int(os.getenv('SYNC_PUSH_MAX', '500'))
+
+# Profundidade máxima de GET /api/genealogia/{animal_id}
+GENEALOGIA_MAX_GERACOES = int(os.getenv('GENEALOGIA_MAX_GERACOES', '10'))
+
+# Threads que executam os endpoints síncronos (psycopg2 bloqueia o event loop)
+API_THREADPOOL_SIZE = int(os.getenv('API_THREADPOOL_SIZE', str(DB_POOL_CONFIG['max_size'])))
+
 # ==================== MODELOS PYDANTIC ====================
 
 class LoginRequest(BaseModel):
@@ -227,6 +470,17 @@ class PesagemCreate(BaseModel):
     condicao_corporal: Optional[int] = Field(None, ge=1, le=5)
     observacoes: Optional[str] = None
 
+class PesagemLoteItem(BaseModel):
+    animal_id: Optional[int] = None
+    brinco: Optional[str] = None
+    peso: float
+    data_pesagem: Optional[str] = None
+    condicao_corporal: Optional[int] = None
+    observacoes: Optional[str] = None
+
+class PesagemLoteCreate(BaseModel):
+    pesagens: List[PesagemLoteItem]
+
 class SanidadeCreate(BaseModel):
     animal_id: int
     tipo: str
@@ -238,6 +492,28 @@ class SanidadeCreate(BaseModel):
     custo: Optional[float] = None
     observacoes: Optional[str] = None
 
+class CampanhaSanitariaCreate(BaseModel):
+    nome: Optional[str] = None
+    tipo: str
+    produto: str
+    dose: Optional[str] = None
+    aplicador: Optional[str] = None
+    data_aplicacao: Optional[str] = None
+    proxima_aplicacao: Optional[str] = None
+    custo: Optional[float] = None  # por animal
+    observacoes: Optional[str] = None
+    # Seleção (os filtros se combinam); todos=True aplica no rebanho ativo inteiro
+    animal_ids: Optional[List[int]] = None
+    lote: Optional[str] = None
+    pasto: Optional[str] = None
+    categoria_id: Optional[int] = None
+    todos: bool = False
+
+class RelatorioPDFCreate(BaseModel):
+    tipo: str = Field("completo", pattern="^(performance|sanidade|reproducao|completo)$")
+    dias: int = Field(30, ge=1, le=365)  # janela do calendário sanitário
+    limite: int = Field(100, ge=1, le=5000)  # animais no ranking de performance
+
 class MovimentacaoCreate(BaseModel):
     animal_id: int
     tipo: str
@@ -247,22 +523,834 @@ class MovimentacaoCreate(BaseModel):
     responsavel: Optional[str] = None
     data_movimentacao: Optional[str] = None
 
+class MovimentacaoLoteCreate(BaseModel):
+    tipo: str = Field(..., pattern="^(troca_pasto|troca_lote)$")
+    destino: str = Field(..., min_length=1)
+    # Seleção: ids explícitos e/ou todos os animais ativos hoje no lote/pasto
+    animal_ids: Optional[List[int]] = None
+    lote: Optional[str] = None
+    pasto: Optional[str] = None
+    motivo: Optional[str] = None
+    responsavel: Optional[str] = None
+    data_movimentacao: Optional[str] = None
+
+class EventoReprodutivoCreate(BaseModel):
+    animal_id: int
+    tipo_evento: str
+    data_evento: date
+    touro_id: Optional[int] = None
+    bezerra_id: Optional[int] = None
+    natimorto: bool = False
+    observacoes: Optional[str] = None
+
+class MutacaoSync(BaseModel):
+    chave: str = Field(..., min_length=1, max_length=100)  # gerada no aparelho (ex.: UUID)
+    tipo: str = Field(..., pattern="^(pesagem|sanidade|movimentacao|evento_reprodutivo)$")
+    dados: dict
+
+class SyncPush(BaseModel):
+    mutacoes: List[MutacaoSync]
+
+# ==================== MÉTRICAS ====================
+
+# Limites dos histogramas (segundos / quantidade de queries)
+BUCKETS_DURACAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_QUERIES = (1, 2, 5, 10, 20, 50, 100, 500)
+
+
+class _Histograma:
+    """Histograma cumulativo no formato do Prometheus"""
+    __slots__ = ('buckets', 'contagens', 'soma', 'total')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.contagens = [0] * len(buckets)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float):
+        i = bisect.bisect_left(self.buckets, valor)
+        if i < len(self.contagens):
+            self.contagens[i] += 1
+        self.soma += valor
+        self.total += 1
+
+    def linhas(self, nome: str, rotulos: str) -> list:
+        sep = ',' if rotulos else ''
+        linhas = []
+        acumulado = 0
+        for limite, contagem in zip(self.buckets, self.contagens):
+            acumulado += contagem
+            linhas.append(f'{nome}_bucket{{{rotulos}{sep}le="{limite}"}} {acumulado}')
+        linhas.append(f'{nome}_bucket{{{rotulos}{sep}le="+Inf"}} {self.total}')
+        rotulos = f'{{{rotulos}}}' if rotulos else ''
+        linhas.append(f'{nome}_sum{rotulos} {self.soma:.6f}')
+        linhas.append(f'{nome}_count{rotulos} {self.total}')
+        return linhas
+
+
+class MedicaoRequisicao:
+    """Tempo de banco e queries acumulados durante uma requisição"""
+    __slots__ = ('db_segundos', 'queries', 'scope')
+
+    def __init__(self, scope=None):
+        self.db_segundos = 0.0
+        self.queries = 0
+        self.scope = scope
+
+
+# Medição da requisição em andamento; o threadpool do Starlette copia o
+# contexto, então os endpoints `def` enxergam o mesmo objeto
+_medicao_atual = contextvars.ContextVar('medicao_requisicao', default=None)
+
+
+class MetricasAPI:
+    """
+    Métricas do worker em memória, expostas em /metrics (texto Prometheus).
+
+    Por rota (template do path, não o path com ids): latência, status,
+    tempo de banco e queries por requisição. Globais: tempo de checkout
+    de conexão e requisições em andamento. Com vários workers, cada um
+    expõe as próprias métricas.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._duracao = {}
+        self._db_duracao = {}
+        self._queries = {}
+        self._status = {}
+        self._conexao = _Histograma(BUCKETS_DURACAO)
+        self._em_andamento = 0
+
+    def iniciar_requisicao(self):
+        with self._lock:
+            self._em_andamento += 1
+
+    def finalizar_requisicao(self, metodo: str, rota: str, status_code: int,
+                             duracao: float, medicao: MedicaoRequisicao):
+        chave = (metodo, rota)
+        with self._lock:
+            self._em_andamento -= 1
+            for serie, valor, buckets in (
+                (self._duracao, duracao, BUCKETS_DURACAO),
+                (self._db_duracao, medicao.db_segundos, BUCKETS_DURACAO),
+                (self._queries, medicao.queries, BUCKETS_QUERIES)
+            ):
+                hist = serie.get(chave)
+                if hist is None:
+                    hist = serie[chave] = _Histograma(buckets)
+                hist.observar(valor)
+            chave_status = (metodo, rota, status_code)
+            self._status[chave_status] = self._status.get(chave_status, 0) + 1
+
+    def registrar_conexao(self, espera: float):
+        with self._lock:
+            self._conexao.observar(espera)
+
+    @staticmethod
+    def _rotulos(metodo: str, rota: str) -> str:
+        rota = rota.replace('\\', '\\\\').replace('"', '\\"')
+        return f'metodo="{metodo}",rota="{rota}"'
+
+    def exportar(self, pool_stats: Optional[dict] = None) -> str:
+        """Renderiza as métricas no formato texto do Prometheus"""
+        linhas = []
+        with self._lock:
+            linhas += [
+                '# HELP gado_http_requisicoes_total Requisições por rota e status',
+                '# TYPE gado_http_requisicoes_total counter'
+            ]
+            for (metodo, rota, status_code), total in sorted(self._status.items()):
+                linhas.append(
+                    f'gado_http_requisicoes_total{{{self._rotulos(metodo, rota)},status="{status_code}"}} {total}'
+                )
+            for nome, ajuda, serie in (
+                ('gado_http_duracao_segundos', 'Latência das requisições por rota', self._duracao),
+                ('gado_db_duracao_segundos', 'Tempo gasto em queries por requisição', self._db_duracao),
+                ('gado_db_queries_por_requisicao', 'Queries executadas por requisição', self._queries)
+            ):
+                linhas += [f'# HELP {nome} {ajuda}', f'# TYPE {nome} histogram']
+                for (metodo, rota), hist in sorted(serie.items()):
+                    linhas += hist.linhas(nome, self._rotulos(metodo, rota))
+            linhas += [
+                '# HELP gado_db_conexao_espera_segundos Tempo para obter conexão do pool',
+                '# TYPE gado_db_conexao_espera_segundos histogram'
+            ]
+            linhas += self._conexao.linhas('gado_db_conexao_espera_segundos', '')
+            linhas += [
+                '# HELP gado_http_em_andamento Requisições em andamento',
+                '# TYPE gado_http_em_andamento gauge',
+                f'gado_http_em_andamento {self._em_andamento}'
+            ]
+
+        if pool_stats:
+            linhas += [
+                '# HELP gado_db_pool_conexoes Conexões do pool por estado',
+                '# TYPE gado_db_pool_conexoes gauge',
+                f'gado_db_pool_conexoes{{estado="em_uso"}} {pool_stats["em_uso"]}',
+                f'gado_db_pool_conexoes{{estado="ociosas"}} {pool_stats["ociosas"]}',
+                '# HELP gado_db_pool_aguardando Requisições esperando conexão livre',
+                '# TYPE gado_db_pool_aguardando gauge',
+                f'gado_db_pool_aguardando {pool_stats["aguardando"]}',
+                '# HELP gado_db_pool_timeouts_total Checkouts que estouraram o timeout',
+                '# TYPE gado_db_pool_timeouts_total counter',
+                f'gado_db_pool_timeouts_total {pool_stats["timeouts"]}'
+            ]
+        return '\n'.join(linhas) + '\n'
+
+
+metricas_api = MetricasAPI()
+
+
+_RE_LITERAL_TEXTO = re.compile(r"'(?:[^']|'')*'")
+_RE_LITERAL_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_ESPACOS = re.compile(r"\s+")
+_RE_ESCRITA_SQL = re.compile(r"\b(?:INSERT|UPDATE|DELETE|MERGE)\b", re.IGNORECASE)
+
+def _normalizar_sql(sql: str) -> str:
+    """SQL em uma linha, com literais trocados por ? (agrupa variações da mesma query)"""
+    sql = _RE_LITERAL_TEXTO.sub('?', sql)
+    sql = _RE_LITERAL_NUMERO.sub('?', sql)
+    return _RE_ESPACOS.sub(' ', sql).strip()
+
+def _formato_parametros(params):
+    """Tipos dos parâmetros, sem os valores (que podem conter dados sensíveis)"""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {k: _formato_parametros(v) for k, v in params.items()}
+    if isinstance(params, (list, tuple)):
+        if len(params) > 20:
+            return f"{type(params).__name__}[{len(params)}]"
+        return [_formato_parametros(v) for v in params]
+    return type(params).__name__
+
+
+class LogQueriesLentas:
+    """
+    Registra em arquivo rotativo (JSON por linha) as queries acima de
+    SLOW_QUERY_MS, com rota, SQL normalizado e formato dos parâmetros.
+
+    Com SLOW_QUERY_EXPLAIN ativo, leituras são reexecutadas com
+    EXPLAIN (ANALYZE, BUFFERS) dentro de um savepoint desfeito em seguida.
+    Escritas (e WITH com escrita) ganham só o EXPLAIN estimado: reexecutar
+    veria o estado depois da própria escrita, dobraria a latência com as
+    travas seguras e dispararia os triggers de novo.
+    """
+
+    def __init__(self, limite_ms: float, arquivo: str, max_bytes: int, backups: int,
+                 explain: bool = False, explain_intervalo: float = 300):
+        self.limite_ms = limite_ms
+        self.arquivo = arquivo
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.explain = explain
+        self.explain_intervalo = explain_intervalo
+        self._lock = threading.Lock()
+        self._ultimo_explain = {}
+        self._logger = None
+
+    @property
+    def ativo(self) -> bool:
+        return self.limite_ms >= 0
+
+    def _obter_logger(self) -> logging.Logger:
+        if self._logger is None:
+            with self._lock:
+                if self._logger is None:
+                    logger = logging.getLogger('controle_gado.queries_lentas')
+                    logger.setLevel(logging.INFO)
+                    logger.propagate = False
+                    if not logger.handlers:
+                        try:
+                            pasta = os.path.dirname(self.arquivo)
+                            if pasta:
+                                os.makedirs(pasta, exist_ok=True)
+                            handler = logging.handlers.RotatingFileHandler(
+                                self.arquivo, maxBytes=self.max_bytes,
+                                backupCount=self.backups, encoding='utf-8'
+                            )
+                        except OSError:
+                            handler = logging.StreamHandler()
+                        handler.setFormatter(logging.Formatter('%(message)s'))
+                        logger.addHandler(handler)
+                    self._logger = logger
+        return self._logger
+
+    def _deve_explicar(self, sql_normalizado: str) -> bool:
+        if not self.explain:
+            return False
+        agora = time.monotonic()
+        with self._lock:
+            ultimo = self._ultimo_explain.get(sql_normalizado)
+            if ultimo is not None and agora - ultimo < self.explain_intervalo:
+                return False
+            self._ultimo_explain[sql_normalizado] = agora
+            if len(self._ultimo_explain) > 1000:
+                self._ultimo_explain.pop(next(iter(self._ultimo_explain)))
+        return True
+
+    @staticmethod
+    def _capturar_plano(cur, sql: str, params) -> str:
+        """Plano da query em um savepoint desfeito logo depois (ANALYZE só em leituras)"""
+        conn = cur.connection
+        if cur.name is not None or conn.autocommit:
+            return None
+        comando = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ''
+        if comando not in ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE'):
+            return None
+        # SELECT ... FOR UPDATE também trava linhas: fica sem ANALYZE
+        escrita = _RE_ESCRITA_SQL.search(_RE_LITERAL_TEXTO.sub("''", sql)) is not None
+        explain = "EXPLAIN " if escrita else "EXPLAIN (ANALYZE, BUFFERS) "
+        explain_cur = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+        try:
+            explain_cur.execute("SAVEPOINT queries_lentas_explain")
+            try:
+                explain_cur.execute(explain + sql, params)
+                return '\n'.join(linha[0] for linha in explain_cur.fetchall())
+            except psycopg2.Error as e:
+                return f"falha no EXPLAIN: {str(e).strip()}"
+            finally:
+                explain_cur.execute("ROLLBACK TO SAVEPOINT queries_lentas_explain")
+                explain_cur.execute("RELEASE SAVEPOINT queries_lentas_explain")
+        finally:
+            explain_cur.close()
+
+    def registrar(self, cur, query, params, duracao_ms: float, execucoes: int = 1,
+                  sucesso: bool = True):
+        sql = query.as_string(cur) if hasattr(query, 'as_string') else query
+        if isinstance(sql, bytes):
+            sql = sql.decode('utf-8', 'replace')
+        sql_normalizado = _normalizar_sql(sql)
+
+        medicao = _medicao_atual.get()
+        scope = medicao.scope if medicao is not None else None
+        registro = {
+            'timestamp': datetime.now().isoformat(timespec='milliseconds'),
+            'duracao_ms': round(duracao_ms, 3),
+            'limite_ms': self.limite_ms,
+            'metodo': scope['method'] if scope else None,
+            'rota': _rota_da_requisicao(scope) if scope else None,
+            'sql': sql_normalizado,
+            'parametros': _formato_parametros(params),
+            'execucoes': execucoes,
+            'sucesso': sucesso
+        }
+        # Query com erro deixa a transação abortada: não há como reexecutar
+        if sucesso and execucoes == 1 and self._deve_explicar(sql_normalizado):
+            try:
+                registro['plano'] = self._capturar_plano(cur, sql, params)
+            except psycopg2.Error as e:
+                registro['plano'] = f"falha no EXPLAIN: {str(e).strip()}"
+
+        self._obter_logger().info(json.dumps(registro, ensure_ascii=False, default=str))
+
+
+log_queries_lentas = LogQueriesLentas(
+    SLOW_QUERY_MS, SLOW_QUERY_LOG, SLOW_QUERY_LOG_MAX_BYTES, SLOW_QUERY_LOG_BACKUPS,
+    explain=SLOW_QUERY_EXPLAIN, explain_intervalo=SLOW_QUERY_EXPLAIN_INTERVALO
+)
+
+
+class CursorMedido(RealDictCursor):
+    """
+    Cursor padrão das conexões do pool: soma tempo e número de queries na
+    requisição e envia as queries lentas para log_queries_lentas.
+    """
+
+    def _medir(self, inicio: float, query, params, execucoes: int = 1, sucesso: bool = True):
+        duracao = time.perf_counter() - inicio
+        medicao = _medicao_atual.get()
+        if medicao is not None:
+            medicao.db_segundos += duracao
+            medicao.queries += 1
+        if log_queries_lentas.ativo and duracao * 1000 >= log_queries_lentas.limite_ms:
+            try:
+                log_queries_lentas.registrar(self, query, params, duracao * 1000, execucoes, sucesso)
+            except Exception:
+                pass
+
+    def execute(self, query, vars=None):
+        inicio = time.perf_counter()
+        sucesso = False
+        try:
+            resultado = super().execute(query, vars)
+            sucesso = True
+            return resultado
+        finally:
+            self._medir(inicio, query, vars, sucesso=sucesso)
+
+    def executemany(self, query, vars_list):
+        vars_list = list(vars_list)
+        inicio = time.perf_counter()
+        sucesso = False
+        try:
+            resultado = super().executemany(query, vars_list)
+            sucesso = True
+            return resultado
+        finally:
+            self._medir(inicio, query, vars_list[0] if vars_list else None, len(vars_list), sucesso)
+
+
+_rotas_por_endpoint = {}
+
+def _rota_da_requisicao(scope) -> str:
+    """Template da rota atendida (ex.: /api/animais/{animal_id})"""
+    endpoint = scope.get('endpoint')
+    if endpoint is None:
+        return 'desconhecida'
+    rota = _rotas_por_endpoint.get(endpoint)
+    if rota is None:
+        for r in scope['app'].routes:
+            if getattr(r, 'endpoint', None) is endpoint:
+                rota = r.path
+                break
+        else:
+            rota = scope.get('path', 'desconhecida')
+        _rotas_por_endpoint[endpoint] = rota
+    return rota
+
+
+class MetricasMiddleware:
+    """Middleware ASGI que mede cada requisição HTTP (inclui o corpo de respostas em streaming)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        medicao = MedicaoRequisicao(scope)
+        token = _medicao_atual.set(medicao)
+        status_code = 500
+
+        async def send_medido(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        metricas_api.iniciar_requisicao()
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_medido)
+        finally:
+            duracao = time.perf_counter() - inicio
+            _medicao_atual.reset(token)
+            metricas_api.finalizar_requisicao(
+                scope['method'], _rota_da_requisicao(scope), status_code, duracao, medicao
+            )
+
+
+app.add_middleware(MetricasMiddleware)
+app.add_middleware(
+    CompressaoMiddleware,
+    minimo=COMPRESSAO_MIN_BYTES,
+    nivel_gzip=COMPRESSAO_NIVEL_GZIP,
+    qualidade_br=COMPRESSAO_QUALIDADE_BR
+)
+
 # ==================== FUNÇÕES DE BANCO DE DADOS ====================
 
+class PoolEsgotado(Exception):
+    """Nenhuma conexão livre dentro do tempo limite de checkout"""
+
+
+class _SlotConexao:
+    """Conexão física do pool com seus tempos de criação e último uso"""
+    __slots__ = ('conn', 'criada_em', 'usada_em')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.criada_em = time.monotonic()
+        self.usada_em = self.criada_em
+
+
+class PoolConexoes:
+    """
+    Pool de conexões PostgreSQL compartilhado por todos os endpoints.
+
+    - min_size/max_size: conexões mantidas abertas / limite total
+    - timeout: tempo máximo de espera por uma conexão livre
+    - max_idle: conexões ociosas além de min_size são fechadas após esse tempo
+    - max_lifetime: conexões são recicladas após esse tempo de vida
+    - health_check_after: conexões ociosas há mais tempo que isso passam
+      por um SELECT 1 antes de serem entregues
+    """
+
+    def __init__(self, db_config: dict, min_size: int = 2, max_size: int = 20,
+                 timeout: float = 10, max_idle: float = 300,
+                 max_lifetime: float = 3600, health_check_after: float = 30):
+        self.db_config = db_config
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.health_check_after = health_check_after
+
+        self._cond = threading.Condition()
+        self._ociosas = deque()
+        self._total = 0
+        self._em_uso = 0
+        self._aguardando = 0
+        self._fechado = False
+        self._parar_reciclagem = threading.Event()
+        self._stats = {
+            'checkouts': 0,
+            'esperas': 0,
+            'tempo_espera_total_ms': 0.0,
+            'tempo_espera_max_ms': 0.0,
+            'timeouts': 0,
+            'conexoes_criadas': 0,
+            'conexoes_recicladas': 0,
+            'falhas_health_check': 0
+        }
+
+        for _ in range(min(self.min_size, self.max_size)):
+            with self._cond:
+                self._total += 1
+            try:
+                slot = self._criar_slot()
+            except Exception:
+                with self._cond:
+                    self._total -= 1
+                raise
+            with self._cond:
+                self._ociosas.append(slot)
+
+        self._thread_reciclagem = threading.Thread(
+            target=self._loop_reciclagem, name="db-pool-reciclagem", daemon=True
+        )
+        self._thread_reciclagem.start()
+
+    def _criar_slot(self):
+        conn = psycopg2.connect(**self.db_config, cursor_factory=CursorMedido)
+        with self._cond:
+            self._stats['conexoes_criadas'] += 1
+        return _SlotConexao(conn)
+
+    def _descartar(self, slot):
+        """Fecha a conexão física (fora do lock)"""
+        try:
+            slot.conn.close()
+        except Exception:
+            pass
+
+    def _conexao_saudavel(self, slot) -> bool:
+        agora = time.monotonic()
+        if slot.conn.closed:
+            return False
+        if agora - slot.criada_em > self.max_lifetime:
+            with self._cond:
+                self._stats['conexoes_recicladas'] += 1
+            return False
+        if agora - slot.usada_em > self.health_check_after:
+            try:
+                cur = slot.conn.cursor()
+                cur.execute("SELECT 1")
+                cur.close()
+                slot.conn.rollback()
+            except Exception:
+                with self._cond:
+                    self._stats['falhas_health_check'] += 1
+                return False
+        return True
+
+    def obter(self) -> "ConexaoPool":
+        """Retira uma conexão do pool, esperando até `timeout` segundos"""
+        inicio = time.monotonic()
+        limite = inicio + self.timeout
+        esperou = False
+
+        while True:
+            slot = None
+            criar = False
+            with self._cond:
+                while True:
+                    if self._fechado:
+                        raise PoolEsgotado("Pool de conexões encerrado")
+                    if self._ociosas:
+                        # LIFO: as conexões menos usadas envelhecem e são recicladas
+                        slot = self._ociosas.pop()
+                        break
+                    if self._total < self.max_size:
+                        self._total += 1
+                        criar = True
+                        break
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolEsgotado(
+                            f"Nenhuma conexão livre em {self.timeout:.1f}s "
+                            f"({self._em_uso}/{self.max_size} em uso)"
+                        )
+                    esperou = True
+                    self._aguardando += 1
+                    try:
+                        self._cond.wait(restante)
+                    finally:
+                        self._aguardando -= 1
+                self._em_uso += 1
+
+            if criar:
+                try:
+                    slot = self._criar_slot()
+                except Exception:
+                    with self._cond:
+                        self._total -= 1
+                        self._em_uso -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._conexao_saudavel(slot):
+                self._descartar(slot)
+                with self._cond:
+                    self._total -= 1
+                    self._em_uso -= 1
+                    self._cond.notify()
+                continue
+
+            espera_ms = (time.monotonic() - inicio) * 1000
+            with self._cond:
+                self._stats['checkouts'] += 1
+                if esperou:
+                    self._stats['esperas'] += 1
+                    self._stats['tempo_espera_total_ms'] += espera_ms
+                    self._stats['tempo_espera_max_ms'] = max(self._stats['tempo_espera_max_ms'], espera_ms)
+            return ConexaoPool(self, slot, espera_ms)
+
+    def devolver(self, slot):
+        """Devolve a conexão ao pool, desfazendo transação pendente"""
+        descartar = slot.conn.closed or self._fechado
+        if not descartar and slot.conn.status != psycopg2.extensions.STATUS_READY:
+            try:
+                slot.conn.rollback()
+            except Exception:
+                descartar = True
+
+        if descartar:
+            self._descartar(slot)
+            with self._cond:
+                self._total -= 1
+                self._em_uso -= 1
+                self._cond.notify()
+            return
+
+        slot.usada_em = time.monotonic()
+        with self._cond:
+            self._em_uso -= 1
+            self._ociosas.append(slot)
+            self._cond.notify()
+
+    def reciclar_ociosas(self):
+        """Fecha conexões ociosas há mais de max_idle, preservando min_size"""
+        agora = time.monotonic()
+        expiradas = []
+        with self._cond:
+            # As mais antigas ficam à esquerda da fila
+            while (self._ociosas and self._total > self.min_size
+                   and agora - self._ociosas[0].usada_em > self.max_idle):
+                expiradas.append(self._ociosas.popleft())
+                self._total -= 1
+            self._stats['conexoes_recicladas'] += len(expiradas)
+        for slot in expiradas:
+            self._descartar(slot)
+
+    def _loop_reciclagem(self):
+        intervalo = max(1.0, min(self.max_idle, 30.0))
+        while not self._parar_reciclagem.wait(intervalo):
+            self.reciclar_ociosas()
+
+    def estatisticas(self) -> dict:
+        """Ocupação e tempos de espera do pool"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                'tamanho_min': self.min_size,
+                'tamanho_max': self.max_size,
+                'total': self._total,
+                'em_uso': self._em_uso,
+                'ociosas': len(self._ociosas),
+                'aguardando': self._aguardando
+            })
+        stats['tempo_espera_medio_ms'] = round(
+            stats['tempo_espera_total_ms'] / stats['esperas'], 3
+        ) if stats['esperas'] else 0.0
+        stats['tempo_espera_total_ms'] = round(stats['tempo_espera_total_ms'], 3)
+        stats['tempo_espera_max_ms'] = round(stats['tempo_espera_max_ms'], 3)
+        return stats
+
+    def fechar(self):
+        """Encerra o pool e fecha as conexões ociosas"""
+        self._parar_reciclagem.set()
+        with self._cond:
+            self._fechado = True
+            ociosas = list(self._ociosas)
+            self._ociosas.clear()
+            self._total -= len(ociosas)
+            self._cond.notify_all()
+        for slot in ociosas:
+            self._descartar(slot)
+
+
+class ConexaoPool:
+    """Conexão emprestada do pool; close() devolve ao pool em vez de fechar"""
+
+    def __init__(self, pool: PoolConexoes, slot: _SlotConexao, espera_ms: float = 0.0):
+        self._pool = pool
+        self._slot = slot
+        self.espera_ms = espera_ms
+
+    def __getattr__(self, nome):
+        slot = self.__dict__.get('_slot')
+        if slot is None:
+            raise psycopg2.InterfaceError("conexão já devolvida ao pool")
+        return getattr(slot.conn, nome)
+
+    def close(self):
+        # Idempotente: vários endpoints chamam close() mais de uma vez
+        slot, self._slot = self._slot, None
+        if slot is not None:
+            self._pool.devolver(slot)
+
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+def get_db_pool() -> PoolConexoes:
+    """Retorna o pool global, criando-o no primeiro uso"""
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                _db_pool = PoolConexoes(DB_CONFIG, **DB_POOL_CONFIG)
+    return _db_pool
+
 def get_db_connection():
-    """Cria conexão com o banco de dados"""
+    """Obtém uma conexão do pool (close() devolve a conexão ao pool)"""
     try:
-        conn = psycopg2.connect(**DB_CONFIG, cursor_factory=RealDictCursor)
-        return conn
+        conn = get_db_pool().obter()
+    except PoolEsgotado as e:
+        raise HTTPException(status_code=503, detail=f"Banco de dados ocupado: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao conectar no banco: {str(e)}")
+    metricas_api.registrar_conexao(conn.espera_ms / 1000)
+    return conn
+
+@app.on_event("startup")
+def configurar_threadpool():
+    """
+    Limita o threadpool onde o FastAPI executa os endpoints `def`.
+
+    Todo acesso ao banco é síncrono (psycopg2), por isso os endpoints são
+    declarados com `def` e nunca rodam no event loop; o limite evita abrir
+    mais threads do que o pool de conexões consegue atender.
+    """
+    anyio.to_thread.current_default_thread_limiter().total_tokens = API_THREADPOOL_SIZE
+
+@app.on_event("shutdown")
+def fechar_db_pool():
+    """Fecha as conexões do pool ao encerrar o worker"""
+    global _db_pool
+    with _db_pool_lock:
+        if _db_pool is not None:
+            _db_pool.fechar()
+            _db_pool = None
+
+class CacheSessoes:
+    """
+    Cache LRU com TTL das sessões validadas pelo verify_token.
+
+    A chave é o hash SHA-256 do token (o token em si não fica em memória).
+    Cada entrada vive no máximo `ttl` segundos e nunca além do expires_at
+    da sessão. Logout, desativação e alteração de usuário invalidam as
+    entradas do usuário neste worker; nos demais workers o TTL limita o
+    tempo em que uma sessão encerrada ainda é aceita.
+    """
+
+    def __init__(self, max_size: int = 1000, ttl: float = 60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidacoes = 0
+
+    @staticmethod
+    def chave(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def obter(self, chave: str) -> Optional[dict]:
+        agora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None or entrada[0] <= agora:
+                if entrada is not None:
+                    del self._entradas[chave]
+                self.misses += 1
+                return None
+            self._entradas.move_to_end(chave)
+            self.hits += 1
+            return dict(entrada[1])
+
+    def guardar(self, chave: str, sessao: dict):
+        if self.ttl <= 0 or self.max_size <= 0:
+            return
+        validade = self.ttl
+        expires_at = sessao.get('expires_at')
+        if isinstance(expires_at, datetime):
+            validade = min(validade, (expires_at - datetime.now()).total_seconds())
+        if validade <= 0:
+            return
+        with self._lock:
+            self._entradas[chave] = (time.monotonic() + validade, dict(sessao))
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_size:
+                self._entradas.popitem(last=False)
+
+    def invalidar_usuario(self, usuario_id: int):
+        """Remove todas as sessões em cache de um usuário"""
+        with self._lock:
+            chaves = [c for c, (_, s) in self._entradas.items() if s.get('usuario_id') == usuario_id]
+            for c in chaves:
+                del self._entradas[c]
+            self.invalidacoes += len(chaves)
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entradas': len(self._entradas),
+                'tamanho_max': self.max_size,
+                'ttl_segundos': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'taxa_acerto': round(self.hits / total, 4) if total else 0.0,
+                'invalidacoes': self.invalidacoes
+            }
+
+
+cache_sessoes = CacheSessoes(max_size=SESSION_CACHE_MAX, ttl=SESSION_CACHE_TTL)
 
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Verifica se o token é válido"""
+    """Verifica se o token é válido (consultas repetidas saem do cache de sessões)"""
     token = credentials.credentials
 
+    chave = CacheSessoes.chave(token)
+    sessao = cache_sessoes.obter(chave)
+    if sessao is not None:
+        return sessao
+
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur = conn.cursor()
     
     try:
         cur.execute("""
@@ -282,7 +1370,9 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
                 detail="Token inválido ou expirado"
             )
         
-        return dict(sessao)
+        sessao = dict(sessao)
+        cache_sessoes.guardar(chave, sessao)
+        return sessao
     
     finally:
         cur.close()
@@ -308,13 +1398,511 @@ def can_edit(user_data: dict):
     """Verifica se pode editar (admin ou gerente)"""
     return user_data.get('nivel_acesso') in ['admin', 'gerente']
 
+# ==================== ETAG (GET CONDICIONAL) ====================
+
+def _versao_linhas(cur, query: str, params=()) -> str:
+    """
+    Versão do conjunto de linhas de uma resposta, calculada no banco.
+
+    `query` devolve uma coluna texto `versao` por linha, montada com o id e
+    o xmin (que muda a cada UPDATE) das tabelas lidas. Só o hash volta para
+    a API: nada de trafegar ou serializar as linhas para saber se mudaram.
+    """
+    cur.execute(f"""
+        SELECT COUNT(*) AS total, md5(string_agg(versao, ',' ORDER BY versao)) AS hash
+        FROM ({query}) v
+    """, params)
+    versao = cur.fetchone()
+    return f"{versao['total']}:{versao['hash']}"
+
+def _etag(versao: str) -> str:
+    """ETag forte da versão das linhas (muda também a cada versão da API)"""
+    return '"%s"' % hashlib.sha1(f"{app.version}|{versao}".encode()).hexdigest()[:32]
+
+def _resposta_nao_modificada(if_none_match: Optional[str], etag: str, response: Response):
+    """
+    Resposta 304 quando o If-None-Match bate com o ETag atual.
+
+    Sem 304, grava ETag e Cache-Control na resposta do endpoint e devolve
+    None. `no-cache` faz o app (e proxies) revalidarem a cada uso.
+    """
+    cabecalhos = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match:
+        # Comparação fraca (RFC 9110): W/"x" bate com "x"
+        tags = [t.strip().removeprefix('W/') for t in if_none_match.split(',')]
+        if '*' in tags or etag in tags:
+            return Response(status_code=304, headers=cabecalhos)
+    response.headers.update(cabecalhos)
+    return None
+
+# ==================== CACHE DE CADASTROS ====================
+
+class CacheCadastros:
+    """
+    Cache de leitura das tabelas de cadastro, lidas em quase toda tela.
+
+    Cada entrada guarda o ETag e a resposta já montada, e depende de uma ou
+    mais tabelas. Triggers no banco avisam qualquer escrita nessas tabelas
+    pelo canal `cadastros_alterados` (migração v3, seção 9); uma thread por
+    worker escuta o canal numa conexão própria e descarta as entradas
+    afetadas, então todos os workers do uvicorn ficam coerentes.
+
+    Enquanto a escuta está fora do ar (queda do banco ou da rede) o cache é
+    esvaziado e as entradas novas vivem só `ttl_sem_escuta` segundos.
+    """
+
+    CANAL = 'cadastros_alterados'
+
+    def __init__(self, db_config: dict, ttl: float = 600, ttl_sem_escuta: float = 5,
+                 keepalive: float = 30):
+        self.db_config = db_config
+        self.ttl = ttl
+        self.ttl_sem_escuta = ttl_sem_escuta
+        self.keepalive = keepalive
+        self._lock = threading.Lock()
+        self._entradas = {}  # chave -> (expira_em, tabelas, etag, valor)
+        self._geracoes = {}  # tabela -> contador de invalidações
+        self._epoca = 0  # muda a cada conexão/queda da escuta
+        self._escutando = False
+        self._thread = None
+        self._parar = threading.Event()
+        self.hits = 0
+        self.misses = 0
+        self.invalidacoes = 0
+        self.quedas_escuta = 0
+
+    def obter(self, chave: str, tabelas: tuple, carregar):
+        """
+        (etag, valor) da entrada; em cache miss chama carregar(cur), que
+        devolve (versão das linhas, valor).
+        """
+        self._iniciar_escuta()
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None and entrada[0] > time.monotonic():
+                self.hits += 1
+                return entrada[2], entrada[3]
+            self.misses += 1
+            marca = (self._epoca, tuple(self._geracoes.get(t, 0) for t in tabelas))
+
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            versao, valor = carregar(cur)
+        finally:
+            cur.close()
+            conn.close()
+        etag = _etag(versao)
+
+        with self._lock:
+            # Uma invalidação durante a leitura pode ter chegado depois do
+            # snapshot: nesse caso a resposta vale, mas não entra no cache
+            if marca == (self._epoca, tuple(self._geracoes.get(t, 0) for t in tabelas)):
+                ttl = self.ttl if self._escutando else self.ttl_sem_escuta
+                if ttl > 0:
+                    self._entradas[chave] = (time.monotonic() + ttl, tabelas, etag, valor)
+        return etag, valor
+
+    def invalidar(self, tabelas):
+        """Descarta as entradas que dependem de alguma das tabelas"""
+        with self._lock:
+            for tabela in tabelas:
+                self._geracoes[tabela] = self._geracoes.get(tabela, 0) + 1
+            chaves = [c for c, e in self._entradas.items() if any(t in tabelas for t in e[1])]
+            for c in chaves:
+                del self._entradas[c]
+            self.invalidacoes += len(chaves)
+
+    def _mudar_escuta(self, escutando: bool):
+        with self._lock:
+            if not escutando and self._escutando:
+                self.quedas_escuta += 1
+            self._escutando = escutando
+            self._epoca += 1
+            # Notificações perdidas enquanto a escuta estava fora
+            self._entradas.clear()
+
+    def _iniciar_escuta(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._escutar, name="cache-cadastros", daemon=True)
+            self._thread.start()
+
+    def _escutar(self):
+        logger = logging.getLogger('controle_gado.cache_cadastros')
+        espera = 1
+        while not self._parar.is_set():
+            conn = None
+            try:
+                # keepalives: uma conexão morta em silêncio cai em segundos
+                conn = psycopg2.connect(**self.db_config, keepalives=1, keepalives_idle=30,
+                                        keepalives_interval=10, keepalives_count=3)
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {self.CANAL}")
+                self._mudar_escuta(True)
+                espera = 1
+                while not self._parar.is_set():
+                    if not select.select([conn], [], [], self.keepalive)[0]:
+                        conn.cursor().execute("SELECT 1")
+                    conn.poll()
+                    tabelas = set()
+                    while conn.notifies:
+                        tabelas.add(conn.notifies.pop(0).payload)
+                    if tabelas:
+                        self.invalidar(tabelas)
+            except (psycopg2.Error, OSError) as e:
+                logger.warning("Escuta de %s caiu: %s", self.CANAL, e)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except psycopg2.Error:
+                        pass
+                self._mudar_escuta(False)
+            self._parar.wait(espera)
+            espera = min(espera * 2, 30)
+
+    def fechar(self):
+        self._parar.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=self.keepalive + 1)
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entradas': len(self._entradas),
+                'escutando': self._escutando,
+                'ttl_segundos': self.ttl if self._escutando else self.ttl_sem_escuta,
+                'hits': self.hits,
+                'misses': self.misses,
+                'taxa_acerto': round(self.hits / total, 4) if total else 0.0,
+                'invalidacoes': self.invalidacoes,
+                'quedas_escuta': self.quedas_escuta
+            }
+
+
+cache_cadastros = CacheCadastros(DB_CONFIG, ttl=CACHE_CADASTROS_TTL,
+                                 ttl_sem_escuta=CACHE_CADASTROS_TTL_SEM_ESCUTA)
+
+@app.on_event("shutdown")
+def fechar_cache_cadastros():
+    """Encerra a thread de escuta do cache de cadastros"""
+    cache_cadastros.fechar()
+
+# ==================== GENEALOGIA (GRAFO EM MEMÓRIA) ====================
+
+class Genealogia:
+    """
+    Grafo de parentesco do rebanho, compacto e só de leitura.
+
+    Nós são animais e touros (o touro com o mesmo brinco de um animal é o
+    mesmo nó). Pais vêm de animais.pai_id/mae_id e, na falta deles, dos
+    partos: a mãe do bezerro é a vaca do parto e o pai é o touro do parto
+    ou da última inseminação antes dele. animais.pai_id é um touro, como em
+    migration_v2_reproductive.sql e nas views (v_animais_completo); só é
+    lido como animal quando a FK do banco aponta para animais (schema
+    antigo de postgres_schema.sql), o que carregar() detecta. Os nós ficam em ordem topológica
+    (pais antes dos filhos) em arrays paralelos, com os filhos num índice
+    CSR, o que permite:
+
+    - ancestrais/descendentes até N gerações, por níveis;
+    - coancestria (parentesco de Malécot) pelo método tabular, memoizada:
+      f(a, a) = (1 + F(a)) / 2 e, com a mais novo que b,
+      f(a, b) = (f(pai(a), b) + f(mãe(a), b)) / 2;
+    - consanguinidade de Wright F(x) = f(pai(x), mãe(x)); a consanguinidade
+      esperada do produto de um acasalamento é a coancestria do casal.
+
+    Uma instância nunca muda depois de montada: quando os dados mudam o
+    cache de cadastros descarta a instância inteira, memo incluída. A mesma
+    instância atende requisições em paralelo, então a memo e as colunas
+    descartam só as entradas mais antigas, e nunca todas de uma vez.
+    """
+
+    TABELAS = ('animais', 'touros', 'eventos_reprodutivos')
+    COLUNAS_MAX = 256  # colunas de coancestria guardadas (uma por touro/fêmea consultados)
+    GESTACAO_MAX_DIAS = 320  # inseminação mais antiga aceita como origem de um parto
+
+    def __init__(self, animais: list, touros: list, partos: list, memo_max: int = 500000,
+                 pai_em: str = 'touros'):
+        self.memo_max = memo_max
+        chaves = []  # chave provisória -> ('animal', id) | ('touro', id)
+        info = []
+        indice_animal = {}
+        indice_touro = {}
+        por_brinco = {}
+        for a in animais:
+            indice_animal[a['id']] = len(chaves)
+            por_brinco[a['brinco']] = len(chaves)
+            chaves.append(('animal', a['id']))
+            info.append({'animal_id': a['id'], 'touro_id': None, 'brinco': a['brinco'],
+                         'nome': a['nome'], 'sexo': a['sexo']})
+        for t in touros:
+            no = por_brinco.get(t['brinco'])
+            if no is None:
+                no = len(chaves)
+                chaves.append(('touro', t['id']))
+                info.append({'animal_id': None, 'touro_id': t['id'], 'brinco': t['brinco'],
+                             'nome': t['nome'], 'sexo': 'M'})
+            else:
+                info[no]['touro_id'] = t['id']
+            indice_touro[t['id']] = no
+
+        total = len(chaves)
+        pai = [-1] * total
+        mae = [-1] * total
+        indice_pai = indice_animal if pai_em == 'animais' else indice_touro
+        for a in animais:
+            no = indice_animal[a['id']]
+            pai[no] = indice_pai.get(a['pai_id'], -1)
+            mae[no] = indice_animal.get(a['mae_id'], -1)
+        for p in partos:
+            no = indice_animal.get(p['bezerra_id'])
+            if no is None:
+                continue
+            if mae[no] < 0:
+                mae[no] = indice_animal.get(p['mae_id'], -1)
+            if pai[no] < 0 and p['touro_id'] is not None:
+                pai[no] = indice_touro.get(p['touro_id'], -1)
+
+        # Ordem topológica (Kahn); nós presos em ciclos (erro de cadastro)
+        # entram no fim sem as arestas que apontam para a frente
+        filhos = [[] for _ in range(total)]
+        pendentes = [0] * total
+        for no in range(total):
+            for p in (pai[no], mae[no]):
+                if p == no:
+                    continue
+                if p >= 0:
+                    filhos[p].append(no)
+                    pendentes[no] += 1
+        ordem = [no for no in range(total) if pendentes[no] == 0]
+        for no in ordem:
+            for filho in filhos[no]:
+                pendentes[filho] -= 1
+                if pendentes[filho] == 0:
+                    ordem.append(filho)
+        posicao = [-1] * total
+        for i, no in enumerate(ordem):
+            posicao[no] = i
+        self.arestas_descartadas = 0
+        for no in range(total):
+            if posicao[no] < 0:
+                posicao[no] = len(ordem)
+                ordem.append(no)
+
+        self.total = total
+        self.pai = array('i', [-1]) * total
+        self.mae = array('i', [-1]) * total
+        for i, no in enumerate(ordem):
+            for origem, destino in ((pai, self.pai), (mae, self.mae)):
+                p = origem[no]
+                if p >= 0 and posicao[p] < i:
+                    destino[i] = posicao[p]
+                elif p >= 0:
+                    self.arestas_descartadas += 1
+
+        # Filhos em CSR: filhos do nó i em filhos[inicio[i]:inicio[i + 1]]
+        self.inicio_filhos = array('i', [0]) * (total + 1)
+        for i in range(total):
+            for p in (self.pai[i], self.mae[i]):
+                if p >= 0:
+                    self.inicio_filhos[p + 1] += 1
+        for i in range(total):
+            self.inicio_filhos[i + 1] += self.inicio_filhos[i]
+        self.filhos = array('i', [0]) * self.inicio_filhos[total]
+        proximo = array('i', self.inicio_filhos[:total])
+        for i in range(total):
+            for p in (self.pai[i], self.mae[i]):
+                if p >= 0:
+                    self.filhos[proximo[p]] = i
+                    proximo[p] += 1
+
+        self.info = [info[no] for no in ordem]
+        self.indice_animal = {a: posicao[no] for a, no in indice_animal.items()}
+        self.indice_touro = {t: posicao[no] for t, no in indice_touro.items()}
+        self._coancestria = OrderedDict()
+        self._colunas = OrderedDict()
+        self._lock_colunas = threading.Lock()
+        self._variancia = None
+
+    @classmethod
+    def carregar(cls, cur) -> 'Genealogia':
+        cur.execute("""
+            SELECT c.confrelid::regclass::text AS tabela
+            FROM pg_constraint c
+            JOIN pg_attribute at ON at.attrelid = c.conrelid AND at.attnum = c.conkey[1]
+            WHERE c.conrelid = 'animais'::regclass AND c.contype = 'f' AND at.attname = 'pai_id'
+        """)
+        fk_pai = cur.fetchone()
+        cur.execute("SELECT id, brinco, nome, sexo, pai_id, mae_id FROM animais")
+        animais = cur.fetchall()
+        cur.execute("SELECT id, brinco, nome FROM touros")
+        touros = cur.fetchall()
+        cur.execute("""
+            SELECT DISTINCT ON (p.bezerra_id)
+                p.bezerra_id, p.animal_id AS mae_id, COALESCE(p.touro_id, ia.touro_id) AS touro_id
+            FROM eventos_reprodutivos p
+            LEFT JOIN LATERAL (
+                SELECT i.touro_id FROM eventos_reprodutivos i
+                WHERE i.animal_id = p.animal_id
+                  AND i.tipo_evento = 'inseminacao'
+                  AND i.touro_id IS NOT NULL
+                  AND i.data_evento < p.data_evento
+                  AND i.data_evento >= p.data_evento - %s
+                ORDER BY i.data_evento DESC
+                LIMIT 1
+            ) ia ON TRUE
+            WHERE p.tipo_evento = 'parto'
+              AND p.bezerra_id IS NOT NULL
+              AND NOT COALESCE(p.natimorto, FALSE)
+            ORDER BY p.bezerra_id, p.data_evento DESC
+        """, (cls.GESTACAO_MAX_DIAS,))
+        return cls(animais, touros, cur.fetchall(),
+                   pai_em='animais' if fk_pai and fk_pai['tabela'] == 'animais' else 'touros')
+
+    def coancestria(self, a: int, b: int) -> float:
+        """Coancestria entre os nós a e b (-1 = desconhecido)"""
+        if a < 0 or b < 0:
+            return 0.0
+        if a == b:
+            return 0.5 * (1.0 + self.coancestria(self.pai[a], self.mae[a]))
+        if a < b:
+            a, b = b, a
+        chave = a * self.total + b
+        valor = self._coancestria.get(chave)
+        if valor is None:
+            # a é o mais novo na ordem topológica: não é ancestral de b
+            valor = 0.5 * (self.coancestria(self.pai[a], b) + self.coancestria(self.mae[a], b))
+            if len(self._coancestria) >= self.memo_max:
+                try:
+                    self._coancestria.popitem(last=False)
+                except KeyError:
+                    pass  # outra requisição esvaziou antes
+            self._coancestria[chave] = valor
+        return valor
+
+    def consanguinidade(self, no: int) -> float:
+        """Coeficiente de consanguinidade de Wright do nó"""
+        return self.coancestria(self.pai[no], self.mae[no])
+
+    def _variancias(self) -> array:
+        """Variância mendeliana de cada nó (a diagonal D de A = TDT')"""
+        if self._variancia is None:
+            variancia = array('d', [1.0]) * self.total
+            for i in range(self.total):
+                p, m = self.pai[i], self.mae[i]
+                if p >= 0 and m >= 0:
+                    variancia[i] = 0.5 - 0.25 * (self.consanguinidade(p) + self.consanguinidade(m))
+                elif p >= 0 or m >= 0:
+                    variancia[i] = 0.75 - 0.25 * self.consanguinidade(max(p, m))
+            self._variancia = variancia
+        return self._variancia
+
+    def coluna(self, b: int) -> array:
+        """
+        Coancestria de todos os nós com b, em O(n): sobe somando a
+        contribuição de b em cada ancestral (T'), pondera pela variância
+        mendeliana (D) e desce pela ordem topológica (T). Guarda as últimas
+        COLUNAS_MAX colunas.
+        """
+        coluna = self._colunas.get(b)
+        if coluna is not None:
+            return coluna
+        variancia = self._variancias()
+        pai, mae = self.pai, self.mae
+        coluna = array('d', [0.0]) * self.total
+        coluna[b] = 1.0
+        inicio = b
+        for i in range(b, -1, -1):
+            peso = coluna[i]
+            if peso:
+                inicio = i
+                if pai[i] >= 0:
+                    coluna[pai[i]] += 0.5 * peso
+                if mae[i] >= 0:
+                    coluna[mae[i]] += 0.5 * peso
+        # Abaixo do ancestral mais antigo de b a coluna é toda zero
+        for i in range(inicio, self.total):
+            p, m = pai[i], mae[i]
+            coluna[i] = 0.5 * (variancia[i] * coluna[i]
+                               + (coluna[p] if p >= 0 else 0.0) + (coluna[m] if m >= 0 else 0.0))
+        with self._lock_colunas:
+            if len(self._colunas) >= self.COLUNAS_MAX:
+                self._colunas.popitem(last=False)
+            self._colunas[b] = coluna
+        return coluna
+
+    def parentesco(self, nos_a: list, nos_b: list) -> list:
+        """
+        Matriz de coancestria len(nos_a) x len(nos_b) (-1 = desconhecido),
+        montada com uma coluna por nó do menor dos dois lados
+        """
+        if len(nos_b) > len(nos_a):
+            return [list(linha) for linha in zip(*self.parentesco(nos_b, nos_a))] if nos_a else []
+        colunas = [self.coluna(b) if b >= 0 else None for b in nos_b]
+        return [[c[a] if c is not None and a >= 0 else 0.0 for c in colunas] for a in nos_a]
+
+    def _niveis(self, no: int, geracoes: int, vizinhos) -> list:
+        """Parentes por nível: (nó, geração mais próxima, nº de caminhos)"""
+        encontrados = {}
+        nivel = {no: 1}
+        for geracao in range(1, geracoes + 1):
+            proximo = {}
+            for atual, caminhos in nivel.items():
+                for vizinho in vizinhos(atual):
+                    proximo[vizinho] = proximo.get(vizinho, 0) + caminhos
+            if not proximo:
+                break
+            for vizinho, caminhos in proximo.items():
+                if vizinho in encontrados:
+                    encontrados[vizinho][1] += caminhos
+                else:
+                    encontrados[vizinho] = [geracao, caminhos]
+            nivel = proximo
+        return [(n, g, c) for n, (g, c) in encontrados.items()]
+
+    def ancestrais(self, no: int, geracoes: int) -> list:
+        return self._niveis(no, geracoes, lambda n: [p for p in (self.pai[n], self.mae[n]) if p >= 0])
+
+    def descendentes(self, no: int, geracoes: int) -> list:
+        return self._niveis(no, geracoes,
+                            lambda n: self.filhos[self.inicio_filhos[n]:self.inicio_filhos[n + 1]])
+
+    def descrever(self, no: int) -> dict:
+        return dict(self.info[no], consanguinidade=round(self.consanguinidade(no), 6))
+
+    def estatisticas(self) -> dict:
+        return {
+            'nos': self.total,
+            'com_pai': sum(1 for p in self.pai if p >= 0),
+            'com_mae': sum(1 for m in self.mae if m >= 0),
+            'arestas_descartadas': self.arestas_descartadas,
+            'coancestrias_memorizadas': len(self._coancestria),
+            'colunas_memorizadas': len(self._colunas)
+        }
+
+
+def obter_genealogia() -> Genealogia:
+    """Genealogia atual, montada sob demanda e guardada no cache de cadastros"""
+    def carregar(cur):
+        genealogia = Genealogia.carregar(cur)
+        return f"genealogia:{genealogia.total}", genealogia
+
+    return cache_cadastros.obter("genealogia", Genealogia.TABELAS, carregar)[1]
+
 # ==================== ENDPOINTS DE AUTENTICAÇÃO ====================
 
 @app.post("/api/auth/login", tags=["🔐 Autenticação"], response_model=LoginResponse)
 def login(credentials: LoginRequest):
     """Endpoint de login"""
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur = conn.cursor()
     
     try:
         # Busca usuário
@@ -391,6 +1979,7 @@ def logout(user_data: dict = Depends(verify_token)):
         """, (user_data['usuario_id'],))
         
         conn.commit()
+        cache_sessoes.invalidar_usuario(user_data['usuario_id'])
         
         return {"message": "Logout realizado com sucesso"}
     
@@ -510,6 +2099,9 @@ def atualizar_usuario(
         if cur.rowcount == 0:
             raise HTTPException(status_code=404, detail="Usuário não encontrado")
 
+        # Nome, email e nivel_acesso vão junto na sessão em cache
+        cache_sessoes.invalidar_usuario(usuario_id)
+
         return {"message": "Usuário atualizado com sucesso"}
 
     except HTTPException:
@@ -547,6 +2139,8 @@ def desativar_usuario(usuario_id: int, user_data: dict = Depends(verify_token)):
         if cur.rowcount == 0:
             raise HTTPException(status_code=404, detail="Usuário não encontrado")
 
+        cache_sessoes.invalidar_usuario(usuario_id)
+
         return {"message": "Usuário desativado com sucesso"}
 
     finally:
@@ -555,6 +2149,70 @@ def desativar_usuario(usuario_id: int, user_data: dict = Depends(verify_token)):
 
 # ==================== ENDPOINTS DE ANIMAIS ====================
 
+def _filtros_animais(status: Optional[str], lote: Optional[str], pasto: Optional[str]):
+    """Monta o WHERE comum à listagem e à contagem de animais ativos"""
+    where = "status = 'ativo'"
+    params = []
+
+    if status:
+        where += " AND status = %s"
+        params.append(status)
+
+    if lote:
+        where += " AND lote = %s"
+        params.append(lote)
+
+    if pasto:
+        where += " AND pasto = %s"
+        params.append(pasto)
+
+    return where, params
+
+def _contar_animais(cur, where: str, params: list, contagem: str):
+    """
+    Total de animais para os filtros.
+
+    A contagem vai direto na tabela animais (o filtro status = 'ativo' é o
+    mesmo da vw_rebanho_ativo), sem executar os LATERAL de pesagens da view.
+    'estimada' usa a estimativa de linhas do planejador, sem varrer a tabela.
+    """
+    if contagem == "exata":
+        cur.execute(f"SELECT COUNT(*) AS total FROM animais WHERE {where}", params)
+        return cur.fetchone()['total']
+
+    if contagem == "estimada":
+        cur.execute(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM animais WHERE {where}", params)
+        plano = cur.fetchone()['QUERY PLAN']
+        if isinstance(plano, str):
+            plano = json.loads(plano)
+        return int(plano[0]['Plan']['Plan Rows'])
+
+    return None
+
+def _stream_animais(query: str, params: list):
+    """
+    Gera o JSON da listagem completa lendo de um cursor do servidor.
+
+    A conexão só é retirada do pool quando a transmissão começa, e é
+    devolvida ao fim (ou se o cliente desconectar no meio).
+    """
+    conn = get_db_connection()
+    cur = conn.cursor(name="stream_animais")
+    cur.itersize = 500
+    try:
+        cur.execute(query, params)
+        yield '{"data": ['
+        total = 0
+        for animal in cur:
+            if total:
+                yield ','
+            yield orjson.dumps(animal, default=_orjson_default)
+            total += 1
+        yield '], "total": %d}' % total
+    finally:
+        cur.close()
+        conn.close()
+
 @app.get("/api/animais", tags=["🐮 Animais"])
 def listar_animais(
     status: Optional[str] = "ativo",
@@ -562,50 +2220,90 @@ def listar_animais(
     pasto: Optional[str] = None,
     limit: int = 100,
     offset: int = 0,
+    cursor: Optional[str] = None,
+    contagem: str = "exata",
+    stream: bool = False,
     user_data: dict = Depends(verify_token)
 ):
-    """Lista animais com filtros"""
+    """
+    Lista animais com filtros, ordenados por brinco.
+
+    - **cursor**: brinco do último animal da página anterior (paginação por
+      chave, use `next_cursor` da resposta); quando informado, `offset` é ignorado
+    - **contagem**: `exata`, `estimada` (estatística do planejador) ou `nenhuma`
+    - **stream**: transmite o rebanho inteiro (ignora limit/offset/cursor)
+    """
+    if contagem not in ("exata", "estimada", "nenhuma"):
+        raise HTTPException(status_code=400, detail="contagem deve ser 'exata', 'estimada' ou 'nenhuma'")
+
+    where, params = _filtros_animais(status, lote, pasto)
+    query = f"SELECT * FROM vw_rebanho_ativo WHERE {where}"
+
+    if stream:
+        return StreamingResponse(
+            _stream_animais(query + " ORDER BY brinco", params),
+            media_type="application/json"
+        )
+
     conn = get_db_connection()
     cur = conn.cursor()
     
     try:
-        query = "SELECT * FROM vw_rebanho_ativo WHERE 1=1"
-        params = []
-        
-        if status:
-            query += " AND status = %s"
-            params.append(status)
-        
-        if lote:
-            query += " AND lote = %s"
-            params.append(lote)
-        
-        if pasto:
-            query += " AND pasto = %s"
-            params.append(pasto)
-        
-        query += " ORDER BY brinco LIMIT %s OFFSET %s"
-        params.extend([limit, offset])
+        total = _contar_animais(cur, where, params, contagem)
+
+        if cursor is not None:
+            query += " AND brinco > %s ORDER BY brinco LIMIT %s"
+            params = params + [cursor, limit + 1]
+        else:
+            query += " ORDER BY brinco LIMIT %s OFFSET %s"
+            params = params + [limit + 1, offset]
         
         cur.execute(query, params)
         animais = cur.fetchall()
+
+        # Uma linha a mais indica que existe próxima página
+        tem_mais = len(animais) > limit
+        animais = animais[:limit]
         
-        return {
-            "total": len(animais),
-            "data": [dict(animal) for animal in animais]
-        }
+        return RespostaJSON({
+            "total": total,
+            "contagem": contagem,
+            "next_cursor": animais[-1]['brinco'] if tem_mais and animais else None,
+            "data": animais
+        })
     
     finally:
         cur.close()
         conn.close()
 
 @app.get("/api/animais/{animal_id}", tags=["🐮 Animais"])
-def buscar_animal(animal_id: int, user_data: dict = Depends(verify_token)):
-    """Busca animal por ID"""
+def buscar_animal(
+    animal_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    user_data: dict = Depends(verify_token)
+):
+    """Busca animal por ID (aceita If-None-Match)"""
     conn = get_db_connection()
     cur = conn.cursor()
 
     try:
+        # idade_anos/idade_meses dependem da data: o dia entra na versão
+        versao = _versao_linhas(cur, """
+            SELECT a.xmin || '.' || COALESCE(r.xmin::text, '') || '.' || COALESCE(l.xmin::text, '')
+                   || '.' || COALESCE(p.xmin::text, '') || '.' || COALESCE(pr.xmin::text, '')
+                   || '.' || CURRENT_DATE AS versao
+            FROM animais a
+            LEFT JOIN racas r ON a.raca_id = r.id
+            LEFT JOIN lotes l ON a.lote_id = l.id
+            LEFT JOIN pastos p ON a.pasto_id = p.id
+            LEFT JOIN animais_pesagem_resumo pr ON pr.animal_id = a.id
+            WHERE a.id = %s
+        """, (animal_id,))
+        nao_modificada = _resposta_nao_modificada(if_none_match, _etag(versao), response)
+        if nao_modificada:
+            return nao_modificada
+
         # Buscar direto da tabela animais para pegar todos os campos
         cur.execute("""
             SELECT a.*,
@@ -614,12 +2312,13 @@ def buscar_animal(animal_id: int, user_data: dict = Depends(verify_token)):
                    p.nome as pasto_nome,
                    EXTRACT(YEAR FROM AGE(CURRENT_DATE, a.data_nascimento)) as idade_anos,
                    EXTRACT(MONTH FROM AGE(CURRENT_DATE, a.data_nascimento)) %% 12 as idade_meses,
-                   (SELECT peso FROM pesagens WHERE animal_id = a.id ORDER BY data_pesagem DESC LIMIT 1) as ultimo_peso,
-                   (SELECT data_pesagem FROM pesagens WHERE animal_id = a.id ORDER BY data_pesagem DESC LIMIT 1) as data_ultimo_peso
+                   pr.ultimo_peso,
+                   pr.data_ultimo_peso
             FROM animais a
             LEFT JOIN racas r ON a.raca_id = r.id
             LEFT JOIN lotes l ON a.lote_id = l.id
             LEFT JOIN pastos p ON a.pasto_id = p.id
+            LEFT JOIN animais_pesagem_resumo pr ON pr.animal_id = a.id
             WHERE a.id = %s
         """, (animal_id,))
         animal = cur.fetchone()
@@ -627,7 +2326,7 @@ def buscar_animal(animal_id: int, user_data: dict = Depends(verify_token)):
         if not animal:
             raise HTTPException(status_code=404, detail="Animal não encontrado")
 
-        return dict(animal)
+        return _resposta_json(animal, response)
 
     finally:
         cur.close()
@@ -646,7 +2345,7 @@ def buscar_animal_por_brinco(brinco: str, user_data: dict = Depends(verify_token
         if not animal:
             raise HTTPException(status_code=404, detail="Animal não encontrado")
         
-        return dict(animal)
+        return RespostaJSON(animal)
     
     finally:
         cur.close()
@@ -751,14 +2450,15 @@ def atualizar_animal(
     
     finally:
         cur.close()
+        conn.close()
 
 @app.delete("/api/animais/{animal_id}", tags=["🐮 Animais"])
-async def deletar_animal(animal_id: int, user_data: dict = Depends(verify_token)):
+def deletar_animal(animal_id: int, user_data: dict = Depends(verify_token)):
     """Deletar animal (soft delete) - Apenas admin e gerente"""
     require_admin_or_gerente(user_data)
 
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur = conn.cursor()
     try:
         cur.execute(
             "UPDATE animais SET status = 'inativo', updated_at = NOW() WHERE id = %s RETURNING id, brinco",
@@ -782,12 +2482,24 @@ async def deletar_animal(animal_id: int, user_data: dict = Depends(verify_token)
 # ==================== ENDPOINTS DE PESAGENS ====================
 
 @app.get("/api/pesagens/{animal_id}", tags=["⚖️ Pesagens"])
-def listar_pesagens(animal_id: int, user_data: dict = Depends(verify_token)):
-    """Lista pesagens de um animal"""
+def listar_pesagens(
+    animal_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    user_data: dict = Depends(verify_token)
+):
+    """Lista pesagens de um animal (aceita If-None-Match)"""
     conn = get_db_connection()
     cur = conn.cursor()
     
     try:
+        versao = _versao_linhas(cur, """
+            SELECT id || '.' || xmin AS versao FROM pesagens WHERE animal_id = %s
+        """, (animal_id,))
+        nao_modificada = _resposta_nao_modificada(if_none_match, _etag(versao), response)
+        if nao_modificada:
+            return nao_modificada
+
         cur.execute("""
             SELECT * FROM pesagens 
             WHERE animal_id = %s 
@@ -796,15 +2508,35 @@ def listar_pesagens(animal_id: int, user_data: dict = Depends(verify_token)):
         
         pesagens = cur.fetchall()
         
-        return {
+        return _resposta_json({
             "total": len(pesagens),
-            "data": [dict(p) for p in pesagens]
-        }
+            "data": pesagens
+        }, response)
     
     finally:
         cur.close()
         conn.close()
 
+def _atualizar_peso_atual(cur, animal_ids: list):
+    """
+    Alinha animais.peso_atual com a pesagem mais recente (por data).
+
+    ganho_peso/gmd de cada pesagem e o resumo por animal são recalculados
+    pelos triggers de pesagens; aqui só o peso atual é propagado. Animal
+    sem nenhuma pesagem (apagou a última) fica com peso_atual NULL.
+    """
+    cur.execute("""
+        UPDATE animais a
+        SET peso_atual = v.ultimo_peso
+        FROM (
+            SELECT ids.id, r.ultimo_peso
+            FROM unnest(%s::int[]) AS ids(id)
+            LEFT JOIN animais_pesagem_resumo r ON r.animal_id = ids.id
+        ) v
+        WHERE a.id = v.id
+        AND a.peso_atual IS DISTINCT FROM v.ultimo_peso
+    """, (list(animal_ids),))
+
 @app.post("/api/pesagens", tags=["⚖️ Pesagens"], status_code=status.HTTP_201_CREATED)
 def registrar_pesagem(pesagem: PesagemCreate, user_data: dict = Depends(verify_token)):
     """Registra nova pesagem"""
@@ -826,22 +2558,130 @@ def registrar_pesagem(pesagem: PesagemCreate, user_data: dict = Depends(verify_t
         
         pesagem_id = cur.fetchone()['id']
         
-        # Atualiza peso atual do animal
-        cur.execute("""
-            UPDATE animais 
-            SET peso_atual = %s 
-            WHERE id = %s
-        """, (pesagem.peso, pesagem.animal_id))
+        # Atualiza peso atual do animal (pesagem retroativa não sobrescreve)
+        _atualizar_peso_atual(cur, [pesagem.animal_id])
+
+        # ganho_peso/gmd são preenchidos pelo trigger ao fim do INSERT
+        cur.execute("SELECT ganho_peso, gmd FROM pesagens WHERE id = %s", (pesagem_id,))
+        calculado = cur.fetchone()
         
         conn.commit()
         
-        return {"id": pesagem_id, "message": "Pesagem registrada com sucesso"}
+        return {
+            "id": pesagem_id,
+            "ganho_peso": calculado['ganho_peso'],
+            "gmd": calculado['gmd'],
+            "message": "Pesagem registrada com sucesso"
+        }
     
     finally:
         cur.close()
         conn.close()
 
 
+@app.post("/api/pesagens/lote", tags=["⚖️ Pesagens"], status_code=status.HTTP_201_CREATED)
+def registrar_pesagens_lote(lote: PesagemLoteCreate, user_data: dict = Depends(verify_token)):
+    """
+    Registra uma sessão de balança inteira em uma única transação.
+
+    Cada linha identifica o animal por `animal_id` ou `brinco`. Linhas
+    inválidas (animal inexistente, data ou condição corporal inválidas) são
+    devolvidas em `erros` e não impedem a gravação das demais.
+    """
+    if len(lote.pesagens) > PESAGEM_LOTE_MAX:
+        raise HTTPException(status_code=400, detail=f"Máximo de {PESAGEM_LOTE_MAX} pesagens por lote")
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        hoje = datetime.now().date()
+        brincos = list({p.brinco for p in lote.pesagens if p.animal_id is None and p.brinco})
+        ids = list({p.animal_id for p in lote.pesagens if p.animal_id is not None})
+
+        # Resolve brincos e confere ids em duas consultas
+        id_por_brinco = {}
+        if brincos:
+            cur.execute("SELECT id, brinco FROM animais WHERE brinco = ANY(%s)", (brincos,))
+            id_por_brinco = {a['brinco']: a['id'] for a in cur.fetchall()}
+
+        ids_existentes = set()
+        if ids:
+            cur.execute("SELECT id FROM animais WHERE id = ANY(%s)", (ids,))
+            ids_existentes = {a['id'] for a in cur.fetchall()}
+
+        linhas = []
+        indices = []
+        erros = []
+
+        for indice, p in enumerate(lote.pesagens):
+            motivo = None
+            data_pesagem = hoje
+            if p.animal_id is not None:
+                animal_id = p.animal_id if p.animal_id in ids_existentes else None
+            else:
+                animal_id = id_por_brinco.get(p.brinco) if p.brinco else None
+
+            if p.animal_id is None and not p.brinco:
+                motivo = "Informe animal_id ou brinco"
+            elif animal_id is None:
+                motivo = "Animal não encontrado"
+            elif p.peso <= 0:
+                motivo = "Peso deve ser maior que zero"
+            elif p.condicao_corporal is not None and not 1 <= p.condicao_corporal <= 5:
+                motivo = "Condição corporal deve estar entre 1 e 5"
+            elif p.data_pesagem:
+                try:
+                    data_pesagem = date.fromisoformat(p.data_pesagem)
+                except ValueError:
+                    motivo = "Data de pesagem inválida (use AAAA-MM-DD)"
+
+            if motivo:
+                erros.append({"indice": indice, "animal_id": p.animal_id, "brinco": p.brinco, "erro": motivo})
+                continue
+
+            linhas.append((animal_id, p.peso, data_pesagem, p.condicao_corporal, p.observacoes))
+            indices.append(indice)
+
+        inseridas = []
+        if linhas:
+            # Um INSERT multi-linha por página de 1000 registros
+            resultado = execute_values(cur, """
+                INSERT INTO pesagens (
+                    animal_id, peso, data_pesagem, condicao_corporal, observacoes
+                ) VALUES %s
+                RETURNING id, animal_id
+            """, linhas, page_size=1000, fetch=True)
+
+            inseridas = [
+                {"indice": indice, "id": r['id'], "animal_id": r['animal_id']}
+                for indice, r in zip(indices, resultado)
+            ]
+
+            # Peso atual = última pesagem por data (lote pode trazer datas retroativas)
+            _atualizar_peso_atual(cur, {l[0] for l in linhas})
+
+        conn.commit()
+
+        return {
+            "total": len(lote.pesagens),
+            "inseridas": len(inseridas),
+            "com_erro": len(erros),
+            "pesagens": inseridas,
+            "erros": erros
+        }
+
+    except HTTPException:
+        raise
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    finally:
+        cur.close()
+        conn.close()
+
+
 @app.put("/api/pesagens/{pesagem_id}", tags=["⚖️ Pesagens"])
 def atualizar_pesagem(
     pesagem_id: int,
@@ -884,19 +2724,17 @@ def atualizar_pesagem(
             raise HTTPException(status_code=400, detail="Nenhum campo para atualizar")
         
         valores.append(pesagem_id)
-        sql = f"UPDATE pesagens SET {', '.join(campos)} WHERE id = %s RETURNING *"
+        sql = f"UPDATE pesagens SET {', '.join(campos)} WHERE id = %s"
         cur.execute(sql, valores)
         
+        # Peso ou data alterados mudam o peso atual e o GMD desta pesagem e
+        # da seguinte (recalculados pelo trigger ao fim do UPDATE)
+        if peso is not None or data_pesagem is not None:
+            _atualizar_peso_atual(cur, [pesagem_antiga['animal_id']])
+
+        cur.execute("SELECT * FROM pesagens WHERE id = %s", (pesagem_id,))
         pesagem_atualizada = cur.fetchone()
         
-        # Se peso foi alterado, atualiza peso_atual do animal
-        if peso is not None:
-            cur.execute("""
-                UPDATE animais 
-                SET peso_atual = %s 
-                WHERE id = %s
-            """, (peso, pesagem_antiga['animal_id']))
-        
         conn.commit()
         return dict(pesagem_atualizada)
     
@@ -915,10 +2753,12 @@ def deletar_pesagem(pesagem_id: int, user_data: dict = Depends(verify_token)):
     try:
         # Verifica se existe
         cur.execute("SELECT * FROM pesagens WHERE id = %s", (pesagem_id,))
-        if not cur.fetchone():
+        pesagem = cur.fetchone()
+        if not pesagem:
             raise HTTPException(status_code=404, detail="Pesagem não encontrada")
         
         cur.execute("DELETE FROM pesagens WHERE id = %s", (pesagem_id,))
+        _atualizar_peso_atual(cur, [pesagem['animal_id']])
         conn.commit()
         
         return {"message": "Pesagem deletada com sucesso"}
@@ -943,7 +2783,7 @@ def registrar_sanidade(sanidade: SanidadeCreate, user_data: dict = Depends(verif
             INSERT INTO sanidade (
                 animal_id, tipo, produto, dose, aplicador,
                 data_aplicacao, proxima_aplicacao, custo, observacoes
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
             RETURNING id
         """, (
             sanidade.animal_id, sanidade.tipo, sanidade.produto, sanidade.dose,
@@ -961,67 +2801,995 @@ def registrar_sanidade(sanidade: SanidadeCreate, user_data: dict = Depends(verif
         conn.close()
 
 @app.get("/api/sanidade/proximas", tags=["💉 Sanidade"])
-def listar_proximas_aplicacoes(dias: int = 30, user_data: dict = Depends(verify_token)):
-    """Lista próximas aplicações programadas"""
+def listar_proximas_aplicacoes(
+    dias: int = 30,
+    atrasadas: bool = True,
+    lote: Optional[str] = None,
+    tipo: Optional[str] = None,
+    produto: Optional[str] = None,
+    user_data: dict = Depends(verify_token)
+):
+    """
+    Calendário sanitário: doses pendentes até hoje + `dias`
+
+    Lê a agenda sanitária (só a dose pendente da aplicação mais recente de
+    cada produto por animal ativo) por faixa de data. Com `atrasadas`, inclui
+    as doses vencidas e não aplicadas. Devolve as doses e o resumo por lote
+    numa única chamada.
+    """
     conn = get_db_connection()
     cur = conn.cursor()
     
     try:
-        cur.execute("""
-            SELECT * FROM vw_aplicacoes_proximas 
-            WHERE dias_restantes <= %s
-            ORDER BY proxima_aplicacao
-        """, (dias,))
+        filtros = ["g.proxima_aplicacao <= CURRENT_DATE + %s"]
+        params = [dias]
+        if not atrasadas:
+            filtros.append("g.proxima_aplicacao >= CURRENT_DATE")
+        if lote:
+            filtros.append("a.lote = %s")
+            params.append(lote)
+        if tipo:
+            filtros.append("g.tipo = %s")
+            params.append(tipo)
+        if produto:
+            filtros.append("g.produto = %s")
+            params.append(produto)
+
+        cur.execute(f"""
+            SELECT g.sanidade_id AS id, g.animal_id, a.brinco, a.nome, a.lote, a.pasto,
+                   g.tipo, g.produto, g.data_aplicacao AS ultima_aplicacao,
+                   g.proxima_aplicacao,
+                   (g.proxima_aplicacao - CURRENT_DATE) AS dias_restantes
+            FROM sanidade_agenda g
+            INNER JOIN animais a ON a.id = g.animal_id
+            WHERE {' AND '.join(filtros)}
+            ORDER BY g.proxima_aplicacao, a.brinco
+        """, params)
         
         aplicacoes = cur.fetchall()
+
+        por_lote = {}
+        total_atrasadas = 0
+        for aplicacao in aplicacoes:
+            atrasada = aplicacao['dias_restantes'] < 0
+            aplicacao['atrasada'] = atrasada
+            total_atrasadas += atrasada
+            grupo = por_lote.setdefault(aplicacao['lote'], {
+                "lote": aplicacao['lote'], "total": 0, "atrasadas": 0, "no_prazo": 0,
+                "animais": set(), "proxima_aplicacao": aplicacao['proxima_aplicacao']
+            })
+            grupo['total'] += 1
+            grupo['atrasadas' if atrasada else 'no_prazo'] += 1
+            grupo['animais'].add(aplicacao['animal_id'])
+        for grupo in por_lote.values():
+            grupo['animais'] = len(grupo['animais'])
         
-        return {
+        return RespostaJSON({
             "total": len(aplicacoes),
-            "data": [dict(a) for a in aplicacoes]
+            "atrasadas": total_atrasadas,
+            "no_prazo": len(aplicacoes) - total_atrasadas,
+            "por_lote": sorted(por_lote.values(), key=lambda g: (-g['atrasadas'], g['lote'] or '')),
+            "data": aplicacoes
+        })
+    
+    finally:
+        cur.close()
+        conn.close()
+
+@app.post("/api/sanidade/campanhas", tags=["💉 Sanidade"], status_code=status.HTTP_201_CREATED)
+def criar_campanha_sanitaria(campanha: CampanhaSanitariaCreate, user_data: dict = Depends(verify_token)):
+    """
+    Aplica o mesmo registro de sanidade num conjunto de animais ativos.
+
+    Selecione por `animal_ids`, `lote`, `pasto` e/ou `categoria_id` (os
+    filtros se combinam) ou `todos=true`. Todos os registros são gravados
+    num único INSERT com o `campanha_id` devolvido, usado para consultar,
+    custear e desfazer a campanha.
+    """
+    selecao = campanha.model_dump(include={'animal_ids', 'lote', 'pasto', 'categoria_id'}, exclude_none=True)
+    if not selecao and not campanha.todos:
+        raise HTTPException(status_code=400, detail="Informe animal_ids, lote, pasto, categoria_id ou todos=true")
+
+    where = "status = 'ativo'"
+    params = []
+    if campanha.animal_ids is not None:
+        where += " AND id = ANY(%s)"
+        params.append(campanha.animal_ids)
+    if campanha.lote:
+        where += " AND lote = %s"
+        params.append(campanha.lote)
+    if campanha.pasto:
+        where += " AND pasto = %s"
+        params.append(campanha.pasto)
+    if campanha.categoria_id is not None:
+        where += " AND categoria_id = %s"
+        params.append(campanha.categoria_id)
+
+    data_aplicacao = campanha.data_aplicacao or datetime.now().date().isoformat()
+    nome = campanha.nome or f"{campanha.produto} {data_aplicacao}"
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("""
+            INSERT INTO campanhas_sanitarias (
+                nome, tipo, produto, dose, aplicador, data_aplicacao,
+                proxima_aplicacao, custo_unitario, observacoes, criterio, usuario_id
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING id
+        """, (
+            nome, campanha.tipo, campanha.produto, campanha.dose, campanha.aplicador,
+            data_aplicacao, campanha.proxima_aplicacao, campanha.custo, campanha.observacoes,
+            json.dumps(dict(selecao, todos=campanha.todos)), user_data['usuario_id']
+        ))
+        campanha_id = cur.fetchone()['id']
+
+        cur.execute(f"""
+            INSERT INTO sanidade (
+                animal_id, tipo, produto, dose, aplicador,
+                data_aplicacao, proxima_aplicacao, custo, observacoes, campanha_id
+            )
+            SELECT id, %s, %s, %s, %s, %s, %s, %s, %s, %s
+            FROM animais
+            WHERE {where}
+            ORDER BY id
+            RETURNING animal_id
+        """, [
+            campanha.tipo, campanha.produto, campanha.dose, campanha.aplicador,
+            data_aplicacao, campanha.proxima_aplicacao, campanha.custo,
+            campanha.observacoes, campanha_id
+        ] + params)
+        aplicados = {r['animal_id'] for r in cur.fetchall()}
+
+        if not aplicados:
+            conn.rollback()
+            raise HTTPException(status_code=400, detail="Nenhum animal ativo na seleção")
+
+        cur.execute(
+            "UPDATE campanhas_sanitarias SET total_animais = %s WHERE id = %s",
+            (len(aplicados), campanha_id)
+        )
+        conn.commit()
+
+        return {
+            "id": campanha_id,
+            "nome": nome,
+            "total_animais": len(aplicados),
+            "custo_total": round(campanha.custo * len(aplicados), 2) if campanha.custo is not None else None,
+            "nao_encontrados": sorted(set(campanha.animal_ids or []) - aplicados),
+            "message": f"Campanha aplicada em {len(aplicados)} animais"
         }
+
+    except HTTPException:
+        raise
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    finally:
+        cur.close()
+        conn.close()
+
+@app.get("/api/sanidade/campanhas", tags=["💉 Sanidade"])
+def listar_campanhas_sanitarias(limit: int = 50, user_data: dict = Depends(verify_token)):
+    """Lista as campanhas sanitárias mais recentes"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("""
+            SELECT c.*, u.nome AS usuario
+            FROM campanhas_sanitarias c
+            LEFT JOIN usuarios u ON u.id = c.usuario_id
+            ORDER BY c.data_aplicacao DESC, c.id DESC
+            LIMIT %s
+        """, (limit,))
+        campanhas = cur.fetchall()
+
+        return RespostaJSON({
+            "total": len(campanhas),
+            "data": campanhas
+        })
+
+    finally:
+        cur.close()
+        conn.close()
+
+@app.get("/api/sanidade/campanhas/{campanha_id}", tags=["💉 Sanidade"])
+def obter_campanha_sanitaria(
+    campanha_id: int,
+    incluir_animais: bool = False,
+    user_data: dict = Depends(verify_token)
+):
+    """
+    Campanha com aplicações e custo apurados nos registros de sanidade.
+
+    - **incluir_animais**: lista id e brinco de cada animal vacinado
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("""
+            SELECT c.*, u.nome AS usuario,
+                   COUNT(s.id) AS aplicacoes,
+                   SUM(s.custo) AS custo_total
+            FROM campanhas_sanitarias c
+            LEFT JOIN usuarios u ON u.id = c.usuario_id
+            LEFT JOIN sanidade s ON s.campanha_id = c.id
+            WHERE c.id = %s
+            GROUP BY c.id, u.nome
+        """, (campanha_id,))
+        campanha = cur.fetchone()
+
+        if not campanha:
+            raise HTTPException(status_code=404, detail="Campanha não encontrada")
+
+        resposta = dict(campanha)
+        if incluir_animais:
+            cur.execute("""
+                SELECT a.id, a.brinco, a.nome, s.id AS sanidade_id
+                FROM sanidade s
+                INNER JOIN animais a ON a.id = s.animal_id
+                WHERE s.campanha_id = %s
+                ORDER BY a.brinco
+            """, (campanha_id,))
+            resposta['animais'] = cur.fetchall()
+
+        return RespostaJSON(resposta)
+
+    finally:
+        cur.close()
+        conn.close()
+
+@app.delete("/api/sanidade/campanhas/{campanha_id}", tags=["💉 Sanidade"])
+def desfazer_campanha_sanitaria(campanha_id: int, user_data: dict = Depends(verify_token)):
+    """Desfaz a campanha: remove todos os registros de sanidade dela - Apenas admin e gerente"""
+    require_admin_or_gerente(user_data)
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("""
+            UPDATE campanhas_sanitarias SET desfeita_em = NOW()
+            WHERE id = %s AND desfeita_em IS NULL
+            RETURNING nome
+        """, (campanha_id,))
+        campanha = cur.fetchone()
+
+        if not campanha:
+            cur.execute("SELECT 1 FROM campanhas_sanitarias WHERE id = %s", (campanha_id,))
+            if cur.fetchone():
+                raise HTTPException(status_code=409, detail="Campanha já desfeita")
+            raise HTTPException(status_code=404, detail="Campanha não encontrada")
+
+        cur.execute("DELETE FROM sanidade WHERE campanha_id = %s", (campanha_id,))
+        removidos = cur.rowcount
+        conn.commit()
+
+        return {
+            "id": campanha_id,
+            "removidos": removidos,
+            "message": f"Campanha {campanha['nome']} desfeita ({removidos} registros removidos)"
+        }
+
+    finally:
+        cur.close()
+        conn.close()
+
+# ==================== ENDPOINTS DE RELATÓRIOS ====================
+
+@app.get("/api/relatorios/resumo", tags=["📊 Relatórios"])
+def relatorio_resumo(user_data: dict = Depends(verify_token)):
+    """
+    Relatório resumo do rebanho (lido de rebanho_resumo, sem varrer animais).
+
+    `defasagem_max_segundos` é o limite de atraso do resumo em relação às
+    últimas escritas; `pendente` indica alterações ainda não refletidas.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    try:
+        cur.execute(
+            """SELECT r.*, fn_versao_rebanho() > r.versao_resumida AS pendente
+               FROM fn_obter_resumo_rebanho(make_interval(secs => %s), make_interval(secs => %s)) r""",
+            (RESUMO_REBANHO_DEBOUNCE, RESUMO_REBANHO_TTL)
+        )
+        resumo = cur.fetchone()
+        conn.commit()
+        
+        if not resumo or resumo['id'] is None:
+            return {}
+
+        resumo = dict(resumo)
+        resumo.pop('id')
+        resumo.pop('versao_resumida')
+        resumo['defasagem_max_segundos'] = RESUMO_REBANHO_DEBOUNCE if resumo['pendente'] else RESUMO_REBANHO_TTL
+        return RespostaJSON(resumo)
     
     finally:
         cur.close()
         conn.close()
 
-# ==================== ENDPOINTS DE RELATÓRIOS ====================
+@app.get("/api/relatorios/performance", tags=["📊 Relatórios"])
+def relatorio_performance(limit: int = 50, user_data: dict = Depends(verify_token)):
+    """Relatório de performance (GMD)"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    try:
+        cur.execute("""
+            SELECT * FROM vw_performance_animais 
+            ORDER BY gmd DESC 
+            LIMIT %s
+        """, (limit,))
+        
+        performance = cur.fetchall()
+        
+        return RespostaJSON({
+            "total": len(performance),
+            "data": performance
+        })
+    
+    finally:
+        cur.close()
+        conn.close()
+
+# ==================== ENDPOINTS DE EXPORTAÇÃO ====================
+
+# Linhas buscadas por vez do cursor do servidor nas exportações
+EXPORT_ITERSIZE = 2000
+XLSX_MAX_LINHAS = 1048576
+
+COLUNAS_EXPORT_ANIMAIS = [
+    'id', 'brinco', 'nome', 'sexo', 'raca', 'data_nascimento', 'peso_nascimento',
+    'peso_atual', 'ultimo_peso', 'data_ultimo_peso', 'status', 'status_reprodutivo',
+    'lote', 'pasto', 'mae_id', 'pai_id', 'data_entrada', 'origem', 'observacoes'
+]
+
+COLUNAS_EXPORT_PESAGENS = [
+    'id', 'animal_id', 'brinco', 'nome', 'data_pesagem', 'peso', 'ganho_peso', 'gmd',
+    'condicao_corporal', 'observacoes'
+]
+
+def _linhas_exportacao(query: str, params: list, colunas: list, nome_cursor: str):
+    """
+    Lê as linhas de um cursor do servidor, EXPORT_ITERSIZE por vez.
+
+    Como em _stream_animais, a conexão só sai do pool quando a
+    transmissão começa e volta ao fim ou se o cliente desconectar.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor(name=nome_cursor)
+    cur.itersize = EXPORT_ITERSIZE
+    try:
+        cur.execute(query, params)
+        for linha in cur:
+            yield [linha[c] for c in colunas]
+    finally:
+        cur.close()
+        conn.close()
+
+def _stream_csv(linhas, colunas: list):
+    """CSV em UTF-8 com BOM (acentos corretos no Excel), enviado em blocos"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    buffer.write('\ufeff')
+    escritor.writerow(colunas)
+    for i, linha in enumerate(linhas, 1):
+        escritor.writerow(linha)
+        if i % EXPORT_ITERSIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def _stream_xlsx(linhas, colunas: list, titulo: str):
+    """
+    XLSX com workbook write-only do openpyxl: as linhas vão direto para
+    arquivos temporários, então a memória não cresce com o tamanho da
+    exportação. O zip final só existe após save(), e é enviado em blocos.
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = None
+    na_aba = XLSX_MAX_LINHAS
+    abas = 0
+    for linha in linhas:
+        if na_aba >= XLSX_MAX_LINHAS:
+            abas += 1
+            ws = wb.create_sheet(titulo if abas == 1 else f"{titulo} ({abas})")
+            ws.append(colunas)
+            na_aba = 1
+        ws.append(linha)
+        na_aba += 1
+    if ws is None:
+        wb.create_sheet(titulo).append(colunas)
+
+    with tempfile.TemporaryFile() as arquivo:
+        wb.save(arquivo)
+        arquivo.seek(0)
+        while True:
+            bloco = arquivo.read(64 * 1024)
+            if not bloco:
+                break
+            yield bloco
+
+def _resposta_exportacao(query: str, params: list, colunas: list, formato: str, nome: str):
+    """StreamingResponse em CSV ou XLSX a partir da query"""
+    if formato not in ("csv", "xlsx"):
+        raise HTTPException(status_code=400, detail="formato deve ser 'csv' ou 'xlsx'")
+
+    linhas = _linhas_exportacao(query, params, colunas, f"export_{nome}")
+    arquivo = f"{nome}_{date.today().isoformat()}.{formato}"
+    headers = {"Content-Disposition": f'attachment; filename="{arquivo}"'}
+
+    if formato == "csv":
+        return StreamingResponse(_stream_csv(linhas, colunas), media_type="text/csv; charset=utf-8", headers=headers)
+
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Exportação XLSX requer o pacote openpyxl")
+    return StreamingResponse(
+        _stream_xlsx(linhas, colunas, nome),
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers=headers
+    )
+
+@app.get("/api/export/animais", tags=["📊 Relatórios"])
+def exportar_animais(
+    formato: str = "csv",
+    status: Optional[str] = None,
+    lote: Optional[str] = None,
+    pasto: Optional[str] = None,
+    user_data: dict = Depends(verify_token)
+):
+    """Exporta o rebanho ativo em CSV ou XLSX (transmitido sem carregar tudo em memória)"""
+    where, params = _filtros_animais(status, lote, pasto)
+    query = f"SELECT {', '.join(COLUNAS_EXPORT_ANIMAIS)} FROM vw_rebanho_ativo WHERE {where} ORDER BY brinco"
+    return _resposta_exportacao(query, params, COLUNAS_EXPORT_ANIMAIS, formato, "animais")
+
+@app.get("/api/export/pesagens", tags=["📊 Relatórios"])
+def exportar_pesagens(
+    formato: str = "csv",
+    animal_id: Optional[int] = None,
+    data_inicio: Optional[date] = None,
+    data_fim: Optional[date] = None,
+    user_data: dict = Depends(verify_token)
+):
+    """Exporta o histórico de pesagens em CSV ou XLSX (transmitido sem carregar tudo em memória)"""
+    where = ["TRUE"]
+    params = []
+
+    if animal_id is not None:
+        where.append("p.animal_id = %s")
+        params.append(animal_id)
+
+    if data_inicio:
+        where.append("p.data_pesagem >= %s")
+        params.append(data_inicio)
+
+    if data_fim:
+        where.append("p.data_pesagem <= %s")
+        params.append(data_fim)
+
+    # Ordem de idx_pesagens_animal_data: o cursor entrega sem ordenar tudo antes
+    query = f"""
+        SELECT p.id, p.animal_id, a.brinco, a.nome, p.data_pesagem, p.peso, p.ganho_peso,
+               p.gmd, p.condicao_corporal, p.observacoes
+        FROM pesagens p
+        INNER JOIN animais a ON a.id = p.animal_id
+        WHERE {' AND '.join(where)}
+        ORDER BY p.animal_id, p.data_pesagem, p.id
+    """
+    return _resposta_exportacao(query, params, COLUNAS_EXPORT_PESAGENS, formato, "pesagens")
+
+# ==================== RELATÓRIOS PDF (SEGUNDO PLANO) ====================
+
+class JobsRelatoriosPDF:
+    """
+    Fila de relatórios PDF: um ProcessPoolExecutor (spawn) renderiza fora
+    dos workers da API e o estado/resultado de cada job fica em disco, então
+    qualquer worker responde ao polling e ao download.
+
+    PDFs concluídos expiram após `ttl` segundos; jobs processando há mais de
+    `timeout` (contado de iniciado_em) ou que ficaram na fila mais do que a
+    fila cheia levaria para andar (ex.: processo reiniciado) são marcados
+    como erro.
+    """
+
+    def __init__(self, diretorio: str, workers: int = 2, ttl: float = 3600,
+                 timeout: float = 900, max_fila: int = 20):
+        self.diretorio = diretorio
+        self.workers = max(workers, 1)
+        self.ttl = ttl
+        self.timeout = timeout
+        self.max_fila = max_fila
+        self._lock = threading.Lock()
+        self._executor = None
+        self._em_fila = 0
+        self._ultima_limpeza = 0.0
+
+    def _obter_executor(self):
+        if self._executor is None:
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+    def submeter(self, tipo: str, params: dict, usuario_id: int) -> dict:
+        os.makedirs(self.diretorio, exist_ok=True)
+        self.limpar_expirados()
+
+        job = {
+            'id': secrets.token_hex(16),
+            'tipo': tipo,
+            'parametros': params,
+            'usuario_id': usuario_id,
+            'status': 'pendente',
+            'criado_em': agora_iso()
+        }
+
+        with self._lock:
+            if self._em_fila >= self.max_fila:
+                raise HTTPException(status_code=429, detail="Fila de relatórios cheia, tente novamente em instantes")
+            gravar_job(self.diretorio, job)
+            try:
+                futuro = self._obter_executor().submit(
+                    renderizar_relatorio_pdf, self.diretorio, job['id'], tipo, params, DB_CONFIG, self.timeout
+                )
+            except concurrent.futures.process.BrokenProcessPool:
+                # Um processo morreu (ex.: falta de memória): recria o pool
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+                futuro = self._obter_executor().submit(
+                    renderizar_relatorio_pdf, self.diretorio, job['id'], tipo, params, DB_CONFIG, self.timeout
+                )
+            self._em_fila += 1
+
+        futuro.add_done_callback(lambda f, job_id=job['id']: self._finalizado(job_id, f))
+        return job
+
+    def _finalizado(self, job_id: str, futuro):
+        with self._lock:
+            self._em_fila -= 1
+        erro = futuro.exception() if not futuro.cancelled() else None
+        if futuro.cancelled() or erro is not None:
+            job = ler_job(self.diretorio, job_id)
+            if job and job['status'] in ('pendente', 'processando'):
+                job.update({
+                    'status': 'erro',
+                    'concluido_em': agora_iso(),
+                    'erro': str(erro) if erro else 'Cancelado'
+                })
+                gravar_job(self.diretorio, job)
+
+    def obter(self, job_id: str) -> Optional[dict]:
+        if not RE_JOB_ID.match(job_id):
+            return None
+        job = ler_job(self.diretorio, job_id)
+        if job is None:
+            return None
+        return self._verificar_validade(job)
+
+    def _verificar_validade(self, job: dict) -> Optional[dict]:
+        """Expira PDFs antigos e marca como erro jobs que nunca terminaram"""
+        agora = datetime.now()
+        if job['status'] in ('concluido', 'erro'):
+            if (agora - datetime.fromisoformat(job['concluido_em'])).total_seconds() > self.ttl:
+                self._remover(job['id'])
+                return None
+        elif job['status'] == 'processando':
+            if (agora - datetime.fromisoformat(job['iniciado_em'])).total_seconds() > self.timeout:
+                job.update({'status': 'erro', 'concluido_em': agora_iso(), 'erro': 'Tempo limite excedido'})
+                gravar_job(self.diretorio, job)
+        elif (agora - datetime.fromisoformat(job['criado_em'])).total_seconds() > self._espera_max_fila():
+            job.update({'status': 'erro', 'concluido_em': agora_iso(), 'erro': 'Tempo limite excedido'})
+            gravar_job(self.diretorio, job)
+        return job
+
+    def _espera_max_fila(self) -> float:
+        """Quanto um job pode esperar na fila: a fila cheia andando com todos os processos"""
+        return self.timeout * (-(-self.max_fila // self.workers) + 1)
+
+    def caminho_pdf(self, job_id: str) -> str:
+        return os.path.join(self.diretorio, f"{job_id}.pdf")
+
+    def _remover(self, job_id: str):
+        for ext in ('pdf', 'json'):
+            try:
+                os.remove(os.path.join(self.diretorio, f"{job_id}.{ext}"))
+            except FileNotFoundError:
+                pass
+
+    def limpar_expirados(self, intervalo: float = 60):
+        """Remove do disco os jobs expirados (no máximo a cada `intervalo` segundos)"""
+        agora = time.monotonic()
+        with self._lock:
+            if agora - self._ultima_limpeza < intervalo:
+                return
+            self._ultima_limpeza = agora
+        try:
+            nomes = os.listdir(self.diretorio)
+        except FileNotFoundError:
+            return
+        for nome in nomes:
+            if nome.endswith('.json') and RE_JOB_ID.match(nome[:-5]):
+                job = ler_job(self.diretorio, nome[:-5])
+                if job is not None:
+                    self._verificar_validade(job)
+
+    def fechar(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+jobs_relatorios_pdf = JobsRelatoriosPDF(
+    RELATORIOS_PDF_DIR, workers=RELATORIOS_PDF_WORKERS, ttl=RELATORIOS_PDF_TTL,
+    timeout=RELATORIOS_PDF_TIMEOUT, max_fila=RELATORIOS_PDF_MAX_FILA
+)
+
+@app.on_event("shutdown")
+def fechar_jobs_relatorios_pdf():
+    """Encerra o pool de processos dos relatórios PDF"""
+    jobs_relatorios_pdf.fechar()
+
+def _job_pdf_do_usuario(job_id: str, user_data: dict) -> dict:
+    job = jobs_relatorios_pdf.obter(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Relatório não encontrado ou expirado")
+    if job['usuario_id'] != user_data['usuario_id'] and not can_edit(user_data):
+        raise HTTPException(status_code=404, detail="Relatório não encontrado ou expirado")
+    return job
+
+@app.post("/api/relatorios/pdf", tags=["📊 Relatórios"], status_code=status.HTTP_202_ACCEPTED)
+def solicitar_relatorio_pdf(relatorio: RelatorioPDFCreate, user_data: dict = Depends(verify_token)):
+    """
+    Agenda a geração de um relatório PDF (performance, sanidade, reproducao
+    ou completo). Acompanhe em GET /api/relatorios/pdf/{job_id}.
+    """
+    job = jobs_relatorios_pdf.submeter(
+        relatorio.tipo, {'dias': relatorio.dias, 'limite': relatorio.limite}, user_data['usuario_id']
+    )
+    return dict(job, download=f"/api/relatorios/pdf/{job['id']}/download")
+
+@app.get("/api/relatorios/pdf/{job_id}", tags=["📊 Relatórios"])
+def status_relatorio_pdf(job_id: str, user_data: dict = Depends(verify_token)):
+    """Estado de um relatório PDF: pendente, processando, concluido ou erro"""
+    job = _job_pdf_do_usuario(job_id, user_data)
+    return dict(job, download=f"/api/relatorios/pdf/{job['id']}/download")
+
+@app.get("/api/relatorios/pdf/{job_id}/download", tags=["📊 Relatórios"])
+def baixar_relatorio_pdf(job_id: str, user_data: dict = Depends(verify_token)):
+    """Baixa o PDF de um relatório concluído"""
+    job = _job_pdf_do_usuario(job_id, user_data)
+    if job['status'] == 'erro':
+        raise HTTPException(status_code=500, detail=f"Falha ao gerar relatório: {job.get('erro')}")
+    if job['status'] != 'concluido':
+        raise HTTPException(status_code=409, detail=f"Relatório ainda {job['status']}")
+    return FileResponse(
+        jobs_relatorios_pdf.caminho_pdf(job['id']),
+        media_type="application/pdf",
+        filename=f"relatorio_{job['tipo']}_{job['criado_em'][:10]}.pdf"
+    )
+
+# ==================== SINCRONIZAÇÃO (APP OFFLINE) ====================
+
+# Tabelas replicadas no app (triggers do sync_log na migração v3, seção 7)
+TABELAS_SYNC = ('animais', 'pesagens', 'sanidade', 'eventos_reprodutivos', 'lotes', 'pastos')
+
+def _ler_cursor_sync(since: Optional[str]):
+    """
+    Cursor 'xid:id:horizonte' devolvido pela chamada anterior.
+
+    O horizonte é o sync_horizonte.log_id visto quando o cursor foi emitido;
+    None = desde o início.
+    """
+    if not since:
+        return 0, 0, None
+    try:
+        xid, log_id, horizonte = (int(parte) for parte in since.split(':'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor de sincronização inválido")
+    if xid < 0 or log_id < 0 or horizonte < 0:
+        raise HTTPException(status_code=400, detail="Cursor de sincronização inválido")
+    return xid, log_id, horizonte
+
+@app.get("/api/sync", tags=["🔄 Sincronização"])
+def sincronizar(
+    since: Optional[str] = None,
+    limit: int = SYNC_LIMITE,
+    user_data: dict = Depends(verify_token)
+):
+    """
+    Alterações desde o último cursor, para a réplica local do app offline.
+
+    - **since**: `cursor` da resposta anterior; sem ele, devolve a base inteira
+      (paginada)
+    - **alterados**: estado atual de cada registro criado/alterado, por tabela
+    - **removidos**: ids excluídos (tombstones), por tabela
+    - **tem_mais**: chame de novo com o novo `cursor` até vir `false`
+
+    Responde 410 quando exclusões além do cursor foram compactadas desde a
+    chamada anterior; o app deve descartar a réplica e sincronizar sem `since`.
+    """
+    cursor_xid, cursor_id, cursor_horizonte = _ler_cursor_sync(since)
+    limit = max(1, min(limit, SYNC_LIMITE))
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        # Log e registros lidos do mesmo snapshot
+        cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+
+        # Exclusões compactadas depois da última chamada e além do cursor
+        # não chegaram ao cliente: só então o cursor expira
+        cur.execute("""
+            SELECT log_id, (%s::text::xid8, %s::bigint) < (xid, log_id) AS atras
+            FROM sync_horizonte WHERE id = 1
+        """, (cursor_xid, cursor_id))
+        horizonte = cur.fetchone()
+        horizonte_id = horizonte['log_id'] if horizonte else 0
+        if since and horizonte and horizonte['atras'] and horizonte_id != cursor_horizonte:
+            raise HTTPException(
+                status_code=410,
+                detail="Cursor expirado; sincronize novamente sem 'since'"
+            )
+
+        # Só transações abaixo do xmin do snapshot: todas já terminaram, então
+        # nenhuma entrada com xid menor aparece depois de o cursor avançar
+        cur.execute("""
+            SELECT id, xid::text AS xid_texto, tabela, registro_id
+            FROM sync_log
+            WHERE (xid, id) > (%s::text::xid8, %s::bigint)
+              AND xid < pg_snapshot_xmin(pg_current_snapshot())
+            ORDER BY xid, id
+            LIMIT %s
+        """, (cursor_xid, cursor_id, limit + 1))
+        entradas = cur.fetchall()
+
+        tem_mais = len(entradas) > limit
+        entradas = entradas[:limit]
+
+        ids_por_tabela = {}
+        for entrada in entradas:
+            ids_por_tabela.setdefault(entrada['tabela'], set()).add(entrada['registro_id'])
+
+        alterados = {}
+        removidos = {}
+        for tabela in TABELAS_SYNC:
+            ids = ids_por_tabela.get(tabela)
+            if not ids:
+                continue
+            cur.execute(f"SELECT * FROM {tabela} WHERE id = ANY(%s) ORDER BY id", (list(ids),))
+            linhas = cur.fetchall()
+            if linhas:
+                alterados[tabela] = linhas
+            ausentes = ids.difference(linha['id'] for linha in linhas)
+            if ausentes:
+                removidos[tabela] = sorted(ausentes)
+
+        conn.commit()
+
+        if entradas:
+            novo_cursor = f"{entradas[-1]['xid_texto']}:{entradas[-1]['id']}:{horizonte_id}"
+        else:
+            novo_cursor = f"{cursor_xid}:{cursor_id}:{horizonte_id}"
+
+        return RespostaJSON({
+            "cursor": novo_cursor,
+            "tem_mais": tem_mais,
+            "alterados": alterados,
+            "removidos": removidos
+        })
+
+    finally:
+        cur.close()
+        conn.close()
+
+MODELOS_MUTACAO_SYNC = {
+    'pesagem': PesagemCreate,
+    'sanidade': SanidadeCreate,
+    'movimentacao': MovimentacaoCreate,
+    'evento_reprodutivo': EventoReprodutivoCreate,
+}
+
+def _aplicar_mutacao_sync(cur, tipo: str, dados, usuario_id: int):
+    """Grava uma mutação do app offline e devolve o resultado guardado com a chave"""
+    hoje = datetime.now().date().isoformat()
+
+    if tipo == 'pesagem':
+        cur.execute("""
+            INSERT INTO pesagens (
+                animal_id, peso, data_pesagem, condicao_corporal, observacoes
+            ) VALUES (%s, %s, %s, %s, %s)
+            RETURNING id
+        """, (
+            dados.animal_id, dados.peso, dados.data_pesagem or hoje,
+            dados.condicao_corporal, dados.observacoes
+        ))
+        return {"id": cur.fetchone()['id']}
+
+    if tipo == 'sanidade':
+        cur.execute("""
+            INSERT INTO sanidade (
+                animal_id, tipo, produto, dose, aplicador,
+                data_aplicacao, proxima_aplicacao, custo, observacoes
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING id
+        """, (
+            dados.animal_id, dados.tipo, dados.produto, dados.dose, dados.aplicador,
+            dados.data_aplicacao or hoje, dados.proxima_aplicacao, dados.custo, dados.observacoes
+        ))
+        return {"id": cur.fetchone()['id']}
+
+    if tipo == 'movimentacao':
+        cur.execute("""
+            INSERT INTO movimentacoes (
+                animal_id, tipo, origem, destino, motivo, responsavel, data_movimentacao
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s)
+            RETURNING id
+        """, (
+            dados.animal_id, dados.tipo, dados.origem, dados.destino,
+            dados.motivo, dados.responsavel, dados.data_movimentacao or hoje
+        ))
+        mov_id = cur.fetchone()['id']
+        if dados.tipo == 'troca_pasto' and dados.destino:
+            cur.execute("UPDATE animais SET pasto = %s WHERE id = %s", (dados.destino, dados.animal_id))
+        elif dados.tipo == 'troca_lote' and dados.destino:
+            cur.execute("UPDATE animais SET lote = %s WHERE id = %s", (dados.destino, dados.animal_id))
+        return {"id": mov_id}
+
+    cur.execute("""
+        INSERT INTO eventos_reprodutivos
+        (animal_id, tipo_evento, data_evento, touro_id, bezerra_id, natimorto, observacoes, usuario_id)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        RETURNING id, data_prevista
+    """, (
+        dados.animal_id, dados.tipo_evento, dados.data_evento, dados.touro_id,
+        dados.bezerra_id, dados.natimorto, dados.observacoes, usuario_id
+    ))
+    evento = cur.fetchone()
+    return {"id": evento['id'], "data_prevista": evento['data_prevista']}
+
+@app.post("/api/sync/push", tags=["🔄 Sincronização"])
+def sincronizar_envio(envio: SyncPush, user_data: dict = Depends(verify_token)):
+    """
+    Aplica, em ordem e numa única transação, as mutações gravadas offline.
 
-@app.get("/api/relatorios/resumo", tags=["📊 Relatórios"])
-def relatorio_resumo(user_data: dict = Depends(verify_token)):
-    """Relatório resumo do rebanho"""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    try:
-        cur.execute("SELECT * FROM vw_resumo_rebanho")
-        resumo = cur.fetchone()
-        
-        return dict(resumo) if resumo else {}
-    
-    finally:
-        cur.close()
-        conn.close()
+    Cada mutação traz uma `chave` única gerada no aparelho. Chaves já
+    aplicadas (reenvio após queda de conexão) não gravam de novo: voltam com
+    `status` `duplicada` e o resultado original. Uma mutação inválida volta
+    com `status` `erro` sem impedir as demais, e a chave dela fica livre
+    para um novo envio.
+    """
+    if len(envio.mutacoes) > SYNC_PUSH_MAX:
+        raise HTTPException(status_code=400, detail=f"Máximo de {SYNC_PUSH_MAX} mutações por envio")
+
+    usuario_id = user_data['usuario_id']
 
-@app.get("/api/relatorios/performance", tags=["📊 Relatórios"])
-def relatorio_performance(limit: int = 50, user_data: dict = Depends(verify_token)):
-    """Relatório de performance (GMD)"""
     conn = get_db_connection()
     cur = conn.cursor()
-    
+
     try:
-        cur.execute("""
-            SELECT * FROM vw_performance_animais 
-            ORDER BY gmd DESC 
-            LIMIT %s
-        """, (limit,))
-        
-        performance = cur.fetchall()
-        
+        tipo_por_chave = {}
+        for m in envio.mutacoes:
+            tipo_por_chave.setdefault(m.chave, m.tipo)
+
+        # Reserva as chaves novas em ordem fixa: reenvios simultâneos do mesmo
+        # lote esperam um pelo outro (sem deadlock) em vez de gravar duas vezes
+        reservadas = set()
+        if tipo_por_chave:
+            reservadas = {r['chave'] for r in execute_values(cur, """
+                INSERT INTO sync_idempotencia (usuario_id, chave, tipo) VALUES %s
+                ON CONFLICT (usuario_id, chave) DO NOTHING
+                RETURNING chave
+            """, [(usuario_id, c, tipo_por_chave[c]) for c in sorted(tipo_por_chave)],
+                page_size=SYNC_PUSH_MAX, fetch=True)}
+
+        anteriores = {}
+        if len(reservadas) < len(tipo_por_chave):
+            cur.execute("""
+                SELECT chave, resultado FROM sync_idempotencia
+                WHERE usuario_id = %s AND chave = ANY(%s)
+            """, (usuario_id, [c for c in tipo_por_chave if c not in reservadas]))
+            anteriores = {r['chave']: r['resultado'] for r in cur.fetchall()}
+
+        resultados = []
+        processadas = {}
+        gravadas = []
+        liberadas = []
+        animais_pesados = set()
+        femeas_com_eventos = set()
+
+        for indice, m in enumerate(envio.mutacoes):
+            item = {"indice": indice, "chave": m.chave, "tipo": m.tipo}
+
+            if m.chave not in reservadas or m.chave in processadas:
+                anterior = processadas.get(m.chave)
+                if anterior is not None and anterior['status'] == 'erro':
+                    item.update(status="erro", erro=anterior['erro'])
+                else:
+                    resultado = anterior['resultado'] if anterior else anteriores.get(m.chave)
+                    item.update(status="duplicada", resultado=resultado)
+                resultados.append(item)
+                continue
+
+            try:
+                dados = MODELOS_MUTACAO_SYNC[m.tipo](**m.dados)
+            except ValidationError as e:
+                dados = None
+                erro = "; ".join(
+                    f"{'.'.join(str(c) for c in err['loc'])}: {err['msg']}" for err in e.errors()
+                )
+
+            if dados is not None:
+                cur.execute("SAVEPOINT mutacao_sync")
+                try:
+                    resultado = jsonable_encoder(_aplicar_mutacao_sync(cur, m.tipo, dados, usuario_id))
+                    cur.execute("RELEASE SAVEPOINT mutacao_sync")
+                except psycopg2.Error as e:
+                    cur.execute("ROLLBACK TO SAVEPOINT mutacao_sync")
+                    dados = None
+                    erro = e.diag.message_primary or str(e)
+
+            if dados is None:
+                item.update(status="erro", erro=erro)
+                liberadas.append(m.chave)
+            else:
+                item.update(status="aplicada", resultado=resultado)
+                gravadas.append((usuario_id, m.chave, json.dumps(resultado)))
+                if m.tipo == 'pesagem':
+                    animais_pesados.add(dados.animal_id)
+                elif m.tipo == 'evento_reprodutivo':
+                    femeas_com_eventos.add(dados.animal_id)
+
+            processadas[m.chave] = item
+            resultados.append(item)
+
+        # Peso atual = última pesagem por data (o app pode mandar datas retroativas)
+        if animais_pesados:
+            _atualizar_peso_atual(cur, animais_pesados)
+        if femeas_com_eventos:
+            recalcular_estado_reprodutivo(cur, femeas_com_eventos)
+
+        if gravadas:
+            execute_values(cur, """
+                UPDATE sync_idempotencia s SET resultado = v.resultado::jsonb
+                FROM (VALUES %s) AS v(usuario_id, chave, resultado)
+                WHERE s.usuario_id = v.usuario_id AND s.chave = v.chave
+            """, gravadas, page_size=SYNC_PUSH_MAX)
+
+        if liberadas:
+            cur.execute(
+                "DELETE FROM sync_idempotencia WHERE usuario_id = %s AND chave = ANY(%s)",
+                (usuario_id, liberadas)
+            )
+
+        conn.commit()
+
         return {
-            "total": len(performance),
-            "data": [dict(p) for p in performance]
+            "total": len(envio.mutacoes),
+            "aplicadas": sum(1 for r in resultados if r['status'] == 'aplicada'),
+            "duplicadas": sum(1 for r in resultados if r['status'] == 'duplicada'),
+            "com_erro": sum(1 for r in resultados if r['status'] == 'erro'),
+            "resultados": resultados
         }
-    
+
+    except HTTPException:
+        raise
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
     finally:
         cur.close()
         conn.close()
@@ -1043,7 +3811,7 @@ def registrar_movimentacao(
         cur.execute("""
             INSERT INTO movimentacoes (
                 animal_id, tipo, origem, destino, motivo, responsavel, data_movimentacao
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s)
             RETURNING id
         """, (
             movimentacao.animal_id, movimentacao.tipo, movimentacao.origem,
@@ -1076,15 +3844,115 @@ def registrar_movimentacao(
         cur.close()
         conn.close()
 
-# ==================== ENDPOINTS AUXILIARES ====================
+@app.post("/api/movimentacoes/lote", tags=["📦 Movimentações"], status_code=status.HTTP_201_CREATED)
+def registrar_movimentacoes_lote(
+    movimentacao: MovimentacaoLoteCreate,
+    user_data: dict = Depends(verify_token)
+):
+    """
+    Move vários animais de lote ou de pasto numa única transação.
+
+    Selecione por `animal_ids` e/ou por `lote`/`pasto` atuais (todos os
+    animais ativos que estão lá agora; os filtros se combinam). Um único
+    UPDATE move os animais e um INSERT ... SELECT grava o histórico em
+    `movimentacoes`. Animais já no destino não geram movimentação; ids
+    inexistentes ou inativos voltam em `nao_encontrados`.
+    """
+    if movimentacao.animal_ids is None and not movimentacao.lote and not movimentacao.pasto:
+        raise HTTPException(status_code=400, detail="Informe animal_ids, lote ou pasto")
+
+    # Nome (texto) e id do cadastro, como em animais
+    coluna, coluna_id, cadastro = (
+        ('pasto', 'pasto_id', 'pastos') if movimentacao.tipo == 'troca_pasto'
+        else ('lote', 'lote_id', 'lotes')
+    )
+
+    where = "status = 'ativo'"
+    params = []
+    if movimentacao.animal_ids is not None:
+        where += " AND id = ANY(%s)"
+        params.append(movimentacao.animal_ids)
+    if movimentacao.lote:
+        where += " AND lote = %s"
+        params.append(movimentacao.lote)
+    if movimentacao.pasto:
+        where += " AND pasto = %s"
+        params.append(movimentacao.pasto)
+
+    data_mov = movimentacao.data_movimentacao or datetime.now().date().isoformat()
 
-@app.get("/api/lotes", tags=["📍 Lotes e Pastos"])
-def listar_lotes(user_data: dict = Depends(verify_token)):
-    """Lista todos os lotes"""
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    
+    cur = conn.cursor()
+
     try:
+        cur.execute(f"""
+            WITH alvo AS (
+                SELECT id, {coluna} AS origem FROM animais
+                WHERE {where}
+                FOR UPDATE
+            ), movidos AS (
+                UPDATE animais a
+                SET {coluna} = %s,
+                    {coluna_id} = (SELECT c.id FROM {cadastro} c WHERE c.nome = %s ORDER BY c.id LIMIT 1),
+                    updated_at = NOW()
+                FROM alvo
+                WHERE a.id = alvo.id AND alvo.origem IS DISTINCT FROM %s
+                RETURNING a.id, alvo.origem
+            ), historico AS (
+                INSERT INTO movimentacoes (
+                    animal_id, tipo, origem, destino, motivo, responsavel, data_movimentacao
+                )
+                SELECT id, %s, origem, %s, %s, %s, %s FROM movidos
+                RETURNING id
+            )
+            SELECT (SELECT COUNT(*) FROM alvo) AS encontrados,
+                   (SELECT COUNT(*) FROM historico) AS movidos,
+                   (SELECT COALESCE(array_agg(x ORDER BY x), '{{}}')
+                    FROM unnest(%s::int[]) x
+                    WHERE x NOT IN (SELECT id FROM alvo)) AS nao_encontrados
+        """, params + [
+            movimentacao.destino, movimentacao.destino, movimentacao.destino,
+            movimentacao.tipo, movimentacao.destino, movimentacao.motivo,
+            movimentacao.responsavel, data_mov,
+            movimentacao.animal_ids or []
+        ])
+        resultado = cur.fetchone()
+        conn.commit()
+
+        return {
+            "encontrados": resultado['encontrados'],
+            "movidos": resultado['movidos'],
+            "ja_no_destino": resultado['encontrados'] - resultado['movidos'],
+            "nao_encontrados": resultado['nao_encontrados'],
+            "message": f"{resultado['movidos']} animais movidos para {movimentacao.destino}"
+        }
+
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    finally:
+        cur.close()
+        conn.close()
+
+# ==================== ENDPOINTS AUXILIARES ====================
+
+@app.get("/api/lotes", tags=["📍 Lotes e Pastos"])
+def listar_lotes(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    user_data: dict = Depends(verify_token)
+):
+    """Lista todos os lotes (cache de cadastros; aceita If-None-Match)"""
+    def carregar(cur):
+        # total_animais faz parte da resposta, então entra na versão
+        versao = _versao_linhas(cur, """
+            SELECT l.id || '.' || l.xmin || '.' || COUNT(a.id) AS versao
+            FROM lotes l
+            LEFT JOIN animais a ON l.nome = a.lote AND a.status = 'ativo'
+            WHERE l.status = 'ativo'
+            GROUP BY l.id
+        """)
         cur.execute("""
             SELECT l.*, COUNT(a.id) as total_animais
             FROM lotes l
@@ -1093,25 +3961,33 @@ def listar_lotes(user_data: dict = Depends(verify_token)):
             GROUP BY l.id
             ORDER BY l.nome
         """)
-        
         lotes = cur.fetchall()
-        
-        return {
+        return versao, {
             "total": len(lotes),
             "data": [dict(l) for l in lotes]
         }
-    
-    finally:
-        cur.close()
-        conn.close()
+
+    etag, lotes = cache_cadastros.obter("lotes", ('lotes', 'animais'), carregar)
+    nao_modificada = _resposta_nao_modificada(if_none_match, etag, response)
+    if nao_modificada:
+        return nao_modificada
+    return _resposta_json(lotes, response)
 
 @app.get("/api/pastos", tags=["📍 Lotes e Pastos"])
-def listar_pastos(user_data: dict = Depends(verify_token)):
-    """Lista todos os pastos"""
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    
-    try:
+def listar_pastos(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    user_data: dict = Depends(verify_token)
+):
+    """Lista todos os pastos (cache de cadastros; aceita If-None-Match)"""
+    def carregar(cur):
+        versao = _versao_linhas(cur, """
+            SELECT p.id || '.' || p.xmin || '.' || COUNT(a.id) AS versao
+            FROM pastos p
+            LEFT JOIN animais a ON p.nome = a.pasto AND a.status = 'ativo'
+            WHERE p.status != 'encerrado'
+            GROUP BY p.id
+        """)
         cur.execute("""
             SELECT p.*, COUNT(a.id) as total_animais
             FROM pastos p
@@ -1120,17 +3996,17 @@ def listar_pastos(user_data: dict = Depends(verify_token)):
             GROUP BY p.id
             ORDER BY p.nome
         """)
-        
         pastos = cur.fetchall()
-        
-        return {
+        return versao, {
             "total": len(pastos),
             "data": [dict(p) for p in pastos]
         }
-    
-    finally:
-        cur.close()
-        conn.close()
+
+    etag, pastos = cache_cadastros.obter("pastos", ('pastos', 'animais'), carregar)
+    nao_modificada = _resposta_nao_modificada(if_none_match, etag, response)
+    if nao_modificada:
+        return nao_modificada
+    return _resposta_json(pastos, response)
 
 
 
@@ -1143,25 +4019,32 @@ def listar_pastos(user_data: dict = Depends(verify_token)):
 # ============================================================
 
 @app.get("/api/racas", tags=["🧬 Raças"])
-async def listar_racas(ativo: Optional[bool] = None, user_data: dict = Depends(verify_token)):
-    """Listar todas as raças"""
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        if ativo is None:
-            cur.execute("SELECT * FROM racas WHERE ativo = true ORDER BY nome")
-        else:
-            cur.execute("SELECT * FROM racas WHERE ativo = %s ORDER BY nome", (ativo,))
-        racas = cur.fetchall()
-        return [dict(r) for r in racas]
-    finally:
-        cur.close()
-        conn.close()
+def listar_racas(
+    response: Response,
+    ativo: Optional[bool] = None,
+    if_none_match: Optional[str] = Header(None),
+    user_data: dict = Depends(verify_token)
+):
+    """Listar todas as raças (cache de cadastros; aceita If-None-Match)"""
+    ativo = True if ativo is None else ativo
+
+    def carregar(cur):
+        versao = _versao_linhas(cur, """
+            SELECT id || '.' || xmin AS versao FROM racas WHERE ativo = %s
+        """, (ativo,))
+        cur.execute("SELECT * FROM racas WHERE ativo = %s ORDER BY nome", (ativo,))
+        return versao, [dict(r) for r in cur.fetchall()]
+
+    etag, racas = cache_cadastros.obter(f"racas:{ativo}", ('racas',), carregar)
+    nao_modificada = _resposta_nao_modificada(if_none_match, etag, response)
+    if nao_modificada:
+        return nao_modificada
+    return _resposta_json(racas, response)
 
 @app.get("/api/racas/{raca_id}", tags=["🧬 Raças"])
-async def obter_raca(raca_id: int, user_data: dict = Depends(verify_token)):
+def obter_raca(raca_id: int, user_data: dict = Depends(verify_token)):
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur = conn.cursor()
     try:
         cur.execute("SELECT * FROM racas WHERE id = %s", (raca_id,))
         raca = cur.fetchone()
@@ -1173,10 +4056,10 @@ async def obter_raca(raca_id: int, user_data: dict = Depends(verify_token)):
         conn.close()
 
 @app.post("/api/racas", tags=["🧬 Raças"], status_code=status.HTTP_201_CREATED)
-async def criar_raca(nome: str = Body(...), descricao: Optional[str] = Body(None), origem: Optional[str] = Body(None), user_data: dict = Depends(verify_token)):
+def criar_raca(nome: str = Body(...), descricao: Optional[str] = Body(None), origem: Optional[str] = Body(None), user_data: dict = Depends(verify_token)):
     """Cadastrar nova raça (ou reativar se já existir inativa)"""
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur = conn.cursor()
     try:
         # Verificar se já existe uma raça com este nome (ativa ou inativa)
         cur.execute("SELECT * FROM racas WHERE nome = %s", (nome,))
@@ -1220,7 +4103,7 @@ async def criar_raca(nome: str = Body(...), descricao: Optional[str] = Body(None
 # Endpoint duplicado removido - usar apenas o endpoint GET /api/lotes da linha 763
 
 @app.post("/api/lotes-v2", tags=["📍 Lotes e Pastos"], status_code=status.HTTP_201_CREATED)
-async def criar_lote(nome: str = Body(...), descricao: Optional[str] = Body(None), 
+def criar_lote(nome: str = Body(...), descricao: Optional[str] = Body(None), 
                      capacidade: Optional[int] = None):
     """Cadastrar novo lote"""
     conn = get_db_connection()
@@ -1248,7 +4131,7 @@ async def criar_lote(nome: str = Body(...), descricao: Optional[str] = Body(None
 # Endpoint duplicado removido - usar apenas o endpoint GET /api/pastos da linha 790
 
 @app.post("/api/pastos-v2", tags=["📍 Lotes e Pastos"], status_code=status.HTTP_201_CREATED)
-async def criar_pasto(nome: str = Body(...), area_hectares: Optional[float] = None,
+def criar_pasto(nome: str = Body(...), area_hectares: Optional[float] = None,
                       tipo: Optional[str] = None, descricao: Optional[str] = None):
     """Cadastrar novo pasto"""
     conn = get_db_connection()
@@ -1275,35 +4158,42 @@ async def criar_pasto(nome: str = Body(...), area_hectares: Optional[float] = No
 # ============================================================
 
 @app.get("/api/touros", tags=["🐂 Touros"])
-async def listar_touros(ativo: Optional[bool] = None):
-    """Listar touros/reprodutores cadastrados"""
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        query = """
+def listar_touros(
+    response: Response,
+    ativo: Optional[bool] = None,
+    if_none_match: Optional[str] = Header(None)
+):
+    """Listar touros/reprodutores cadastrados (cache de cadastros; aceita If-None-Match)"""
+    ativo = True if ativo is None else ativo
+
+    def carregar(cur):
+        versao = _versao_linhas(cur, """
+            SELECT t.id || '.' || t.xmin || '.' || COALESCE(r.xmin::text, '') AS versao
+            FROM touros t
+            LEFT JOIN racas r ON t.raca_id = r.id
+            WHERE t.ativo = %s
+        """, (ativo,))
+        cur.execute("""
             SELECT t.id, t.brinco, t.nome, r.nome as raca, t.data_nascimento,
                    t.registro, t.ativo, t.observacoes
             FROM touros t
             LEFT JOIN racas r ON t.raca_id = r.id
-        """
-        if ativo is None:
-            query += " WHERE t.ativo = true"
-        else:
-            query += f" WHERE t.ativo = {ativo}"
-        query += " ORDER BY t.brinco"
+            WHERE t.ativo = %s
+            ORDER BY t.brinco
+        """, (ativo,))
+        return versao, [dict(t) for t in cur.fetchall()]
 
-        cur.execute(query)
-        touros = cur.fetchall()
-        return [dict(t) for t in touros]
-    finally:
-        cur.close()
-        conn.close()
+    etag, touros = cache_cadastros.obter(f"touros:{ativo}", ('touros', 'racas'), carregar)
+    nao_modificada = _resposta_nao_modificada(if_none_match, etag, response)
+    if nao_modificada:
+        return nao_modificada
+    return _resposta_json(touros, response)
 
 @app.post("/api/touros", tags=["🐂 Touros"], status_code=status.HTTP_201_CREATED)
-async def criar_touro(brinco: str = Body(...), nome: Optional[str] = Body(None), raca_id: Optional[int] = Body(None), registro: Optional[str] = Body(None), linhagem: Optional[str] = Body(None), user_data: dict = Depends(verify_token)):
+def criar_touro(brinco: str = Body(...), nome: Optional[str] = Body(None), raca_id: Optional[int] = Body(None), registro: Optional[str] = Body(None), linhagem: Optional[str] = Body(None), user_data: dict = Depends(verify_token)):
     """Cadastrar novo touro"""
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur = conn.cursor()
     try:
         cur.execute(
             "INSERT INTO touros (brinco, nome, raca_id, registro, linhagem) VALUES (%s, %s, %s, %s, %s) RETURNING *",
@@ -1324,21 +4214,22 @@ async def criar_touro(brinco: str = Body(...), nome: Optional[str] = Body(None),
 # ============================================================
 
 @app.get("/api/categorias", tags=["📋 Categorias"])
-async def listar_categorias():
-    """Listar categorias de animais (bezerro, novilha, etc)"""
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
+def listar_categorias(response: Response, if_none_match: Optional[str] = Header(None)):
+    """Listar categorias de animais (bezerro, novilha, etc) (cache de cadastros; aceita If-None-Match)"""
+    def carregar(cur):
+        versao = _versao_linhas(cur, "SELECT id || '.' || xmin AS versao FROM categorias")
         cur.execute("""
             SELECT id, nome, sexo, idade_min_meses, idade_max_meses, descricao, ordem
             FROM categorias
             ORDER BY ordem
         """)
-        cats = cur.fetchall()
-        return cats
-    finally:
-        cur.close()
-        conn.close()
+        return versao, [dict(c) for c in cur.fetchall()]
+
+    etag, categorias = cache_cadastros.obter("categorias", ('categorias',), carregar)
+    nao_modificada = _resposta_nao_modificada(if_none_match, etag, response)
+    if nao_modificada:
+        return nao_modificada
+    return _resposta_json(categorias, response)
 
 
 # ============================================================
@@ -1346,13 +4237,13 @@ async def listar_categorias():
 # ============================================================
 
 @app.put("/api/racas/{raca_id}", tags=["🧬 Raças"])
-async def atualizar_raca(raca_id: int, nome: Optional[str] = Body(None),
+def atualizar_raca(raca_id: int, nome: Optional[str] = Body(None),
                          descricao: Optional[str] = Body(None),
                          origem: Optional[str] = Body(None),
                          ativo: Optional[bool] = Body(None)):
     """Atualizar raça existente"""
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur = conn.cursor()
     try:
         updates = []
         params = []
@@ -1392,7 +4283,7 @@ async def atualizar_raca(raca_id: int, nome: Optional[str] = Body(None),
         conn.close()
 
 @app.delete("/api/racas/{raca_id}", tags=["🧬 Raças"])
-async def desativar_raca(raca_id: int, user_data: dict = Depends(verify_token)):
+def desativar_raca(raca_id: int, user_data: dict = Depends(verify_token)):
     """Desativar raça (soft delete) - Apenas admin e gerente"""
     require_admin_or_gerente(user_data)
 
@@ -1415,9 +4306,9 @@ async def desativar_raca(raca_id: int, user_data: dict = Depends(verify_token)):
 
 
 @app.get("/api/touros/{touro_id}", tags=["🐂 Touros"])
-async def obter_touro(touro_id: int, user_data: dict = Depends(verify_token)):
+def obter_touro(touro_id: int, user_data: dict = Depends(verify_token)):
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur = conn.cursor()
     try:
         cur.execute("SELECT * FROM touros WHERE id = %s", (touro_id,))
         touro = cur.fetchone()
@@ -1429,13 +4320,13 @@ async def obter_touro(touro_id: int, user_data: dict = Depends(verify_token)):
         conn.close()
 
 @app.put("/api/touros/{touro_id}", tags=["🐂 Touros"])
-async def atualizar_touro(touro_id: int, nome: Optional[str] = Body(None),
+def atualizar_touro(touro_id: int, nome: Optional[str] = Body(None),
                           raca_id: Optional[int] = Body(None),
                           ativo: Optional[bool] = Body(None),
                           observacoes: Optional[str] = Body(None)):
     """Atualizar touro existente"""
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur = conn.cursor()
     try:
         updates = []
         params = []
@@ -1480,7 +4371,7 @@ async def atualizar_touro(touro_id: int, nome: Optional[str] = Body(None),
 # ============================================================
 
 @app.post("/api/eventos-reprodutivos", tags=["👶 Reprodução"], status_code=status.HTTP_201_CREATED)
-async def criar_evento_reprodutivo(
+def criar_evento_reprodutivo(
     animal_id: int = Body(...),
     tipo_evento: str = Body(...),
     data_evento: date = Body(...),
@@ -1504,6 +4395,7 @@ async def criar_evento_reprodutivo(
         """, (animal_id, tipo_evento, data_evento, touro_id, bezerra_id, natimorto, observacoes, usuario_id))
         
         evento = cur.fetchone()
+        recalcular_estado_reprodutivo(cur, [animal_id])
         conn.commit()
 
         return {
@@ -1530,11 +4422,27 @@ async def criar_evento_reprodutivo(
         conn.close()
 
 @app.get("/api/eventos-reprodutivos/{animal_id}", tags=["👶 Reprodução"])
-async def listar_eventos_animal(animal_id: int):
-    """Listar histórico reprodutivo de um animal"""
+def listar_eventos_animal(
+    animal_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None)
+):
+    """Listar histórico reprodutivo de um animal (aceita If-None-Match)"""
     conn = get_db_connection()
     cur = conn.cursor()
     try:
+        versao = _versao_linhas(cur, """
+            SELECT er.id || '.' || er.xmin || '.' || COALESCE(t.xmin::text, '')
+                   || '.' || COALESCE(b.xmin::text, '') AS versao
+            FROM eventos_reprodutivos er
+            LEFT JOIN touros t ON er.touro_id = t.id
+            LEFT JOIN animais b ON er.bezerra_id = b.id
+            WHERE er.animal_id = %s
+        """, (animal_id,))
+        nao_modificada = _resposta_nao_modificada(if_none_match, _etag(versao), response)
+        if nao_modificada:
+            return nao_modificada
+
         cur.execute("""
             SELECT er.id, er.tipo_evento, er.data_evento, er.data_prevista,
                    t.brinco as touro, b.brinco as bezerra, er.natimorto, er.observacoes, er.created_at
@@ -1563,7 +4471,7 @@ async def listar_eventos_animal(animal_id: int):
 
 
 @app.put("/api/eventos-reprodutivos/{evento_id}", tags=["👶 Reprodução"])
-async def atualizar_evento_reprodutivo(
+def atualizar_evento_reprodutivo(
     evento_id: int,
     tipo_evento: Optional[str] = Body(None),
     data_evento: Optional[date] = Body(None),
@@ -1614,6 +4522,10 @@ async def atualizar_evento_reprodutivo(
         cur.execute(sql, valores)
         
         evento = cur.fetchone()
+        if not evento:
+            # Excluído entre a verificação e o UPDATE
+            raise HTTPException(status_code=404, detail="Evento não encontrado")
+        recalcular_estado_reprodutivo(cur, [evento['animal_id']])
         conn.commit()
         
         return {
@@ -1634,7 +4546,7 @@ async def atualizar_evento_reprodutivo(
         conn.close()
 
 @app.delete("/api/eventos-reprodutivos/{evento_id}", tags=["👶 Reprodução"])
-async def deletar_evento_reprodutivo(evento_id: int, user_data: dict = Depends(verify_token)):
+def deletar_evento_reprodutivo(evento_id: int, user_data: dict = Depends(verify_token)):
     """Deleta evento reprodutivo - Apenas admin e gerente"""
     require_admin_or_gerente(user_data)
 
@@ -1643,11 +4555,12 @@ async def deletar_evento_reprodutivo(evento_id: int, user_data: dict = Depends(v
 
     try:
         # Verifica se existe
-        cur.execute("SELECT * FROM eventos_reprodutivos WHERE id = %s", (evento_id,))
-        if not cur.fetchone():
+        cur.execute("DELETE FROM eventos_reprodutivos WHERE id = %s RETURNING animal_id", (evento_id,))
+        evento = cur.fetchone()
+        if not evento:
             raise HTTPException(status_code=404, detail="Evento não encontrado")
-        
-        cur.execute("DELETE FROM eventos_reprodutivos WHERE id = %s", (evento_id,))
+
+        recalcular_estado_reprodutivo(cur, [evento['animal_id']])
         conn.commit()
         
         return {"message": "Evento reprodutivo deletado com sucesso"}
@@ -1656,16 +4569,297 @@ async def deletar_evento_reprodutivo(evento_id: int, user_data: dict = Depends(v
         cur.close()
         conn.close()
 
+@app.post("/api/reproducao/estado/recalcular", tags=["👶 Reprodução"])
+def recalcular_estado_rebanho(user_data: dict = Depends(verify_token)):
+    """
+    Recalcula o estado reprodutivo de todas as fêmeas de uma vez - Apenas admin e gerente
+
+    Use depois de importar eventos direto no banco ou de aplicar a migração.
+    """
+    require_admin_or_gerente(user_data)
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        inicio = time.perf_counter()
+        resultado = recalcular_estado_reprodutivo(cur)
+        conn.commit()
+        return dict(resultado, duracao_ms=round((time.perf_counter() - inicio) * 1000, 1))
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+
+# ============================================================
+# GENEALOGIA
+# ============================================================
+
+def _no_genealogia(genealogia: Genealogia, animal_id: int) -> int:
+    no = genealogia.indice_animal.get(animal_id)
+    if no is None:
+        raise HTTPException(status_code=404, detail="Animal não encontrado")
+    return no
+
+@app.get("/api/genealogia/{animal_id}", tags=["🌳 Genealogia"])
+def genealogia_animal(animal_id: int, geracoes: int = 3, user_data: dict = Depends(verify_token)):
+    """
+    Ancestrais e descendentes do animal até `geracoes` gerações
+
+    Cada parente traz a geração mais próxima, o número de caminhos até ele
+    (mais de um = consanguinidade) e o coeficiente de consanguinidade.
+    """
+    geracoes = max(1, min(geracoes, GENEALOGIA_MAX_GERACOES))
+    genealogia = obter_genealogia()
+    no = _no_genealogia(genealogia, animal_id)
+
+    def parentes(lista):
+        lista.sort(key=lambda p: (p[1], genealogia.info[p[0]]['brinco']))
+        return [dict(genealogia.descrever(n), geracao=g, caminhos=c) for n, g, c in lista]
+
+    return RespostaJSON({
+        "animal": genealogia.descrever(no),
+        "geracoes": geracoes,
+        "ancestrais": parentes(genealogia.ancestrais(no, geracoes)),
+        "descendentes": parentes(genealogia.descendentes(no, geracoes))
+    })
+
+@app.get("/api/genealogia/{animal_id}/touros", tags=["🌳 Genealogia"])
+def parentesco_touros(animal_id: int, user_data: dict = Depends(verify_token)):
+    """
+    Parentesco da fêmea com cada touro ativo, do menos para o mais aparentado
+
+    `coancestria` é também a consanguinidade esperada do bezerro do
+    acasalamento (0,0625 = primos; 0,125 = meio-irmãos; 0,25 = pai e filha).
+    """
+    genealogia = obter_genealogia()
+    no = _no_genealogia(genealogia, animal_id)
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT t.id, t.brinco, t.nome, r.nome AS raca, t.linhagem
+            FROM touros t
+            LEFT JOIN racas r ON t.raca_id = r.id
+            WHERE t.ativo = TRUE
+        """)
+        touros = [dict(t) for t in cur.fetchall()]
+    finally:
+        cur.close()
+        conn.close()
+
+    nos_touros = [genealogia.indice_touro.get(t['id'], -1) for t in touros]
+    for touro, coancestria in zip(touros, genealogia.parentesco([no], nos_touros)[0]):
+        touro['coancestria'] = round(coancestria, 6)
+    touros.sort(key=lambda t: (t['coancestria'], t['brinco']))
+
+    return RespostaJSON({"animal": genealogia.descrever(no), "touros": touros})
+
+
+# ============================================================
+# PLANO DE ACASALAMENTO
+# ============================================================
+
+# Peso de cada critério na pontuação (0 a 1) de um par fêmea x touro
+PESOS_ACASALAMENTO = {'parentesco': 0.5, 'raca': 0.3, 'desempenho': 0.2}
+# Inseminações "virtuais" com a taxa média do rebanho somadas ao histórico
+# de cada touro: touro com poucas inseminações fica perto da média
+ACASALAMENTO_PESO_MEDIA = 10
+
+@app.get("/api/reproducao/plano-acasalamento", tags=["👶 Reprodução"])
+def plano_acasalamento(
+    data_cobertura: Optional[date] = None,
+    limite_coancestria: float = Query(0.0625, ge=0, le=1),
+    max_por_touro: Optional[int] = Query(None, ge=1),
+    incluir_recem_paridas: bool = False,
+    lote: Optional[str] = None,
+    alternativas: int = Query(3, ge=0, le=10),
+    user_data: dict = Depends(verify_token)
+):
+    """
+    Plano de acasalamento da estação: um touro ativo para cada fêmea vazia
+
+    Todas as fêmeas de v_femeas_reprodutivas (vazias e, opcionalmente,
+    recém-paridas) contra todos os touros ativos, numa matriz:
+
+    - **parentesco**: coancestria da genealogia (= consanguinidade esperada
+      do bezerro); pares acima de `limite_coancestria` são descartados
+    - **raça**: mesma raça 1, raça desconhecida 0,5, cruzamento 0
+    - **desempenho**: bezerros nascidos vivos por inseminação do touro no
+      histórico (partos e abortos atribuídos à última inseminação antes
+      deles), puxada para a média do rebanho quando há pouco histórico
+
+    `max_por_touro` limita as fêmeas por touro (monta natural); sem ele,
+    cada fêmea fica com o seu melhor touro. A data prevista de parto vem de
+    fn_data_prevista_parto(data_cobertura).
+    """
+    status_aceitos = ['vazia', 'recem_parida'] if incluir_recem_paridas else ['vazia']
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT COALESCE(%s, CURRENT_DATE) AS data_cobertura", (data_cobertura,))
+        data_cobertura = cur.fetchone()['data_cobertura']
+        cur.execute("SELECT fn_data_prevista_parto(%s) AS data_prevista_parto", (data_cobertura,))
+        data_prevista_parto = cur.fetchone()['data_prevista_parto']
+
+        filtro_lote = "AND a.lote = %s" if lote else ""
+        cur.execute(f"""
+            SELECT f.id, f.brinco, f.nome, f.raca, a.raca_id, a.lote, f.status_reprodutivo
+            FROM v_femeas_reprodutivas f
+            INNER JOIN animais a ON a.id = f.id
+            WHERE a.status = 'ativo'
+              AND f.status_reprodutivo = ANY(%s)
+              {filtro_lote}
+        """, [status_aceitos] + ([lote] if lote else []))
+        femeas = cur.fetchall()
+
+        # Histórico de cada touro: só inseminações com tempo de ter dado parto
+        cur.execute("""
+            WITH inseminacoes AS (
+                SELECT touro_id, COUNT(*) AS inseminacoes
+                FROM eventos_reprodutivos
+                WHERE tipo_evento = 'inseminacao'
+                  AND touro_id IS NOT NULL
+                  AND data_evento <= CURRENT_DATE - %(gestacao)s
+                GROUP BY touro_id
+            ),
+            desfechos AS (
+                SELECT ia.touro_id,
+                       COUNT(*) FILTER (WHERE e.tipo_evento = 'parto' AND NOT COALESCE(e.natimorto, FALSE)) AS nascidos_vivos,
+                       COUNT(*) FILTER (WHERE e.tipo_evento = 'parto' AND e.natimorto) AS natimortos,
+                       COUNT(*) FILTER (WHERE e.tipo_evento = 'aborto') AS abortos
+                FROM eventos_reprodutivos e
+                CROSS JOIN LATERAL (
+                    SELECT i.touro_id, i.data_evento FROM eventos_reprodutivos i
+                    WHERE i.animal_id = e.animal_id
+                      AND i.tipo_evento = 'inseminacao'
+                      AND i.data_evento < e.data_evento
+                      AND i.data_evento >= e.data_evento - %(gestacao)s
+                    ORDER BY i.data_evento DESC
+                    LIMIT 1
+                ) ia
+                WHERE e.tipo_evento IN ('parto', 'aborto')
+                  AND ia.touro_id IS NOT NULL
+                  AND ia.data_evento <= CURRENT_DATE - %(gestacao)s
+                GROUP BY ia.touro_id
+            )
+            SELECT t.id, t.brinco, t.nome, t.raca_id, r.nome AS raca,
+                   COALESCE(i.inseminacoes, 0) AS inseminacoes,
+                   COALESCE(d.nascidos_vivos, 0) AS nascidos_vivos,
+                   COALESCE(d.natimortos, 0) AS natimortos,
+                   COALESCE(d.abortos, 0) AS abortos
+            FROM touros t
+            LEFT JOIN racas r ON t.raca_id = r.id
+            LEFT JOIN inseminacoes i ON i.touro_id = t.id
+            LEFT JOIN desfechos d ON d.touro_id = t.id
+            WHERE t.ativo = TRUE
+            ORDER BY t.brinco
+        """, {'gestacao': Genealogia.GESTACAO_MAX_DIAS})
+        touros = [dict(t) for t in cur.fetchall()]
+    finally:
+        cur.close()
+        conn.close()
+
+    resposta = {
+        "data_cobertura": data_cobertura,
+        "data_prevista_parto": data_prevista_parto,
+        "total_femeas": len(femeas),
+        "com_touro": 0,
+        "touros": touros,
+        "plano": []
+    }
+    if not femeas or not touros:
+        return RespostaJSON(resposta)
+
+    # Desempenho: taxa de nascidos vivos por inseminação, com encolhimento
+    vivos = np.array([t['nascidos_vivos'] for t in touros], dtype=float)
+    inseminacoes = np.array([t['inseminacoes'] for t in touros], dtype=float)
+    media = vivos.sum() / inseminacoes.sum() if inseminacoes.sum() else 0.0
+    taxa = (vivos + ACASALAMENTO_PESO_MEDIA * media) / (inseminacoes + ACASALAMENTO_PESO_MEDIA)
+    desempenho = taxa / taxa.max() if taxa.max() > 0 else np.zeros(len(touros))
+
+    genealogia = obter_genealogia()
+    nos_femeas = [genealogia.indice_animal.get(f['id'], -1) for f in femeas]
+    coancestria = np.array(genealogia.parentesco(
+        nos_femeas, [genealogia.indice_touro.get(t['id'], -1) for t in touros]
+    ), dtype=float).reshape(len(femeas), len(touros))
+
+    raca_femea = np.array([f['raca_id'] or 0 for f in femeas])[:, None]
+    raca_touro = np.array([t['raca_id'] or 0 for t in touros])[None, :]
+    raca = np.where((raca_femea == 0) | (raca_touro == 0), 0.5, (raca_femea == raca_touro).astype(float))
+
+    # 0,25 de coancestria (pai x filha, irmãos completos) zera o critério
+    pontuacao = (PESOS_ACASALAMENTO['parentesco'] * (1.0 - np.minimum(coancestria * 4.0, 1.0))
+                 + PESOS_ACASALAMENTO['raca'] * raca
+                 + PESOS_ACASALAMENTO['desempenho'] * desempenho[None, :])
+    pontuacao = np.where(coancestria <= limite_coancestria, pontuacao, -np.inf)
+
+    escolhido = np.full(len(femeas), -1)
+    if max_por_touro is not None:
+        # Guloso pelos melhores pares do rebanho inteiro, respeitando a capacidade
+        carga = np.zeros(len(touros), dtype=int)
+        for par in np.argsort(-pontuacao, axis=None, kind='stable'):
+            f, t = divmod(int(par), len(touros))
+            if not np.isfinite(pontuacao[f, t]):
+                break
+            if escolhido[f] < 0 and carga[t] < max_por_touro:
+                escolhido[f] = t
+                carga[t] += 1
+    else:
+        melhor = np.argmax(pontuacao, axis=1)
+        escolhido = np.where(np.isfinite(pontuacao[np.arange(len(femeas)), melhor]), melhor, -1)
+    ranking = np.argsort(-pontuacao, axis=1, kind='stable')[:, :alternativas + 1]
+
+    def par(f, t):
+        return {
+            "touro_id": touros[t]['id'],
+            "touro_brinco": touros[t]['brinco'],
+            "touro_raca": touros[t]['raca'],
+            "coancestria": round(float(coancestria[f, t]), 6),
+            "pontuacao": round(float(pontuacao[f, t]), 4)
+        }
+
+    femeas_por_touro = np.bincount(escolhido[escolhido >= 0], minlength=len(touros))
+    for t, touro in enumerate(touros):
+        touro['taxa_sucesso'] = round(float(taxa[t]), 4)
+        touro['femeas_no_plano'] = int(femeas_por_touro[t])
+
+    for f, femea in enumerate(femeas):
+        t = int(escolhido[f])
+        item = {
+            "animal_id": femea['id'],
+            "brinco": femea['brinco'],
+            "nome": femea['nome'],
+            "raca": femea['raca'],
+            "lote": femea['lote'],
+            "status_reprodutivo": femea['status_reprodutivo'],
+            "consanguinidade": round(genealogia.consanguinidade(nos_femeas[f]), 6) if nos_femeas[f] >= 0 else 0.0,
+            **(par(f, t) if t >= 0 else dict.fromkeys(
+                ("touro_id", "touro_brinco", "touro_raca", "coancestria", "pontuacao"))),
+            "data_prevista_parto": data_prevista_parto if t >= 0 else None,
+            "alternativas": [par(f, int(a)) for a in ranking[f]
+                             if int(a) != t and np.isfinite(pontuacao[f, a])][:alternativas]
+        }
+        resposta["plano"].append(item)
+
+    resposta["plano"].sort(key=lambda p: p['brinco'])
+    resposta["com_touro"] = int((escolhido >= 0).sum())
+    return RespostaJSON(resposta)
+
 
 # ============================================================
 # ESTATÍSTICAS REPRODUTIVAS
 # ============================================================
 
 @app.get("/api/relatorios/reproducao", tags=["📊 Relatórios"])
-async def stats_reproducao():
+def stats_reproducao():
     """Estatísticas gerais de reprodução"""
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur = conn.cursor()
     try:
         cur.execute("SELECT * FROM v_stats_reproducao")
         stats = cur.fetchone()
@@ -1678,13 +4872,13 @@ async def stats_reproducao():
                 "total_recem_paridas": 0,
                 "total_femeas_reprodutivas": 0
             }
-        return dict(stats)
+        return RespostaJSON(stats)
     finally:
         cur.close()
         conn.close()
 
 @app.get("/api/relatorios/proximos-eventos", tags=["📊 Relatórios"])
-async def proximos_eventos(dias: int = 30):
+def proximos_eventos(dias: int = 30):
     """Próximos eventos (partos, diagnósticos) nos próximos N dias"""
     conn = get_db_connection()
     cur = conn.cursor()
@@ -1692,44 +4886,56 @@ async def proximos_eventos(dias: int = 30):
         cur.execute("""
             SELECT id, brinco, nome, tipo_evento, data_evento, data_prevista, dias_restantes, touro
             FROM v_proximos_eventos
-            WHERE dias_restantes <= %s
+            WHERE data_prevista <= CURRENT_DATE + %s
             ORDER BY data_prevista
         """, (dias,))
         
         eventos = cur.fetchall()
         return [{
-            "id": e[0],
-            "brinco": e[1],
-            "nome": e[2],
-            "tipo_evento": e[3],
-            "data_evento": e[4],
-            "data_prevista": e[5],
-            "dias_restantes": e[6],
-            "touro": e[7]
+            "id": e['id'],
+            "brinco": e['brinco'],
+            "nome": e['nome'],
+            "tipo_evento": e['tipo_evento'],
+            "data_evento": e['data_evento'],
+            "data_prevista": e['data_prevista'],
+            "dias_restantes": e['dias_restantes'],
+            "touro": e['touro']
         } for e in eventos]
     finally:
         cur.close()
         conn.close()
 
 @app.get("/api/femeas-reprodutivas", tags=["👶 Reprodução"])
-async def listar_femeas_reprodutivas():
-    """Listar todas as fêmeas em idade reprodutiva"""
+def listar_femeas_reprodutivas():
+    """Listar todas as fêmeas em idade reprodutiva, com o estado reprodutivo atual"""
     conn = get_db_connection()
     cur = conn.cursor()
     try:
-        cur.execute("SELECT * FROM v_femeas_reprodutivas ORDER BY brinco")
+        cur.execute("""
+            SELECT f.*, r.data_ultima_cobertura, r.data_prevista_parto, r.data_ultimo_parto,
+                   COALESCE(r.data_concepcao, CURRENT_DATE) - r.data_ultimo_parto AS dias_em_aberto,
+                   COALESCE(r.total_partos, 0) AS total_partos
+            FROM v_femeas_reprodutivas f
+            LEFT JOIN animais_reproducao_resumo r ON r.animal_id = f.id
+            ORDER BY f.brinco
+        """)
         femeas = cur.fetchall()
         return [{
-            "id": f[0],
-            "brinco": f[1],
-            "nome": f[2],
-            "sexo": f[3],
-            "data_nascimento": f[4],
-            "idade_meses": f[5],
-            "raca": f[6],
-            "categoria": f[7],
-            "status_reprodutivo": f[8],
-            "peso_atual": float(f[9]) if f[9] else None
+            "id": f['id'],
+            "brinco": f['brinco'],
+            "nome": f['nome'],
+            "sexo": f['sexo'],
+            "data_nascimento": f['data_nascimento'],
+            "idade_meses": f['idade_meses'],
+            "raca": f['raca'],
+            "categoria": f['categoria'],
+            "status_reprodutivo": f['status_reprodutivo'],
+            "peso_atual": float(f['peso_atual']) if f['peso_atual'] else None,
+            "data_ultima_cobertura": f['data_ultima_cobertura'],
+            "data_prevista_parto": f['data_prevista_parto'],
+            "data_ultimo_parto": f['data_ultimo_parto'],
+            "dias_em_aberto": f['dias_em_aberto'],
+            "total_partos": f['total_partos']
         } for f in femeas]
     finally:
         cur.close()
@@ -1750,9 +4956,9 @@ def root():
 
 # ===== LOTES - CRUD COMPLETO =====
 @app.post("/api/lotes", tags=["📍 Lotes e Pastos"], status_code=status.HTTP_201_CREATED)
-async def criar_lote(nome: str = Body(...), descricao: Optional[str] = Body(None), user_data: dict = Depends(verify_token)):
+def criar_lote(nome: str = Body(...), descricao: Optional[str] = Body(None), user_data: dict = Depends(verify_token)):
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur = conn.cursor()
     try:
         cur.execute(
             "INSERT INTO lotes (nome, descricao) VALUES (%s, %s) RETURNING id, nome, descricao, status",
@@ -1769,9 +4975,9 @@ async def criar_lote(nome: str = Body(...), descricao: Optional[str] = Body(None
         conn.close()
 
 @app.get("/api/lotes/{lote_id}", tags=["📍 Lotes e Pastos"])
-async def obter_lote(lote_id: int, user_data: dict = Depends(verify_token)):
+def obter_lote(lote_id: int, user_data: dict = Depends(verify_token)):
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur = conn.cursor()
     try:
         cur.execute("SELECT * FROM lotes WHERE id = %s", (lote_id,))
         lote = cur.fetchone()
@@ -1783,9 +4989,9 @@ async def obter_lote(lote_id: int, user_data: dict = Depends(verify_token)):
         conn.close()
 
 @app.put("/api/lotes/{lote_id}", tags=["📍 Lotes e Pastos"])
-async def atualizar_lote(lote_id: int, nome: Optional[str] = Body(None), descricao: Optional[str] = Body(None), user_data: dict = Depends(verify_token)):
+def atualizar_lote(lote_id: int, nome: Optional[str] = Body(None), descricao: Optional[str] = Body(None), user_data: dict = Depends(verify_token)):
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur = conn.cursor()
     try:
         updates = []
         params = []
@@ -1815,7 +5021,7 @@ async def atualizar_lote(lote_id: int, nome: Optional[str] = Body(None), descric
         conn.close()
 
 @app.delete("/api/lotes/{lote_id}", tags=["📍 Lotes e Pastos"])
-async def deletar_lote(lote_id: int, user_data: dict = Depends(verify_token)):
+def deletar_lote(lote_id: int, user_data: dict = Depends(verify_token)):
     """Deletar lote - Apenas admin e gerente"""
     require_admin_or_gerente(user_data)
 
@@ -1836,9 +5042,9 @@ async def deletar_lote(lote_id: int, user_data: dict = Depends(verify_token)):
 
 # ===== PASTOS - CRUD COMPLETO =====
 @app.post("/api/pastos", tags=["📍 Lotes e Pastos"], status_code=status.HTTP_201_CREATED)
-async def criar_pasto(nome: str = Body(...), area_hectares: Optional[float] = Body(None), tipo_capim: Optional[str] = Body(None), observacoes: Optional[str] = Body(None), user_data: dict = Depends(verify_token)):
+def criar_pasto(nome: str = Body(...), area_hectares: Optional[float] = Body(None), tipo_capim: Optional[str] = Body(None), observacoes: Optional[str] = Body(None), user_data: dict = Depends(verify_token)):
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur = conn.cursor()
     try:
         cur.execute(
             "INSERT INTO pastos (nome, area_hectares, tipo_capim, observacoes) VALUES (%s, %s, %s, %s) RETURNING *",
@@ -1855,9 +5061,9 @@ async def criar_pasto(nome: str = Body(...), area_hectares: Optional[float] = Bo
         conn.close()
 
 @app.get("/api/pastos/{pasto_id}", tags=["📍 Lotes e Pastos"])
-async def obter_pasto(pasto_id: int, user_data: dict = Depends(verify_token)):
+def obter_pasto(pasto_id: int, user_data: dict = Depends(verify_token)):
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur = conn.cursor()
     try:
         cur.execute("SELECT * FROM pastos WHERE id = %s", (pasto_id,))
         pasto = cur.fetchone()
@@ -1869,9 +5075,9 @@ async def obter_pasto(pasto_id: int, user_data: dict = Depends(verify_token)):
         conn.close()
 
 @app.put("/api/pastos/{pasto_id}", tags=["📍 Lotes e Pastos"])
-async def atualizar_pasto(pasto_id: int, nome: Optional[str] = Body(None), area_hectares: Optional[float] = Body(None), tipo_capim: Optional[str] = Body(None), observacoes: Optional[str] = Body(None), user_data: dict = Depends(verify_token)):
+def atualizar_pasto(pasto_id: int, nome: Optional[str] = Body(None), area_hectares: Optional[float] = Body(None), tipo_capim: Optional[str] = Body(None), observacoes: Optional[str] = Body(None), user_data: dict = Depends(verify_token)):
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur = conn.cursor()
     try:
         updates = []
         params = []
@@ -1907,7 +5113,7 @@ async def atualizar_pasto(pasto_id: int, nome: Optional[str] = Body(None), area_
         conn.close()
 
 @app.delete("/api/pastos/{pasto_id}", tags=["📍 Lotes e Pastos"])
-async def deletar_pasto(pasto_id: int, user_data: dict = Depends(verify_token)):
+def deletar_pasto(pasto_id: int, user_data: dict = Depends(verify_token)):
     """Desativar pasto (soft delete) - Apenas admin e gerente"""
     require_admin_or_gerente(user_data)
 
@@ -1929,7 +5135,7 @@ async def deletar_pasto(pasto_id: int, user_data: dict = Depends(verify_token)):
         conn.close()
 
 @app.delete("/api/touros/{touro_id}", tags=["🐂 Touros"])
-async def deletar_touro(touro_id: int, user_data: dict = Depends(verify_token)):
+def deletar_touro(touro_id: int, user_data: dict = Depends(verify_token)):
     """Deletar touro - Apenas admin e gerente"""
     require_admin_or_gerente(user_data)
 
@@ -1950,13 +5156,40 @@ async def deletar_touro(touro_id: int, user_data: dict = Depends(verify_token)):
 
 @app.get("/health", tags=["⚙️ Sistema"])
 def health_check():
-    """Health check"""
+    """Health check (inclui ocupação do pool de conexões)"""
     try:
         conn = get_db_connection()
-        conn.close()
-        return {"status": "healthy", "database": "connected"}
-    except:
-        return {"status": "unhealthy", "database": "disconnected"}
+        try:
+            # O pool só testa conexões ociosas há mais de health_check_after
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+        finally:
+            conn.close()
+        return {
+            "status": "healthy",
+            "database": "connected",
+            "pool": get_db_pool().estatisticas(),
+            "cache_sessoes": cache_sessoes.estatisticas(),
+            "cache_cadastros": cache_cadastros.estatisticas()
+        }
+    except Exception as e:
+        detalhe = e.detail if isinstance(e, HTTPException) else str(e)
+        return {
+            "status": "unhealthy",
+            "database": "disconnected",
+            "erro": detalhe,
+            "pool": _db_pool.estatisticas() if _db_pool is not None else None
+        }
+
+@app.get("/metrics", tags=["⚙️ Sistema"], response_class=PlainTextResponse)
+def metricas():
+    """Métricas do worker no formato texto do Prometheus"""
+    pool_stats = get_db_pool().estatisticas() if _db_pool is not None else None
+    return PlainTextResponse(
+        metricas_api.exportar(pool_stats),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
 
 if __name__ == "__main__":
     import uvicorn
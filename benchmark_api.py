@@ -0,0 +1,235 @@
+"""
+Benchmark de carga da API de Controle de Gado
+
+Dispara uma mistura ponderada de requisições reais (login, listagem e
+consulta de animais, pesagem, relatórios) contra uma API em execução, com
+N workers concorrentes, e reporta por rota: requisições, erros, p50, p95,
+p99, máximo e vazão.
+
+Use junto com gerar_rebanho_sintetico.py para ter um rebanho de tamanho
+conhecido. Salve o resultado com --saida e compare execuções com --comparar.
+
+Uso:
+    python benchmark_api.py --senha admin123 --concorrencia 20 --duracao 60
+    python benchmark_api.py --senha admin123 --saida depois.json --comparar antes.json
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import requests
+
+# (nome, peso na mistura, escrita?)
+CENARIOS = [
+    ('GET /api/animais', 20, False),
+    ('GET /api/animais?cursor', 10, False),
+    ('GET /api/animais/{id}', 20, False),
+    ('GET /api/pesagens/{id}', 10, False),
+    ('POST /api/pesagens', 10, True),
+    ('GET /api/relatorios/resumo', 8, False),
+    ('GET /api/relatorios/performance', 5, False),
+    ('GET /api/sanidade/proximas', 5, False),
+    ('GET /api/relatorios/reproducao', 4, False),
+    ('GET /api/relatorios/proximos-eventos', 3, False),
+    ('GET /api/femeas-reprodutivas', 3, False),
+    ('POST /api/auth/login', 2, False),
+]
+
+
+def percentil(valores_ordenados, p):
+    """Percentil pelo método nearest-rank"""
+    if not valores_ordenados:
+        return 0.0
+    k = max(0, min(len(valores_ordenados) - 1, math.ceil(p * len(valores_ordenados) / 100) - 1))
+    return valores_ordenados[k]
+
+
+class Benchmark:
+    def __init__(self, url, email, senha, concorrencia, duracao, somente_leitura, seed):
+        self.url = url.rstrip('/')
+        self.email = email
+        self.senha = senha
+        self.concorrencia = concorrencia
+        self.duracao = duracao
+        self.seed = seed
+        self.cenarios = [c for c in CENARIOS if not (somente_leitura and c[2])]
+        self.lock = threading.Lock()
+        self.latencias = defaultdict(list)
+        self.erros = defaultdict(int)
+        self.status = defaultdict(lambda: defaultdict(int))
+        self.animal_ids = []
+        self.cursores = []
+
+    def _login(self, sessao):
+        r = sessao.post(f"{self.url}/api/auth/login", json={'email': self.email, 'senha': self.senha})
+        r.raise_for_status()
+        return r.json()['token']
+
+    def preparar(self):
+        """Login inicial e amostra de animais/cursores usados nas requisições"""
+        sessao = requests.Session()
+        token = self._login(sessao)
+        headers = {'Authorization': f'Bearer {token}'}
+        cursor = None
+        for _ in range(10):
+            params = {'limit': 500, 'contagem': 'nenhuma'}
+            if cursor:
+                params['cursor'] = cursor
+            r = sessao.get(f"{self.url}/api/animais", params=params, headers=headers)
+            r.raise_for_status()
+            corpo = r.json()
+            self.animal_ids += [a['id'] for a in corpo['data']]
+            cursor = corpo.get('next_cursor')
+            if not cursor:
+                break
+            self.cursores.append(cursor)
+        if not self.animal_ids:
+            raise SystemExit("❌ Nenhum animal ativo; gere dados com gerar_rebanho_sintetico.py")
+
+    def _requisicao(self, nome, sessao, headers, rnd):
+        if nome == 'GET /api/animais':
+            return sessao.get(f"{self.url}/api/animais", params={'limit': 100}, headers=headers)
+        if nome == 'GET /api/animais?cursor':
+            params = {'limit': 100, 'contagem': 'nenhuma'}
+            if self.cursores:
+                params['cursor'] = rnd.choice(self.cursores)
+            return sessao.get(f"{self.url}/api/animais", params=params, headers=headers)
+        if nome == 'GET /api/animais/{id}':
+            return sessao.get(f"{self.url}/api/animais/{rnd.choice(self.animal_ids)}", headers=headers)
+        if nome == 'GET /api/pesagens/{id}':
+            return sessao.get(f"{self.url}/api/pesagens/{rnd.choice(self.animal_ids)}", headers=headers)
+        if nome == 'POST /api/pesagens':
+            return sessao.post(f"{self.url}/api/pesagens", headers=headers, json={
+                'animal_id': rnd.choice(self.animal_ids),
+                'peso': round(rnd.uniform(150, 600), 1),
+                'data_pesagem': date.today().isoformat(),
+                'observacoes': 'benchmark'
+            })
+        if nome == 'POST /api/auth/login':
+            return sessao.post(f"{self.url}/api/auth/login", json={'email': self.email, 'senha': self.senha})
+        metodo, caminho = nome.split(' ', 1)
+        return sessao.request(metodo, f"{self.url}{caminho}", headers=headers)
+
+    def _worker(self, indice, fim):
+        rnd = random.Random(self.seed + indice)
+        sessao = requests.Session()
+        headers = {'Authorization': f'Bearer {self._login(sessao)}'}
+        nomes = [c[0] for c in self.cenarios]
+        pesos = [c[1] for c in self.cenarios]
+        while time.monotonic() < fim:
+            nome = rnd.choices(nomes, weights=pesos)[0]
+            inicio = time.perf_counter()
+            try:
+                r = self._requisicao(nome, sessao, headers, rnd)
+                codigo = r.status_code
+            except requests.RequestException:
+                codigo = 'falha'
+            duracao_ms = (time.perf_counter() - inicio) * 1000
+            with self.lock:
+                self.latencias[nome].append(duracao_ms)
+                self.status[nome][codigo] += 1
+                if codigo == 'falha' or codigo >= 400:
+                    self.erros[nome] += 1
+
+    def executar(self):
+        self.preparar()
+        fim = time.monotonic() + self.duracao
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concorrencia) as executor:
+            futuros = [executor.submit(self._worker, i, fim) for i in range(self.concorrencia)]
+            for f in futuros:
+                f.result()
+        return self.resultado(time.perf_counter() - inicio)
+
+    def resultado(self, tempo_total):
+        rotas = {}
+        for nome, valores in sorted(self.latencias.items()):
+            valores = sorted(valores)
+            rotas[nome] = {
+                'requisicoes': len(valores),
+                'erros': self.erros[nome],
+                'status': {str(k): v for k, v in self.status[nome].items()},
+                'p50_ms': round(percentil(valores, 50), 2),
+                'p95_ms': round(percentil(valores, 95), 2),
+                'p99_ms': round(percentil(valores, 99), 2),
+                'max_ms': round(valores[-1], 2),
+                'req_s': round(len(valores) / tempo_total, 2)
+            }
+        todas = sorted(v for valores in self.latencias.values() for v in valores)
+        return {
+            'url': self.url,
+            'concorrencia': self.concorrencia,
+            'duracao_s': round(tempo_total, 2),
+            'animais_amostrados': len(self.animal_ids),
+            'total': {
+                'requisicoes': len(todas),
+                'erros': sum(self.erros.values()),
+                'p50_ms': round(percentil(todas, 50), 2),
+                'p95_ms': round(percentil(todas, 95), 2),
+                'p99_ms': round(percentil(todas, 99), 2),
+                'req_s': round(len(todas) / tempo_total, 2)
+            },
+            'rotas': rotas
+        }
+
+
+def imprimir(resultado, anterior=None):
+    print(f"\n{resultado['url']} | {resultado['concorrencia']} workers | {resultado['duracao_s']}s")
+    cabecalho = f"{'Rota':<40} {'Req':>7} {'Erros':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'Máx':>9} {'Req/s':>8}"
+    print(cabecalho)
+    print('-' * len(cabecalho))
+    linhas = list(resultado['rotas'].items()) + [('TOTAL', dict(resultado['total'], max_ms=0))]
+    for nome, r in linhas:
+        print(f"{nome:<40} {r['requisicoes']:>7} {r['erros']:>6} {r['p50_ms']:>9.2f} "
+              f"{r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['max_ms']:>9.2f} {r['req_s']:>8.2f}")
+        if anterior:
+            antes = anterior['total'] if nome == 'TOTAL' else anterior['rotas'].get(nome)
+            if antes:
+                deltas = []
+                for campo in ('p50_ms', 'p95_ms', 'p99_ms', 'req_s'):
+                    if antes[campo]:
+                        deltas.append(f"{campo[:-3] if campo.endswith('_ms') else campo} "
+                                      f"{(r[campo] - antes[campo]) / antes[campo] * 100:+.1f}%")
+                print(f"{'':<40} vs. anterior: {', '.join(deltas)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga da API de Controle de Gado")
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--email', default='admin@fazenda.com')
+    parser.add_argument('--senha', required=True)
+    parser.add_argument('--concorrencia', type=int, default=10, help="Workers simultâneos (padrão: 10)")
+    parser.add_argument('--duracao', type=float, default=30, help="Duração em segundos (padrão: 30)")
+    parser.add_argument('--somente-leitura', action='store_true', help="Não registra pesagens")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--saida', help="Salva o resultado em JSON")
+    parser.add_argument('--comparar', help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args()
+
+    bench = Benchmark(args.url, args.email, args.senha, args.concorrencia, args.duracao,
+                      args.somente_leitura, args.seed)
+    resultado = bench.executar()
+
+    anterior = None
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            anterior = json.load(f)
+    imprimir(resultado, anterior)
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+        print(f"\n✓ Resultado salvo em {args.saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+Estado reprodutivo das fêmeas, derivado dos eventos reprodutivos
+
+Reproduz os eventos de cada fêmea em ordem (data_evento, id) e grava o
+resultado em animais.status_reprodutivo e animais_reproducao_resumo
+(migration_v3_performance.sql, seção 13). Usado pela API a cada evento
+criado/alterado/excluído e pelo gerador de rebanho sintético; só depende
+do psycopg2, sem efeitos colaterais ao importar.
+"""
+
+from psycopg2.extras import execute_values
+
+# Status depois de cada tipo de evento; 'cio' não muda o status. Fêmea sem
+# eventos fica com status NULL (as views tratam como 'vazia')
+TRANSICOES_REPRODUTIVAS = {
+    'inseminacao': 'inseminada',
+    'diagnostico_positivo': 'prenhe',
+    'diagnostico_negativo': 'vazia',
+    'parto': 'recem_parida',
+    'aborto': 'vazia',
+}
+
+CAMPOS_ESTADO_REPRODUTIVO = (
+    'status_reprodutivo', 'data_ultima_cobertura', 'touro_ultima_cobertura', 'data_prevista_parto',
+    'data_concepcao', 'data_ultimo_parto', 'total_partos'
+)
+
+
+def _estado_reprodutivo(eventos) -> dict:
+    """
+    Estado atual de uma fêmea reproduzindo os eventos dela em ordem.
+
+    `eventos`: (tipo_evento, data_evento, data_prevista, touro_id) por
+    (data_evento, id). A cobertura do ciclo (desde o último parto, aborto
+    ou diagnóstico negativo) dá a concepção no diagnóstico positivo e a
+    data prevista de parto.
+    """
+    estado = dict.fromkeys(CAMPOS_ESTADO_REPRODUTIVO)
+    estado['total_partos'] = 0
+    cobertura_do_ciclo = None
+    for tipo, data, prevista, touro_id in eventos:
+        status = TRANSICOES_REPRODUTIVAS.get(tipo)
+        if status is None:
+            continue
+        estado['status_reprodutivo'] = status
+        if tipo == 'inseminacao':
+            cobertura_do_ciclo = data
+            estado.update(data_ultima_cobertura=data, touro_ultima_cobertura=touro_id,
+                          data_prevista_parto=prevista, data_concepcao=None)
+        elif tipo == 'diagnostico_positivo':
+            estado['data_concepcao'] = cobertura_do_ciclo
+        else:
+            cobertura_do_ciclo = None
+            estado.update(data_prevista_parto=None, data_concepcao=None)
+            if tipo == 'parto':
+                estado['data_ultimo_parto'] = data
+                estado['total_partos'] += 1
+    return estado
+
+
+def recalcular_estado_reprodutivo(cur, animal_ids=None) -> dict:
+    """
+    Recalcula animais.status_reprodutivo e animais_reproducao_resumo.
+
+    Trava as fêmeas em ordem de id (FOR NO KEY UPDATE), lê os eventos
+    delas numa única query (uma linha por fêmea, eventos em arrays
+    ordenados), reproduz cada uma em memória e grava em lote só o que
+    mudou; também liga os bezerros às mães pelos partos. Os partos são a
+    fonte da maternidade: bezerro cuja mãe está no escopo mas que saiu dos
+    partos dela (parto excluído, alterado ou natimorto) fica com a mãe do
+    parto mais recente que ainda o cite, ou com mae_id NULL.
+    Com animal_ids=None o escopo é o rebanho inteiro: toda fêmea com
+    evento, status ou resumo. Recálculos concorrentes da mesma fêmea
+    esperam um pelo outro, então nenhum grava um estado lido antes do
+    commit do outro.
+
+    `cur` precisa devolver linhas com acesso por nome (RealDictCursor).
+    Não faz commit: roda na transação de quem chamou.
+    """
+    if animal_ids is None:
+        cur.execute("""
+            SELECT id FROM animais
+            WHERE status_reprodutivo IS NOT NULL
+               OR id IN (SELECT animal_id FROM eventos_reprodutivos)
+               OR id IN (SELECT animal_id FROM animais_reproducao_resumo)
+            ORDER BY id
+            FOR NO KEY UPDATE
+        """)
+        animal_ids = [r['id'] for r in cur.fetchall()]
+    else:
+        animal_ids = sorted(set(animal_ids))
+        cur.execute("SELECT id FROM animais WHERE id = ANY(%s) ORDER BY id FOR NO KEY UPDATE", (animal_ids,))
+    if not animal_ids:
+        return {"femeas": 0, "resumos_alterados": 0, "status_alterados": 0}
+
+    cur.execute("""
+        SELECT animal_id,
+               array_agg(tipo_evento::text ORDER BY data_evento, id) AS tipos,
+               array_agg(data_evento ORDER BY data_evento, id) AS datas,
+               array_agg(data_prevista ORDER BY data_evento, id) AS previstas,
+               array_agg(touro_id ORDER BY data_evento, id) AS touros
+        FROM eventos_reprodutivos
+        WHERE animal_id = ANY(%s)
+        GROUP BY animal_id
+        ORDER BY animal_id
+    """, (animal_ids,))
+
+    estados = []
+    for f in cur.fetchall():
+        estado = _estado_reprodutivo(zip(f['tipos'], f['datas'], f['previstas'], f['touros']))
+        estados.append((f['animal_id'],) + tuple(estado[c] for c in CAMPOS_ESTADO_REPRODUTIVO))
+
+    # Mãe de cada bezerro: a vaca do parto mais recente dele
+    cur.execute("""
+        SELECT DISTINCT ON (bezerra_id) bezerra_id, animal_id
+        FROM eventos_reprodutivos
+        WHERE animal_id = ANY(%s)
+          AND tipo_evento = 'parto'
+          AND bezerra_id IS NOT NULL
+          AND NOT COALESCE(natimorto, FALSE)
+        ORDER BY bezerra_id, data_evento DESC, id DESC
+    """, (animal_ids,))
+    maes = {r['bezerra_id']: r['animal_id'] for r in cur.fetchall()}
+
+    resumos_alterados = status_alterados = 0
+    if estados:
+        resumos_alterados += len(execute_values(cur, f"""
+            INSERT INTO animais_reproducao_resumo AS r (animal_id, {', '.join(CAMPOS_ESTADO_REPRODUTIVO)})
+            VALUES %s
+            ON CONFLICT (animal_id) DO UPDATE SET
+                {', '.join(f'{c} = EXCLUDED.{c}' for c in CAMPOS_ESTADO_REPRODUTIVO)},
+                atualizado_em = CURRENT_TIMESTAMP
+            WHERE ({', '.join(f'r.{c}' for c in CAMPOS_ESTADO_REPRODUTIVO)})
+                  IS DISTINCT FROM ({', '.join(f'EXCLUDED.{c}' for c in CAMPOS_ESTADO_REPRODUTIVO)})
+            RETURNING animal_id
+        """, estados, template="(%s, %s, %s::date, %s, %s::date, %s::date, %s::date, %s)",
+            page_size=1000, fetch=True))
+        status_alterados += len(execute_values(cur, """
+            UPDATE animais a SET status_reprodutivo = v.status_reprodutivo
+            FROM (VALUES %s) AS v(id, status_reprodutivo)
+            WHERE a.id = v.id AND a.status_reprodutivo IS DISTINCT FROM v.status_reprodutivo
+            RETURNING a.id
+        """, [(e[0], e[1]) for e in estados], page_size=1000, fetch=True))
+
+    # Fêmeas do escopo sem nenhum evento voltam ao status NULL
+    sem_eventos = sorted(set(animal_ids) - {e[0] for e in estados})
+    if sem_eventos:
+        cur.execute("DELETE FROM animais_reproducao_resumo WHERE animal_id = ANY(%s)", (sem_eventos,))
+        resumos_alterados += cur.rowcount
+        cur.execute("""
+            UPDATE animais SET status_reprodutivo = NULL
+            WHERE status_reprodutivo IS NOT NULL AND id = ANY(%s)
+        """, (sem_eventos,))
+        status_alterados += cur.rowcount
+
+    if maes:
+        execute_values(cur, """
+            UPDATE animais a SET mae_id = v.mae_id
+            FROM (VALUES %s) AS v(id, mae_id)
+            WHERE a.id = v.id AND a.mae_id IS DISTINCT FROM v.mae_id
+        """, list(maes.items()), page_size=1000)
+
+    # Bezerros que não aparecem mais nos partos das fêmeas do escopo
+    cur.execute("""
+        UPDATE animais a SET mae_id = (
+            SELECT e.animal_id FROM eventos_reprodutivos e
+            WHERE e.bezerra_id = a.id
+              AND e.tipo_evento = 'parto'
+              AND NOT COALESCE(e.natimorto, FALSE)
+            ORDER BY e.data_evento DESC, e.id DESC
+            LIMIT 1
+        )
+        WHERE a.mae_id = ANY(%s) AND NOT (a.id = ANY(%s))
+    """, (animal_ids, list(maes)))
+
+    return {"femeas": len(estados), "resumos_alterados": resumos_alterados,
+            "status_alterados": status_alterados}
@@ -0,0 +1,288 @@
+"""
+Gerador de rebanho sintético para testes de carga e de planos de query
+
+Cria raças, lotes, pastos, touros e N animais com anos de histórico de
+pesagens, sanidade, eventos reprodutivos e movimentações. A geração é
+determinística (--seed), então a mesma chamada produz sempre o mesmo
+rebanho e os benchmarks podem ser comparados antes/depois de uma mudança.
+
+Todos os registros gerados usam o prefixo SIM- (animais, touros, lotes e
+pastos) e podem ser removidos com --limpar.
+
+Uso:
+    python gerar_rebanho_sintetico.py --animais 20000 --anos 3
+    python gerar_rebanho_sintetico.py --limpar
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+import psycopg2
+from psycopg2.extras import RealDictCursor, execute_values
+from dotenv import load_dotenv
+
+from estado_reprodutivo import recalcular_estado_reprodutivo
+
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'port': os.getenv('DB_PORT', '5432'),
+    'database': os.getenv('DB_NAME', 'controle_gado'),
+    'user': os.getenv('DB_USER', 'postgres'),
+    'password': os.getenv('DB_PASSWORD', 'postgres')
+}
+
+PREFIXO = 'SIM-'
+
+RACAS = ['Nelore', 'Angus', 'Brahman', 'Senepol', 'Tabapuã', 'Guzerá', 'Brangus', 'Girolando']
+TIPOS_CAPIM = ['Brachiaria', 'Mombaça', 'Tifton', 'Tanzânia', 'Massai']
+VACINAS = [
+    # (tipo, produto, intervalo em dias, só fêmeas)
+    ('vacina', 'Febre Aftosa', 180, False),
+    ('vacina', 'Clostridiose', 365, False),
+    ('vacina', 'Brucelose', 0, True),
+    ('vermifugo', 'Ivermectina', 120, False),
+    ('carrapaticida', 'Cipermetrina', 90, False),
+]
+GESTACAO_DIAS = 283
+DIAGNOSTICO_DIAS = 45
+
+
+def _conectar():
+    return psycopg2.connect(**DB_CONFIG)
+
+
+def limpar(conn):
+    """Remove tudo que foi gerado (pesagens, sanidade etc. saem em cascata)"""
+    cur = conn.cursor()
+    cur.execute(
+        "DELETE FROM eventos_reprodutivos WHERE touro_id IN (SELECT id FROM touros WHERE brinco LIKE %s)",
+        (PREFIXO + '%',)
+    )
+    cur.execute("UPDATE animais SET mae_id = NULL, pai_id = NULL WHERE brinco LIKE %s", (PREFIXO + '%',))
+    cur.execute(
+        "DELETE FROM eventos_reprodutivos WHERE bezerra_id IN (SELECT id FROM animais WHERE brinco LIKE %s)",
+        (PREFIXO + '%',)
+    )
+    cur.execute("DELETE FROM animais WHERE brinco LIKE %s", (PREFIXO + '%',))
+    animais = cur.rowcount
+    cur.execute("DELETE FROM touros WHERE brinco LIKE %s", (PREFIXO + '%',))
+    cur.execute("DELETE FROM lotes WHERE nome LIKE %s", (PREFIXO + '%',))
+    cur.execute("DELETE FROM pastos WHERE nome LIKE %s", (PREFIXO + '%',))
+    conn.commit()
+    cur.close()
+    print(f"✓ {animais} animais sintéticos removidos")
+
+
+def _inserir(cur, sql, linhas, page_size=5000):
+    """execute_values em páginas, devolvendo os ids quando há RETURNING"""
+    if not linhas:
+        return []
+    retorna = 'RETURNING' in sql.upper()
+    resultado = execute_values(cur, sql, linhas, page_size=page_size, fetch=retorna)
+    return [r[0] for r in resultado] if retorna else []
+
+
+def gerar(conn, n_animais: int, anos: int, n_lotes: int, n_pastos: int, n_touros: int, seed: int):
+    rnd = random.Random(seed)
+    hoje = date.today()
+    inicio_historico = hoje - timedelta(days=365 * anos)
+    cur = conn.cursor()
+    t0 = time.perf_counter()
+
+    # Cadastros de referência
+    execute_values(cur, "INSERT INTO racas (nome) VALUES %s ON CONFLICT (nome) DO NOTHING",
+                   [(r,) for r in RACAS])
+    cur.execute("SELECT id, nome FROM racas WHERE nome = ANY(%s)", (RACAS,))
+    racas = cur.fetchall()
+
+    lotes = list(zip(
+        _inserir(cur, "INSERT INTO lotes (nome, finalidade) VALUES %s RETURNING id",
+                 [(f"{PREFIXO}Lote {i:03d}", rnd.choice(['cria', 'recria', 'engorda']))
+                  for i in range(1, n_lotes + 1)]),
+        [f"{PREFIXO}Lote {i:03d}" for i in range(1, n_lotes + 1)]
+    ))
+    pastos = list(zip(
+        _inserir(cur, "INSERT INTO pastos (nome, area_hectares, tipo_capim, capacidade_animais) VALUES %s RETURNING id",
+                 [(f"{PREFIXO}Pasto {i:03d}", round(rnd.uniform(10, 120), 2),
+                   rnd.choice(TIPOS_CAPIM), rnd.randint(30, 300))
+                  for i in range(1, n_pastos + 1)]),
+        [f"{PREFIXO}Pasto {i:03d}" for i in range(1, n_pastos + 1)]
+    ))
+    touros = _inserir(cur, "INSERT INTO touros (brinco, nome, raca_id) VALUES %s RETURNING id", [
+        (f"{PREFIXO}T{i:04d}", f"Touro {i}", rnd.choice(racas)[0]) for i in range(1, n_touros + 1)
+    ])
+
+    # Animais
+    linhas = []
+    for i in range(1, n_animais + 1):
+        raca_id, raca = rnd.choice(racas)
+        lote_id, lote = rnd.choice(lotes)
+        pasto_id, pasto = rnd.choice(pastos)
+        sexo = rnd.choice('MF')
+        nascimento = hoje - timedelta(days=rnd.randint(30, 365 * (anos + 3)))
+        status = rnd.choices(['ativo', 'vendido', 'morto'], weights=[90, 8, 2])[0]
+        linhas.append((
+            f"{PREFIXO}{i:06d}", sexo, raca, raca_id, nascimento,
+            round(rnd.uniform(25, 40), 1), status, lote, lote_id, pasto, pasto_id,
+            max(nascimento, inicio_historico)
+        ))
+    ids = _inserir(cur, """
+        INSERT INTO animais (brinco, sexo, raca, raca_id, data_nascimento, peso_nascimento,
+                             status, lote, lote_id, pasto, pasto_id, data_entrada)
+        VALUES %s RETURNING id
+    """, linhas)
+    animais = [
+        {'id': animal_id, 'sexo': l[1], 'nascimento': l[4], 'peso_nascimento': l[5],
+         'lote': l[7], 'pasto': l[9], 'entrada': l[11]}
+        for animal_id, l in zip(ids, linhas)
+    ]
+    print(f"  {len(animais)} animais ({time.perf_counter() - t0:.1f}s)")
+
+    # Pesagens: a cada 60-120 dias, curva de ganho com ruído
+    pesagens = []
+    for a in animais:
+        dia = a['entrada'] + timedelta(days=rnd.randint(0, 60))
+        gmd_base = rnd.uniform(0.4, 1.1) if a['sexo'] == 'M' else rnd.uniform(0.3, 0.8)
+        while dia <= hoje:
+            idade = (dia - a['nascimento']).days
+            peso = float(a['peso_nascimento']) + gmd_base * idade * rnd.uniform(0.9, 1.1)
+            pesagens.append((a['id'], dia, round(min(peso, 750), 2), rnd.randint(2, 5)))
+            dia += timedelta(days=rnd.randint(60, 120))
+    # Em blocos com ANALYZE no meio: o trigger por comando recalcula GMD e
+    # resumo com planos que dependem do tamanho de pesagens, e as
+    # estatísticas ficariam desatualizadas durante toda a transação
+    cur.execute("ANALYZE animais")
+    for i in range(0, len(pesagens), 5000):
+        _inserir(cur, "INSERT INTO pesagens (animal_id, data_pesagem, peso, condicao_corporal) VALUES %s",
+                 pesagens[i:i + 5000])
+        if (i // 5000) % 5 == 0:
+            cur.execute("ANALYZE pesagens")
+            cur.execute("ANALYZE animais_pesagem_resumo")
+    print(f"  {len(pesagens)} pesagens ({time.perf_counter() - t0:.1f}s)")
+
+    # Sanidade: calendário por produto, com proxima_aplicacao
+    aplicacoes = []
+    for a in animais:
+        for tipo, produto, intervalo, so_femeas in VACINAS:
+            if so_femeas and a['sexo'] != 'F':
+                continue
+            dia = a['entrada'] + timedelta(days=rnd.randint(0, 90))
+            while dia <= hoje:
+                proxima = dia + timedelta(days=intervalo) if intervalo else None
+                aplicacoes.append((a['id'], dia, tipo, produto, '5 ml', proxima,
+                                   round(rnd.uniform(2, 15), 2)))
+                if not intervalo:
+                    break
+                dia = proxima + timedelta(days=rnd.randint(-5, 20))
+    _inserir(cur, """
+        INSERT INTO sanidade (animal_id, data_aplicacao, tipo, produto, dose, proxima_aplicacao, custo)
+        VALUES %s
+    """, aplicacoes)
+    print(f"  {len(aplicacoes)} aplicações sanitárias ({time.perf_counter() - t0:.1f}s)")
+
+    # Eventos reprodutivos: ciclos IA -> diagnóstico -> parto das fêmeas com 2+ anos
+    eventos = []
+    for a in animais:
+        if a['sexo'] != 'F':
+            continue
+        dia = max(a['nascimento'] + timedelta(days=730), a['entrada']) + timedelta(days=rnd.randint(0, 90))
+        while dia <= hoje:
+            touro_id = rnd.choice(touros)
+            eventos.append((a['id'], 'inseminacao', dia, touro_id, False))
+            diagnostico = dia + timedelta(days=DIAGNOSTICO_DIAS)
+            if diagnostico > hoje:
+                break
+            if rnd.random() < 0.35:
+                eventos.append((a['id'], 'diagnostico_negativo', diagnostico, None, False))
+                dia = diagnostico + timedelta(days=rnd.randint(20, 45))
+                continue
+            eventos.append((a['id'], 'diagnostico_positivo', diagnostico, None, False))
+            parto = dia + timedelta(days=GESTACAO_DIAS + rnd.randint(-7, 7))
+            if parto > hoje:
+                break
+            if rnd.random() < 0.03:
+                eventos.append((a['id'], 'aborto', parto - timedelta(days=rnd.randint(60, 150)), None, False))
+            else:
+                eventos.append((a['id'], 'parto', parto, None, rnd.random() < 0.02))
+            dia = parto + timedelta(days=rnd.randint(60, 120))
+    # Em ordem cronológica: o id desempata eventos do mesmo dia na reprodução do estado
+    eventos.sort(key=lambda e: (e[2], e[0]))
+    _inserir(cur, """
+        INSERT INTO eventos_reprodutivos (animal_id, tipo_evento, data_evento, touro_id, natimorto)
+        VALUES %s
+    """, eventos)
+    # Status reprodutivo e resumo das fêmeas numa passada só, como a API faz
+    with conn.cursor(cursor_factory=RealDictCursor) as cur_estado:
+        recalcular_estado_reprodutivo(cur_estado, [a['id'] for a in animais if a['sexo'] == 'F'])
+    print(f"  {len(eventos)} eventos reprodutivos ({time.perf_counter() - t0:.1f}s)")
+
+    # Movimentações: trocas de pasto e lote ao longo do histórico
+    movimentacoes = []
+    for a in animais:
+        movimentacoes.append((a['id'], a['entrada'], 'entrada', None, a['pasto'], 'Entrada no rebanho'))
+        pasto = a['pasto']
+        for _ in range(rnd.randint(0, anos * 3)):
+            destino = rnd.choice(pastos)[1]
+            dia = a['entrada'] + timedelta(days=rnd.randint(0, max((hoje - a['entrada']).days, 0)))
+            movimentacoes.append((a['id'], dia, 'troca_pasto', pasto, destino, 'Rodízio de pastagem'))
+            pasto = destino
+        if rnd.random() < 0.3:
+            movimentacoes.append((a['id'], hoje - timedelta(days=rnd.randint(0, 365)), 'troca_lote',
+                                  None, a['lote'], 'Apartação'))
+    _inserir(cur, """
+        INSERT INTO movimentacoes (animal_id, data_movimentacao, tipo, origem, destino, motivo)
+        VALUES %s
+    """, movimentacoes)
+    print(f"  {len(movimentacoes)} movimentações ({time.perf_counter() - t0:.1f}s)")
+
+    conn.commit()
+
+    # Estatísticas atualizadas para o planner
+    for tabela in ('animais', 'pesagens', 'sanidade', 'eventos_reprodutivos', 'movimentacoes',
+                   'animais_pesagem_resumo', 'animais_reproducao_resumo'):
+        cur.execute(f"ANALYZE {tabela}")
+    conn.commit()
+    cur.close()
+    print(f"✓ Rebanho sintético gerado em {time.perf_counter() - t0:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera um rebanho sintético reprodutível")
+    parser.add_argument('--animais', type=int, default=5000, help="Quantidade de animais (padrão: 5000)")
+    parser.add_argument('--anos', type=int, default=3, help="Anos de histórico (padrão: 3)")
+    parser.add_argument('--lotes', type=int, default=20)
+    parser.add_argument('--pastos', type=int, default=40)
+    parser.add_argument('--touros', type=int, default=25)
+    parser.add_argument('--seed', type=int, default=42, help="Semente do gerador (padrão: 42)")
+    parser.add_argument('--limpar', action='store_true', help="Remove os dados sintéticos e sai")
+    parser.add_argument('--recriar', action='store_true', help="Remove os dados sintéticos antes de gerar")
+    args = parser.parse_args()
+
+    conn = _conectar()
+    try:
+        if args.limpar or args.recriar:
+            limpar(conn)
+            if args.limpar:
+                return 0
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM animais WHERE brinco LIKE %s", (PREFIXO + '%',))
+        existentes = cur.fetchone()[0]
+        cur.close()
+        if existentes:
+            print(f"❌ Já existem {existentes} animais sintéticos; use --recriar")
+            return 1
+        print(f"Gerando {args.animais} animais com {args.anos} anos de histórico (seed={args.seed})...")
+        gerar(conn, args.animais, args.anos, args.lotes, args.pastos, args.touros, args.seed)
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,940 @@
+-- ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+-- MIGRAÇÃO v3.0 - Performance
+-- Aplicar depois de migration_v2_reproductive.sql e fix_views_and_tables.sql
+-- ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+-- ============================================================
+-- 1. TABELA: animais_pesagem_resumo (primeira/última pesagem)
+-- ============================================================
+-- Projeção mantida por triggers em pesagens. Substitui os
+-- LATERAL (... ORDER BY data_pesagem DESC LIMIT 1) das views.
+CREATE TABLE IF NOT EXISTS animais_pesagem_resumo (
+    animal_id INTEGER PRIMARY KEY REFERENCES animais(id) ON DELETE CASCADE,
+    peso_inicial NUMERIC(10,2) NOT NULL,
+    data_pesagem_inicial DATE NOT NULL,
+    ultimo_peso NUMERIC(10,2) NOT NULL,
+    data_ultimo_peso DATE NOT NULL,
+    total_pesagens INTEGER NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE animais_pesagem_resumo ADD COLUMN IF NOT EXISTS gmd NUMERIC(10,3);
+ALTER TABLE animais_pesagem_resumo ADD COLUMN IF NOT EXISTS ultimo_gmd NUMERIC(10,3);
+
+COMMENT ON TABLE animais_pesagem_resumo IS 'Resumo de pesagens por animal (mantido por trigger em pesagens)';
+COMMENT ON COLUMN animais_pesagem_resumo.gmd IS 'GMD entre a primeira e a última pesagem';
+COMMENT ON COLUMN animais_pesagem_resumo.ultimo_gmd IS 'GMD da última pesagem em relação à anterior';
+
+CREATE INDEX IF NOT EXISTS idx_pesagens_animal_data ON pesagens(animal_id, data_pesagem, id);
+CREATE INDEX IF NOT EXISTS idx_resumo_pesagens_gmd ON animais_pesagem_resumo(gmd DESC);
+
+-- Função: Recalcular o resumo de um conjunto de animais
+CREATE OR REPLACE FUNCTION fn_recalcular_resumo_pesagens(
+    p_animal_ids INTEGER[]
+) RETURNS VOID AS $$
+BEGIN
+    IF COALESCE(cardinality(p_animal_ids), 0) = 0 THEN
+        RETURN;
+    END IF;
+
+    DELETE FROM animais_pesagem_resumo r
+    WHERE r.animal_id = ANY(p_animal_ids)
+      AND NOT EXISTS (SELECT 1 FROM pesagens p WHERE p.animal_id = r.animal_id);
+
+    INSERT INTO animais_pesagem_resumo (
+        animal_id, peso_inicial, data_pesagem_inicial, ultimo_peso,
+        data_ultimo_peso, total_pesagens, gmd, ultimo_gmd, updated_at
+    )
+    SELECT
+        x.animal_id, x.peso_inicial, x.data_inicial, x.ultimo_peso, x.data_final, x.total,
+        ROUND((x.ultimo_peso - x.peso_inicial) / NULLIF(x.data_final - x.data_inicial, 0), 3),
+        x.ultimo_gmd,
+        CURRENT_TIMESTAMP
+    FROM (
+        SELECT
+            p.animal_id,
+            (ARRAY_AGG(p.peso ORDER BY p.data_pesagem, p.id))[1] as peso_inicial,
+            MIN(p.data_pesagem) as data_inicial,
+            (ARRAY_AGG(p.peso ORDER BY p.data_pesagem DESC, p.id DESC))[1] as ultimo_peso,
+            MAX(p.data_pesagem) as data_final,
+            (ARRAY_AGG(p.gmd ORDER BY p.data_pesagem DESC, p.id DESC))[1] as ultimo_gmd,
+            COUNT(*) as total
+        FROM pesagens p
+        WHERE p.animal_id = ANY(p_animal_ids)
+        GROUP BY p.animal_id
+    ) x
+    ON CONFLICT (animal_id) DO UPDATE SET
+        peso_inicial = EXCLUDED.peso_inicial,
+        data_pesagem_inicial = EXCLUDED.data_pesagem_inicial,
+        ultimo_peso = EXCLUDED.ultimo_peso,
+        data_ultimo_peso = EXCLUDED.data_ultimo_peso,
+        total_pesagens = EXCLUDED.total_pesagens,
+        gmd = EXCLUDED.gmd,
+        ultimo_gmd = EXCLUDED.ultimo_gmd,
+        updated_at = EXCLUDED.updated_at;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================================
+-- 2. GMD POR PESAGEM (pesagens.ganho_peso / pesagens.gmd)
+-- ============================================================
+-- Cada pesagem guarda o ganho e o GMD em relação à pesagem anterior do
+-- mesmo animal (ordem data_pesagem, id). Só as linhas cujo valor muda
+-- são regravadas: a própria pesagem e a seguinte, inclusive quando a
+-- pesagem é retroativa, alterada ou excluída.
+CREATE OR REPLACE FUNCTION fn_recalcular_gmd_pesagens(
+    p_animal_ids INTEGER[]
+) RETURNS VOID AS $$
+BEGIN
+    IF COALESCE(cardinality(p_animal_ids), 0) = 0 THEN
+        RETURN;
+    END IF;
+
+    UPDATE pesagens p
+    SET ganho_peso = c.ganho_peso,
+        gmd = c.gmd
+    FROM (
+        SELECT
+            id,
+            peso - LAG(peso) OVER w as ganho_peso,
+            ROUND((peso - LAG(peso) OVER w) / NULLIF(data_pesagem - LAG(data_pesagem) OVER w, 0), 3) as gmd
+        FROM pesagens
+        WHERE animal_id = ANY(p_animal_ids)
+        WINDOW w AS (PARTITION BY animal_id ORDER BY data_pesagem, id)
+    ) c
+    WHERE p.id = c.id
+      AND (p.ganho_peso IS DISTINCT FROM c.ganho_peso OR p.gmd IS DISTINCT FROM c.gmd);
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================================
+-- 3. TRIGGERS EM pesagens
+-- ============================================================
+-- Função: Recalcular GMD e resumo dos animais afetados
+CREATE OR REPLACE FUNCTION fn_pesagens_alteradas(
+    p_animal_ids INTEGER[]
+) RETURNS VOID AS $$
+BEGIN
+    IF COALESCE(cardinality(p_animal_ids), 0) = 0 THEN
+        RETURN;
+    END IF;
+
+    -- Serializa escritas concorrentes do mesmo animal; os recálculos abaixo
+    -- rodam com um snapshot novo e enxergam as pesagens já confirmadas
+    PERFORM 1 FROM animais WHERE id = ANY(p_animal_ids) ORDER BY id FOR NO KEY UPDATE;
+
+    PERFORM fn_recalcular_gmd_pesagens(p_animal_ids);
+    PERFORM fn_recalcular_resumo_pesagens(p_animal_ids);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Triggers por comando (transition tables): uma importação em lote
+-- recalcula cada animal uma única vez
+CREATE OR REPLACE FUNCTION trg_resumo_pesagens_ins()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM fn_pesagens_alteradas(ARRAY(SELECT DISTINCT animal_id FROM novas));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION trg_resumo_pesagens_upd()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Só mudanças de animal, peso ou data afetam GMD e resumo; isso também
+    -- ignora o UPDATE de ganho_peso/gmd feito por fn_recalcular_gmd_pesagens
+    PERFORM fn_pesagens_alteradas(ARRAY(
+        SELECT n.animal_id FROM novas n JOIN antigas o ON o.id = n.id
+        WHERE (n.animal_id, n.peso, n.data_pesagem) IS DISTINCT FROM (o.animal_id, o.peso, o.data_pesagem)
+        UNION
+        SELECT o.animal_id FROM novas n JOIN antigas o ON o.id = n.id
+        WHERE (n.animal_id, n.peso, n.data_pesagem) IS DISTINCT FROM (o.animal_id, o.peso, o.data_pesagem)
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION trg_resumo_pesagens_del()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM fn_pesagens_alteradas(ARRAY(SELECT DISTINCT animal_id FROM antigas));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_pesagens_resumo_ins ON pesagens;
+CREATE TRIGGER trg_pesagens_resumo_ins
+    AFTER INSERT ON pesagens
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION trg_resumo_pesagens_ins();
+
+DROP TRIGGER IF EXISTS trg_pesagens_resumo_upd ON pesagens;
+CREATE TRIGGER trg_pesagens_resumo_upd
+    AFTER UPDATE ON pesagens
+    REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION trg_resumo_pesagens_upd();
+
+DROP TRIGGER IF EXISTS trg_pesagens_resumo_del ON pesagens;
+CREATE TRIGGER trg_pesagens_resumo_del
+    AFTER DELETE ON pesagens
+    REFERENCING OLD TABLE AS antigas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION trg_resumo_pesagens_del();
+
+-- Função: Reconstruir GMD e resumo de todo o rebanho (backfill / reparo)
+-- Uso: SELECT fn_reconstruir_resumo_pesagens();
+CREATE OR REPLACE FUNCTION fn_reconstruir_resumo_pesagens()
+RETURNS INTEGER AS $$
+DECLARE
+    v_ids INTEGER[];
+BEGIN
+    LOCK TABLE pesagens IN SHARE ROW EXCLUSIVE MODE;
+    LOCK TABLE animais_pesagem_resumo IN EXCLUSIVE MODE;
+
+    v_ids := ARRAY(SELECT DISTINCT animal_id FROM pesagens);
+    DELETE FROM animais_pesagem_resumo WHERE NOT (animal_id = ANY(v_ids));
+
+    PERFORM fn_recalcular_gmd_pesagens(v_ids);
+    PERFORM fn_recalcular_resumo_pesagens(v_ids);
+
+    RETURN COALESCE(cardinality(v_ids), 0);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Backfill dos dados existentes
+SELECT fn_reconstruir_resumo_pesagens();
+
+-- ============================================================
+-- 4. VIEWS E FUNÇÕES REESCRITAS SOBRE O RESUMO
+-- ============================================================
+DROP VIEW IF EXISTS vw_rebanho_ativo CASCADE;
+CREATE VIEW vw_rebanho_ativo AS
+SELECT
+    a.*,
+    r.ultimo_peso,
+    r.data_ultimo_peso,
+    EXTRACT(YEAR FROM AGE(CURRENT_DATE, a.data_nascimento)) as idade_anos,
+    EXTRACT(MONTH FROM AGE(CURRENT_DATE, a.data_nascimento)) as idade_meses
+FROM animais a
+LEFT JOIN animais_pesagem_resumo r ON r.animal_id = a.id
+WHERE a.status = 'ativo';
+
+DROP VIEW IF EXISTS vw_performance_animais CASCADE;
+CREATE VIEW vw_performance_animais AS
+SELECT
+    a.id,
+    a.brinco,
+    a.nome,
+    a.raca,
+    a.sexo,
+    a.lote,
+    r.peso_inicial,
+    r.data_pesagem_inicial,
+    r.ultimo_peso as peso_final,
+    r.data_ultimo_peso as data_pesagem_final,
+    (r.ultimo_peso - r.peso_inicial) as ganho_total,
+    r.gmd,
+    (r.data_ultimo_peso - r.data_pesagem_inicial) as dias_periodo,
+    r.ultimo_gmd,
+    r.total_pesagens
+FROM animais a
+INNER JOIN animais_pesagem_resumo r ON r.animal_id = a.id
+WHERE a.status = 'ativo'
+AND r.data_pesagem_inicial < r.data_ultimo_peso;
+
+-- Função para calcular GMD de um animal (lê o resumo mantido)
+CREATE OR REPLACE FUNCTION calcular_gmd(p_animal_id INTEGER)
+RETURNS NUMERIC AS $$
+    SELECT gmd FROM animais_pesagem_resumo WHERE animal_id = p_animal_id;
+$$ LANGUAGE sql STABLE;
+
+-- ============================================================
+-- 5. TABELA: rebanho_resumo (resumo materializado do dashboard)
+-- ============================================================
+-- Uma única linha com o resultado de vw_resumo_rebanho. Escritas em
+-- animais só avançam a sequência rebanho_resumo_versao (nextval não
+-- trava nada nem entra na transação de quem escreve); o recálculo
+-- (varredura do rebanho) acontece no máximo uma vez por janela de
+-- debounce, em fn_obter_resumo_rebanho, e no mínimo a cada p_ttl.
+-- O resumo está pendente quando a sequência passou de versao_resumida.
+-- Cada escrita também segura, até o commit, um advisory lock
+-- compartilhado (chave 'rebanho_resumo'): compartilhado com compartilhado
+-- não espera, e o recálculo só o pede exclusivo por um instante, sem
+-- esperar, para saber se há escrita em voo.
+CREATE TABLE IF NOT EXISTS rebanho_resumo (
+    id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    total_animais BIGINT NOT NULL DEFAULT 0,
+    total_machos BIGINT NOT NULL DEFAULT 0,
+    total_femeas BIGINT NOT NULL DEFAULT 0,
+    peso_medio NUMERIC,
+    peso_total NUMERIC,
+    peso_minimo NUMERIC,
+    peso_maximo NUMERIC,
+    atualizado_em TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp(),
+    versao_resumida BIGINT NOT NULL DEFAULT 0
+);
+
+-- Bancos migrados antes marcavam a pendência em alterado_em, com UPDATE
+-- na linha do resumo dentro de cada transação que escrevia em animais
+ALTER TABLE rebanho_resumo ADD COLUMN IF NOT EXISTS versao_resumida BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE rebanho_resumo DROP COLUMN IF EXISTS alterado_em;
+
+CREATE SEQUENCE IF NOT EXISTS rebanho_resumo_versao;
+
+COMMENT ON TABLE rebanho_resumo IS 'Resumo do rebanho materializado (ver fn_obter_resumo_rebanho)';
+COMMENT ON COLUMN rebanho_resumo.versao_resumida IS 'Valor de rebanho_resumo_versao lido antes da última varredura';
+
+INSERT INTO rebanho_resumo (id) VALUES (1)
+ON CONFLICT (id) DO NOTHING;
+
+-- Função: Última versão de animais (0 antes da primeira escrita)
+CREATE OR REPLACE FUNCTION fn_versao_rebanho()
+RETURNS BIGINT AS $$
+    SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM rebanho_resumo_versao;
+$$ LANGUAGE sql VOLATILE;
+
+-- Função: Recalcular o resumo a partir de vw_resumo_rebanho. A versão é
+-- lida antes da varredura e só quando nenhuma escrita está em voo: aí
+-- tudo até ela já foi commitado e entra na varredura. Com escrita em voo,
+-- ou durante a varredura, o resumo continua pendente para o próximo
+-- recálculo.
+CREATE OR REPLACE FUNCTION fn_atualizar_resumo_rebanho()
+RETURNS rebanho_resumo AS $$
+DECLARE
+    v_resumo rebanho_resumo;
+    v_versao BIGINT;
+BEGIN
+    IF pg_try_advisory_lock(hashtext('rebanho_resumo')) THEN
+        v_versao := fn_versao_rebanho();
+        PERFORM pg_advisory_unlock(hashtext('rebanho_resumo'));
+    END IF;
+
+    UPDATE rebanho_resumo r SET
+        total_animais = v.total_animais,
+        total_machos = v.total_machos,
+        total_femeas = v.total_femeas,
+        peso_medio = v.peso_medio,
+        peso_total = v.peso_total,
+        peso_minimo = v.peso_minimo,
+        peso_maximo = v.peso_maximo,
+        atualizado_em = clock_timestamp(),
+        versao_resumida = COALESCE(v_versao, r.versao_resumida)
+    FROM vw_resumo_rebanho v
+    WHERE r.id = 1
+    RETURNING r.* INTO v_resumo;
+
+    RETURN v_resumo;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Função: Ler o resumo, recalculando se estiver pendente e o último
+-- recálculo tiver mais de p_debounce, ou se for mais velho que p_ttl.
+-- Só um processo recalcula por vez (SKIP LOCKED); os demais devolvem a
+-- versão atual. Escritas em animais nunca esperam por esta linha.
+CREATE OR REPLACE FUNCTION fn_obter_resumo_rebanho(
+    p_debounce INTERVAL,
+    p_ttl INTERVAL
+) RETURNS rebanho_resumo AS $$
+DECLARE
+    v_resumo rebanho_resumo;
+BEGIN
+    SELECT * INTO v_resumo FROM rebanho_resumo WHERE id = 1;
+
+    IF (fn_versao_rebanho() > v_resumo.versao_resumida AND clock_timestamp() - v_resumo.atualizado_em >= p_debounce)
+       OR clock_timestamp() - v_resumo.atualizado_em >= p_ttl THEN
+        PERFORM 1 FROM rebanho_resumo WHERE id = 1 FOR UPDATE SKIP LOCKED;
+        IF FOUND THEN
+            v_resumo := fn_atualizar_resumo_rebanho();
+        END IF;
+    END IF;
+
+    RETURN v_resumo;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Trigger: Marcar o resumo como pendente (sem travar linha nenhuma)
+CREATE OR REPLACE FUNCTION trg_marcar_resumo_rebanho()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_advisory_xact_lock_shared(hashtext('rebanho_resumo'));
+    PERFORM nextval('rebanho_resumo_versao');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_animais_resumo_rebanho ON animais;
+CREATE TRIGGER trg_animais_resumo_rebanho
+    AFTER INSERT OR DELETE ON animais
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION trg_marcar_resumo_rebanho();
+
+DROP TRIGGER IF EXISTS trg_animais_resumo_rebanho_upd ON animais;
+CREATE TRIGGER trg_animais_resumo_rebanho_upd
+    AFTER UPDATE OF status, sexo, peso_atual ON animais
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION trg_marcar_resumo_rebanho();
+
+SELECT fn_atualizar_resumo_rebanho();
+
+-- ============================================================
+-- 6. ÍNDICES DAS VIEWS DE AGENDA
+-- ============================================================
+-- v_proximos_eventos filtra por data_prevista (partos e diagnósticos
+-- previstos); sem índice, varre todo o histórico reprodutivo.
+-- Validado por verificar_planos.py.
+CREATE INDEX IF NOT EXISTS idx_eventos_data_prevista
+    ON eventos_reprodutivos(data_prevista)
+    WHERE data_prevista IS NOT NULL;
+
+-- ============================================================
+-- 7. LOG DE SINCRONIZAÇÃO (GET /api/sync)
+-- ============================================================
+-- Cada INSERT/UPDATE/DELETE nas tabelas replicadas pelo app offline gera
+-- uma linha em sync_log com o id da transação (xid8). O cursor do cliente
+-- é (xid, id): a API só entrega linhas de transações abaixo do xmin do
+-- snapshot, então uma transação longa que commita depois nunca fica para
+-- trás do cursor.
+CREATE TABLE IF NOT EXISTS sync_log (
+    id BIGSERIAL PRIMARY KEY,
+    xid XID8 NOT NULL DEFAULT pg_current_xact_id(),
+    tabela VARCHAR(40) NOT NULL,
+    registro_id INTEGER NOT NULL,
+    operacao CHAR(1) NOT NULL CHECK (operacao IN ('U', 'D')),
+    criado_em TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_sync_log_cursor ON sync_log(xid, id);
+CREATE INDEX IF NOT EXISTS idx_sync_log_registro ON sync_log(tabela, registro_id);
+
+-- Última exclusão compactada. O cursor leva o log_id do horizonte em que
+-- foi emitido: se o horizonte passou do cursor desde então, o cliente
+-- perdeu exclusões e precisa baixar tudo de novo
+CREATE TABLE IF NOT EXISTS sync_horizonte (
+    id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    xid XID8 NOT NULL DEFAULT '0',
+    log_id BIGINT NOT NULL DEFAULT 0
+);
+INSERT INTO sync_horizonte (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION trg_registrar_sync_log()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO sync_log (tabela, registro_id, operacao)
+        SELECT TG_TABLE_NAME, id, 'D' FROM linhas_antigas;
+    ELSE
+        INSERT INTO sync_log (tabela, registro_id, operacao)
+        SELECT TG_TABLE_NAME, id, 'U' FROM linhas_novas;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Triggers por comando (tabelas de transição exigem um trigger por evento)
+DO $$
+DECLARE
+    v_tabela TEXT;
+BEGIN
+    FOREACH v_tabela IN ARRAY ARRAY['animais', 'pesagens', 'sanidade',
+                                    'eventos_reprodutivos', 'lotes', 'pastos']
+    LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_sync_ins ON %I', v_tabela, v_tabela);
+        EXECUTE format('CREATE TRIGGER trg_%s_sync_ins AFTER INSERT ON %I
+                        REFERENCING NEW TABLE AS linhas_novas
+                        FOR EACH STATEMENT EXECUTE FUNCTION trg_registrar_sync_log()',
+                       v_tabela, v_tabela);
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_sync_upd ON %I', v_tabela, v_tabela);
+        EXECUTE format('CREATE TRIGGER trg_%s_sync_upd AFTER UPDATE ON %I
+                        REFERENCING NEW TABLE AS linhas_novas
+                        FOR EACH STATEMENT EXECUTE FUNCTION trg_registrar_sync_log()',
+                       v_tabela, v_tabela);
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_sync_del ON %I', v_tabela, v_tabela);
+        EXECUTE format('CREATE TRIGGER trg_%s_sync_del AFTER DELETE ON %I
+                        REFERENCING OLD TABLE AS linhas_antigas
+                        FOR EACH STATEMENT EXECUTE FUNCTION trg_registrar_sync_log()',
+                       v_tabela, v_tabela);
+
+        -- Carga inicial: registros anteriores ao log entram como alterados
+        IF NOT EXISTS (SELECT 1 FROM sync_log WHERE tabela = v_tabela) THEN
+            EXECUTE format('INSERT INTO sync_log (tabela, registro_id, operacao)
+                            SELECT %L, id, ''U'' FROM %I ORDER BY id', v_tabela, v_tabela);
+        END IF;
+    END LOOP;
+END $$;
+
+-- Compactação: descarta entradas superadas por outra mais nova do mesmo
+-- registro (o cliente recebe a mais nova de qualquer forma) e exclusões
+-- mais antigas que p_reter_exclusoes, avançando o horizonte.
+-- Rodar periodicamente: SELECT fn_compactar_sync_log();
+CREATE OR REPLACE FUNCTION fn_compactar_sync_log(p_reter_exclusoes INTERVAL DEFAULT '90 days')
+RETURNS INTEGER AS $$
+DECLARE
+    v_superadas INTEGER;
+    v_xid XID8;
+    v_id BIGINT;
+BEGIN
+    DELETE FROM sync_log l
+    USING sync_log n
+    WHERE n.tabela = l.tabela
+      AND n.registro_id = l.registro_id
+      AND (n.xid, n.id) > (l.xid, l.id);
+    GET DIAGNOSTICS v_superadas = ROW_COUNT;
+
+    WITH removidas AS (
+        DELETE FROM sync_log
+        WHERE operacao = 'D' AND criado_em < NOW() - p_reter_exclusoes
+        RETURNING xid, id
+    )
+    SELECT xid, id INTO v_xid, v_id
+    FROM removidas ORDER BY xid DESC, id DESC LIMIT 1;
+
+    IF v_xid IS NOT NULL THEN
+        UPDATE sync_horizonte SET xid = v_xid, log_id = v_id
+        WHERE id = 1 AND (xid, log_id) < (v_xid, v_id);
+    END IF;
+
+    RETURN v_superadas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================================
+-- 8. CHAVES DE IDEMPOTÊNCIA (POST /api/sync/push)
+-- ============================================================
+-- Cada mutação enviada pelo app offline traz uma chave gerada no
+-- aparelho. A chave é gravada na mesma transação que aplica a mutação:
+-- um reenvio (reconexão, timeout) devolve o resultado guardado em vez de
+-- gravar de novo.
+CREATE TABLE IF NOT EXISTS sync_idempotencia (
+    usuario_id INTEGER NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
+    chave VARCHAR(100) NOT NULL,
+    tipo VARCHAR(30) NOT NULL,
+    resultado JSONB,
+    criado_em TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (usuario_id, chave)
+);
+
+CREATE INDEX IF NOT EXISTS idx_sync_idempotencia_criado ON sync_idempotencia(criado_em);
+
+-- ============================================================
+-- 9. NOTIFY DAS TABELAS DE CADASTRO (cache da API)
+-- ============================================================
+-- A API mantém em memória raças, categorias, lotes, pastos e touros.
+-- Qualquer escrita nessas tabelas avisa o canal cadastros_alterados com o
+-- nome da tabela; cada worker escuta o canal e descarta o que depende
+-- dela. animais entra porque lotes/pastos trazem a contagem de animais e
+-- porque animais, touros e partos formam a genealogia em memória.
+CREATE OR REPLACE FUNCTION trg_notificar_cadastro()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Entregue no COMMIT; avisos repetidos na mesma transação viram um só
+    PERFORM pg_notify('cadastros_alterados', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    v_tabela TEXT;
+BEGIN
+    FOREACH v_tabela IN ARRAY ARRAY['racas', 'categorias', 'lotes', 'pastos', 'touros']
+    LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_notificar_cadastro ON %I', v_tabela, v_tabela);
+        EXECUTE format('CREATE TRIGGER trg_%s_notificar_cadastro
+                        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I
+                        FOR EACH STATEMENT EXECUTE FUNCTION trg_notificar_cadastro()',
+                       v_tabela, v_tabela);
+    END LOOP;
+END $$;
+
+DROP TRIGGER IF EXISTS trg_animais_notificar_cadastro ON animais;
+CREATE TRIGGER trg_animais_notificar_cadastro
+    AFTER INSERT OR DELETE OR UPDATE OF lote, pasto, status, brinco, nome, sexo, pai_id, mae_id ON animais
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION trg_notificar_cadastro();
+
+DROP TRIGGER IF EXISTS trg_eventos_reprodutivos_notificar_cadastro ON eventos_reprodutivos;
+CREATE TRIGGER trg_eventos_reprodutivos_notificar_cadastro
+    AFTER INSERT OR DELETE OR UPDATE OF animal_id, tipo_evento, data_evento, touro_id, bezerra_id, natimorto
+    ON eventos_reprodutivos
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION trg_notificar_cadastro();
+
+-- ============================================================
+-- 10. CAMPANHAS SANITÁRIAS (POST /api/sanidade/campanhas)
+-- ============================================================
+-- Uma campanha (ex.: aftosa no rebanho inteiro) grava um registro de
+-- sanidade por animal com o mesmo campanha_id, num único INSERT ... SELECT.
+-- A campanha é consultada, custeada e desfeita como uma unidade.
+CREATE TABLE IF NOT EXISTS campanhas_sanitarias (
+    id SERIAL PRIMARY KEY,
+    nome VARCHAR(200) NOT NULL,
+    tipo VARCHAR(50) NOT NULL,
+    produto VARCHAR(200) NOT NULL,
+    dose VARCHAR(50),
+    aplicador VARCHAR(100),
+    data_aplicacao DATE NOT NULL,
+    proxima_aplicacao DATE,
+    custo_unitario NUMERIC(10,2),
+    observacoes TEXT,
+    criterio JSONB NOT NULL DEFAULT '{}',
+    total_animais INTEGER NOT NULL DEFAULT 0,
+    usuario_id INTEGER REFERENCES usuarios(id) ON DELETE SET NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    desfeita_em TIMESTAMP
+);
+
+ALTER TABLE sanidade ADD COLUMN IF NOT EXISTS campanha_id INTEGER
+    REFERENCES campanhas_sanitarias(id) ON DELETE SET NULL;
+
+CREATE INDEX IF NOT EXISTS idx_sanidade_campanha
+    ON sanidade(campanha_id)
+    WHERE campanha_id IS NOT NULL;
+
+-- ============================================================
+-- 11. AGENDA SANITÁRIA (GET /api/sanidade/proximas)
+-- ============================================================
+-- Uma linha por animal ativo e produto, com a dose pendente da aplicação
+-- mais recente daquele produto. Uma aplicação nova substitui a pendência
+-- anterior (sem ela, doses já aplicadas continuavam na agenda) e o
+-- calendário vira uma busca por faixa em idx_sanidade_agenda_proxima, em
+-- vez de varrer sanidade e animais a cada consulta.
+CREATE TABLE IF NOT EXISTS sanidade_agenda (
+    animal_id INTEGER NOT NULL REFERENCES animais(id) ON DELETE CASCADE,
+    produto VARCHAR(200) NOT NULL,
+    sanidade_id INTEGER NOT NULL,
+    tipo VARCHAR(50),
+    data_aplicacao DATE NOT NULL,
+    proxima_aplicacao DATE NOT NULL,
+    PRIMARY KEY (animal_id, produto)
+);
+
+CREATE INDEX IF NOT EXISTS idx_sanidade_agenda_proxima
+    ON sanidade_agenda(proxima_aplicacao);
+
+-- Última aplicação de cada produto por animal, sem ordenar o histórico
+CREATE INDEX IF NOT EXISTS idx_sanidade_animal_produto
+    ON sanidade(animal_id, produto, data_aplicacao DESC, id DESC);
+
+-- Função: Recalcular a agenda dos pares (animal, produto) afetados
+-- p_animal_ids e p_produtos são paralelos: o par i é (p_animal_ids[i], p_produtos[i])
+CREATE OR REPLACE FUNCTION fn_recalcular_agenda_sanitaria(
+    p_animal_ids INTEGER[],
+    p_produtos VARCHAR[]
+) RETURNS VOID AS $$
+BEGIN
+    IF COALESCE(cardinality(p_animal_ids), 0) = 0 THEN
+        RETURN;
+    END IF;
+
+    -- Serializa escritas concorrentes do mesmo animal (ver fn_pesagens_alteradas)
+    PERFORM 1 FROM animais WHERE id = ANY(p_animal_ids) ORDER BY id FOR NO KEY UPDATE;
+
+    DELETE FROM sanidade_agenda g
+    USING unnest(p_animal_ids, p_produtos) AS p(animal_id, produto)
+    WHERE g.animal_id = p.animal_id AND g.produto = p.produto;
+
+    -- Última aplicação de cada par direto de idx_sanidade_animal_produto
+    INSERT INTO sanidade_agenda (animal_id, produto, sanidade_id, tipo, data_aplicacao, proxima_aplicacao)
+    SELECT u.animal_id, u.produto, u.id, u.tipo, u.data_aplicacao, u.proxima_aplicacao
+    FROM (SELECT DISTINCT * FROM unnest(p_animal_ids, p_produtos) AS p(animal_id, produto)) p
+    JOIN animais a ON a.id = p.animal_id AND a.status = 'ativo'
+    CROSS JOIN LATERAL (
+        SELECT s.animal_id, s.produto, s.id, s.tipo, s.data_aplicacao, s.proxima_aplicacao
+        FROM sanidade s
+        WHERE s.animal_id = p.animal_id AND s.produto = p.produto
+        ORDER BY s.data_aplicacao DESC, s.id DESC
+        LIMIT 1
+    ) u
+    WHERE u.proxima_aplicacao IS NOT NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION trg_agenda_sanidade_ins()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM fn_recalcular_agenda_sanitaria(array_agg(animal_id), array_agg(produto))
+    FROM (SELECT DISTINCT animal_id, produto FROM novas) p;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION trg_agenda_sanidade_upd()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM fn_recalcular_agenda_sanitaria(array_agg(animal_id), array_agg(produto))
+    FROM (
+        SELECT n.animal_id, n.produto FROM novas n JOIN antigas o ON o.id = n.id
+        WHERE (n.animal_id, n.produto, n.tipo, n.data_aplicacao, n.proxima_aplicacao)
+              IS DISTINCT FROM (o.animal_id, o.produto, o.tipo, o.data_aplicacao, o.proxima_aplicacao)
+        UNION
+        SELECT o.animal_id, o.produto FROM novas n JOIN antigas o ON o.id = n.id
+        WHERE (n.animal_id, n.produto, n.tipo, n.data_aplicacao, n.proxima_aplicacao)
+              IS DISTINCT FROM (o.animal_id, o.produto, o.tipo, o.data_aplicacao, o.proxima_aplicacao)
+    ) p;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION trg_agenda_sanidade_del()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM fn_recalcular_agenda_sanitaria(array_agg(animal_id), array_agg(produto))
+    FROM (SELECT DISTINCT animal_id, produto FROM antigas) p;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Animal que sai do rebanho ativo (venda, morte) sai da agenda; se voltar,
+-- a agenda é refeita a partir do histórico
+CREATE OR REPLACE FUNCTION trg_agenda_animais_status()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM fn_recalcular_agenda_sanitaria(array_agg(animal_id), array_agg(produto))
+    FROM (
+        SELECT DISTINCT s.animal_id, s.produto
+        FROM novas n
+        JOIN antigas o ON o.id = n.id
+        JOIN sanidade s ON s.animal_id = n.id
+        WHERE n.status IS DISTINCT FROM o.status
+    ) p;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_sanidade_agenda_ins ON sanidade;
+CREATE TRIGGER trg_sanidade_agenda_ins
+    AFTER INSERT ON sanidade
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION trg_agenda_sanidade_ins();
+
+DROP TRIGGER IF EXISTS trg_sanidade_agenda_upd ON sanidade;
+CREATE TRIGGER trg_sanidade_agenda_upd
+    AFTER UPDATE ON sanidade
+    REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION trg_agenda_sanidade_upd();
+
+DROP TRIGGER IF EXISTS trg_sanidade_agenda_del ON sanidade;
+CREATE TRIGGER trg_sanidade_agenda_del
+    AFTER DELETE ON sanidade
+    REFERENCING OLD TABLE AS antigas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION trg_agenda_sanidade_del();
+
+DROP TRIGGER IF EXISTS trg_animais_agenda_sanitaria ON animais;
+CREATE TRIGGER trg_animais_agenda_sanitaria
+    AFTER UPDATE ON animais
+    REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION trg_agenda_animais_status();
+
+-- Função: Reconstruir a agenda de todo o rebanho (backfill / reparo)
+-- Uso: SELECT fn_reconstruir_agenda_sanitaria();
+CREATE OR REPLACE FUNCTION fn_reconstruir_agenda_sanitaria()
+RETURNS INTEGER AS $$
+DECLARE
+    v_total INTEGER;
+BEGIN
+    LOCK TABLE sanidade IN SHARE ROW EXCLUSIVE MODE;
+    LOCK TABLE sanidade_agenda IN EXCLUSIVE MODE;
+
+    DELETE FROM sanidade_agenda;
+    INSERT INTO sanidade_agenda (animal_id, produto, sanidade_id, tipo, data_aplicacao, proxima_aplicacao)
+    SELECT animal_id, produto, id, tipo, data_aplicacao, proxima_aplicacao
+    FROM (
+        SELECT DISTINCT ON (s.animal_id, s.produto)
+            s.animal_id, s.produto, s.id, s.tipo, s.data_aplicacao, s.proxima_aplicacao
+        FROM sanidade s
+        JOIN animais a ON a.id = s.animal_id AND a.status = 'ativo'
+        ORDER BY s.animal_id, s.produto, s.data_aplicacao DESC, s.id DESC
+    ) ultima
+    WHERE proxima_aplicacao IS NOT NULL;
+
+    GET DIAGNOSTICS v_total = ROW_COUNT;
+    RETURN v_total;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT fn_reconstruir_agenda_sanitaria();
+
+-- Mesmas colunas de antes (relatório PDF e consultas manuais), agora sobre
+-- a agenda: só a dose pendente mais recente de cada produto
+CREATE OR REPLACE VIEW vw_aplicacoes_proximas AS
+SELECT
+    g.sanidade_id AS id,
+    g.animal_id,
+    a.brinco,
+    a.nome,
+    g.tipo,
+    g.produto,
+    g.proxima_aplicacao,
+    (g.proxima_aplicacao - CURRENT_DATE) AS dias_restantes
+FROM sanidade_agenda g
+INNER JOIN animais a ON a.id = g.animal_id
+WHERE g.proxima_aplicacao >= CURRENT_DATE
+ORDER BY g.proxima_aplicacao;
+
+-- ============================================================
+-- 12. HISTÓRICO REPRODUTIVO POR ANIMAL (plano de acasalamento, genealogia)
+-- ============================================================
+-- "Última inseminação da vaca antes deste parto/aborto" vira uma leitura
+-- de uma entrada do índice, em vez de um BitmapAnd de idx_eventos_animal
+-- com idx_eventos_data para cada parto do histórico.
+CREATE INDEX IF NOT EXISTS idx_eventos_animal_tipo_data
+    ON eventos_reprodutivos(animal_id, tipo_evento, data_evento);
+
+-- ============================================================
+-- 13. ESTADO REPRODUTIVO (recalculado pela API)
+-- ============================================================
+-- O status reprodutivo de cada fêmea é derivado pela API reproduzindo os
+-- eventos dela em ordem (recalcular_estado_reprodutivo, estado_reprodutivo.py),
+-- chamada por criar/atualizar/deletar evento e pelo POST /api/sync/push.
+-- Antes, trg_calcular_datas_ia fazia um UPDATE em animais por evento
+-- inserido e ignorava UPDATE/DELETE, e o status se perdia.
+-- A carga inicial é feita aqui por fn_reconstruir_reproducao_resumo(),
+-- que reproduz os eventos com as mesmas transições da API.
+CREATE TABLE IF NOT EXISTS animais_reproducao_resumo (
+    animal_id INTEGER PRIMARY KEY REFERENCES animais(id) ON DELETE CASCADE,
+    status_reprodutivo VARCHAR(30),
+    data_ultima_cobertura DATE,
+    touro_ultima_cobertura INTEGER REFERENCES touros(id) ON DELETE SET NULL,
+    data_prevista_parto DATE,
+    data_concepcao DATE,
+    data_ultimo_parto DATE,
+    total_partos INTEGER NOT NULL DEFAULT 0,
+    atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- O trigger por linha fica só com o que é da própria linha: a data
+-- prevista de parto da inseminação, também quando a data é corrigida
+CREATE OR REPLACE FUNCTION trg_calcular_datas_ia()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.tipo_evento = 'inseminacao' THEN
+        NEW.data_prevista := fn_data_prevista_parto(NEW.data_evento);
+    ELSIF TG_OP = 'UPDATE' AND OLD.tipo_evento = 'inseminacao' THEN
+        NEW.data_prevista := NULL;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_eventos_reproducao ON eventos_reprodutivos;
+CREATE TRIGGER trg_eventos_reproducao
+    BEFORE INSERT OR UPDATE OF tipo_evento, data_evento
+    ON eventos_reprodutivos
+    FOR EACH ROW
+    EXECUTE FUNCTION trg_calcular_datas_ia();
+
+-- Função: Reconstruir o estado reprodutivo de todo o rebanho (backfill / reparo)
+-- Mesmas transições de TRANSICOES_REPRODUTIVAS (estado_reprodutivo.py);
+-- 'cio' e tipos desconhecidos não mudam o estado.
+-- Uso: SELECT fn_reconstruir_reproducao_resumo();
+CREATE OR REPLACE FUNCTION fn_reconstruir_reproducao_resumo()
+RETURNS INTEGER AS $$
+DECLARE
+    e RECORD;
+    v_animal INTEGER;
+    v_status VARCHAR(30);
+    v_cobertura DATE;
+    v_touro INTEGER;
+    v_prevista DATE;
+    v_concepcao DATE;
+    v_ultimo_parto DATE;
+    v_partos INTEGER;
+    v_ciclo DATE;
+    v_total INTEGER := 0;
+BEGIN
+    LOCK TABLE eventos_reprodutivos IN SHARE ROW EXCLUSIVE MODE;
+    LOCK TABLE animais_reproducao_resumo IN EXCLUSIVE MODE;
+
+    DELETE FROM animais_reproducao_resumo;
+
+    FOR e IN
+        SELECT animal_id, tipo_evento::text AS tipo, data_evento, data_prevista, touro_id
+        FROM eventos_reprodutivos
+        ORDER BY animal_id, data_evento, id
+    LOOP
+        IF v_animal IS DISTINCT FROM e.animal_id THEN
+            IF v_animal IS NOT NULL THEN
+                INSERT INTO animais_reproducao_resumo (
+                    animal_id, status_reprodutivo, data_ultima_cobertura, touro_ultima_cobertura,
+                    data_prevista_parto, data_concepcao, data_ultimo_parto, total_partos)
+                VALUES (v_animal, v_status, v_cobertura, v_touro, v_prevista, v_concepcao,
+                        v_ultimo_parto, v_partos);
+                v_total := v_total + 1;
+            END IF;
+            v_animal := e.animal_id;
+            v_status := NULL; v_cobertura := NULL; v_touro := NULL; v_prevista := NULL;
+            v_concepcao := NULL; v_ultimo_parto := NULL; v_ciclo := NULL;
+            v_partos := 0;
+        END IF;
+
+        CONTINUE WHEN e.tipo NOT IN ('inseminacao', 'diagnostico_positivo', 'diagnostico_negativo',
+                                     'parto', 'aborto');
+
+        IF e.tipo = 'inseminacao' THEN
+            v_status := 'inseminada';
+            v_ciclo := e.data_evento;
+            v_cobertura := e.data_evento;
+            v_touro := e.touro_id;
+            v_prevista := e.data_prevista;
+            v_concepcao := NULL;
+        ELSIF e.tipo = 'diagnostico_positivo' THEN
+            v_status := 'prenhe';
+            v_concepcao := v_ciclo;
+        ELSE
+            v_status := CASE e.tipo WHEN 'parto' THEN 'recem_parida' ELSE 'vazia' END;
+            v_ciclo := NULL;
+            v_prevista := NULL;
+            v_concepcao := NULL;
+            IF e.tipo = 'parto' THEN
+                v_ultimo_parto := e.data_evento;
+                v_partos := v_partos + 1;
+            END IF;
+        END IF;
+    END LOOP;
+
+    IF v_animal IS NOT NULL THEN
+        INSERT INTO animais_reproducao_resumo (
+            animal_id, status_reprodutivo, data_ultima_cobertura, touro_ultima_cobertura,
+            data_prevista_parto, data_concepcao, data_ultimo_parto, total_partos)
+        VALUES (v_animal, v_status, v_cobertura, v_touro, v_prevista, v_concepcao,
+                v_ultimo_parto, v_partos);
+        v_total := v_total + 1;
+    END IF;
+
+    UPDATE animais a SET status_reprodutivo = r.status_reprodutivo
+    FROM animais_reproducao_resumo r
+    WHERE r.animal_id = a.id AND a.status_reprodutivo IS DISTINCT FROM r.status_reprodutivo;
+
+    UPDATE animais SET status_reprodutivo = NULL
+    WHERE status_reprodutivo IS NOT NULL
+      AND id NOT IN (SELECT animal_id FROM animais_reproducao_resumo);
+
+    RETURN v_total;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Backfill dos dados existentes
+SELECT fn_reconstruir_reproducao_resumo();
+
+-- Log
+DO $$
+BEGIN
+    RAISE NOTICE '✅ Migração v3.0 - Performance aplicada com sucesso!';
+    RAISE NOTICE '   - animais_pesagem_resumo + triggers em pesagens';
+    RAISE NOTICE '   - ganho_peso/gmd calculados em cada pesagem';
+    RAISE NOTICE '   - rebanho_resumo (resumo materializado do dashboard)';
+    RAISE NOTICE '   - idx_eventos_data_prevista';
+    RAISE NOTICE '   - sync_log (sincronização incremental do app offline)';
+    RAISE NOTICE '   - sync_idempotencia (reenvio seguro de mutações offline)';
+    RAISE NOTICE '   - NOTIFY cadastros_alterados (cache de cadastros da API)';
+    RAISE NOTICE '   - campanhas_sanitarias + sanidade.campanha_id';
+    RAISE NOTICE '   - sanidade_agenda (calendário sanitário indexado)';
+    RAISE NOTICE '   - idx_eventos_animal_tipo_data';
+    RAISE NOTICE '   - animais_reproducao_resumo + fn_reconstruir_reproducao_resumo';
+END $$;
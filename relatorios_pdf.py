@@ -0,0 +1,175 @@
+"""
+Relatórios PDF do rebanho, gerados fora dos workers da API
+
+Executado nos processos do pool de JobsRelatoriosPDF (api_gado.py): cada
+processo (spawn) importa só este módulo, não o app inteiro. O estado de
+cada job fica num JSON ao lado do PDF, gravado de forma atômica, para que
+qualquer worker da API responda ao polling e ao download. Sem efeitos
+colaterais ao importar; o reportlab só é carregado ao renderizar.
+"""
+
+import json
+import os
+import re
+from datetime import date, datetime
+from typing import Optional
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+RE_JOB_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+def agora_iso() -> str:
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def gravar_job(diretorio: str, job: dict):
+    """Grava o estado do job de forma atômica (lido por qualquer worker da API)"""
+    caminho = os.path.join(diretorio, f"{job['id']}.json")
+    tmp = f"{caminho}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(job, f, ensure_ascii=False)
+    os.replace(tmp, caminho)
+
+
+def ler_job(diretorio: str, job_id: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(diretorio, f"{job_id}.json"), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _fmt_pdf(valor, casas: int = 2) -> str:
+    if valor is None:
+        return '-'
+    if isinstance(valor, date):
+        return valor.strftime('%d/%m/%Y')
+    if isinstance(valor, (int, float)) or hasattr(valor, 'quantize'):
+        return f"{float(valor):.{casas}f}" if casas else str(valor)
+    return str(valor)
+
+
+def renderizar_relatorio_pdf(diretorio: str, job_id: str, tipo: str, params: dict, db_config: dict,
+                             timeout: float):
+    """
+    Executado num processo do pool: consulta as views com conexão própria
+    e gera o PDF com reportlab. O resultado e o estado ficam em disco.
+
+    As queries usam statement_timeout = `timeout`: um job que a API dá
+    como perdido não segura o processo (e a vaga na fila) rodando SQL.
+    """
+    job = ler_job(diretorio, job_id) or {'id': job_id, 'tipo': tipo}
+    if job.get('status') == 'erro':
+        # A API já deu o job como perdido (tempo limite na fila)
+        return job['status']
+    job.update({'status': 'processando', 'iniciado_em': agora_iso()})
+    gravar_job(diretorio, job)
+
+    try:
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A4, landscape
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+        verde = colors.HexColor('#556B2F')
+        estilos = getSampleStyleSheet()
+
+        def tabela(cabecalho, linhas):
+            t = Table([cabecalho] + linhas, repeatRows=1)
+            t.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), verde),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+                ('FONTSIZE', (0, 0), (-1, -1), 8),
+                ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F1F4EA')]),
+            ]))
+            return t
+
+        conn = psycopg2.connect(**db_config, cursor_factory=RealDictCursor,
+                                options=f"-c statement_timeout={int(timeout * 1000)}")
+        cur = conn.cursor()
+        secoes = []
+        try:
+            if tipo in ('performance', 'completo'):
+                cur.execute("""
+                    SELECT * FROM vw_performance_animais
+                    ORDER BY gmd DESC NULLS LAST
+                    LIMIT %s
+                """, (params['limite'],))
+                linhas = [[
+                    r['brinco'], r['nome'] or '-', r['raca'] or '-', r['lote'] or '-',
+                    _fmt_pdf(r['peso_inicial']), _fmt_pdf(r['peso_final']), _fmt_pdf(r['ganho_total']),
+                    _fmt_pdf(r['gmd'], 3), _fmt_pdf(r['dias_periodo'], 0)
+                ] for r in cur.fetchall()]
+                secoes.append((f"Ranking de Performance (GMD) - top {params['limite']}", tabela(
+                    ['Brinco', 'Nome', 'Raça', 'Lote', 'Peso inicial', 'Peso final', 'Ganho', 'GMD', 'Dias'],
+                    linhas
+                )))
+
+            if tipo in ('sanidade', 'completo'):
+                cur.execute("""
+                    SELECT * FROM vw_aplicacoes_proximas
+                    WHERE proxima_aplicacao <= CURRENT_DATE + %s
+                    ORDER BY proxima_aplicacao
+                """, (params['dias'],))
+                linhas = [[
+                    r['brinco'], r['nome'] or '-', r['tipo'] or '-', r['produto'],
+                    _fmt_pdf(r['proxima_aplicacao']), _fmt_pdf(r['dias_restantes'], 0)
+                ] for r in cur.fetchall()]
+                secoes.append((f"Calendário Sanitário - próximos {params['dias']} dias", tabela(
+                    ['Brinco', 'Nome', 'Tipo', 'Produto', 'Aplicação', 'Dias restantes'], linhas
+                )))
+
+            if tipo in ('reproducao', 'completo'):
+                cur.execute("SELECT * FROM v_stats_reproducao")
+                stats = cur.fetchone() or {}
+                rotulos = [
+                    ('total_femeas_reprodutivas', 'Fêmeas em idade reprodutiva'),
+                    ('total_prenhas', 'Prenhes'),
+                    ('total_inseminadas', 'Inseminadas'),
+                    ('total_a_diagnosticar', 'A diagnosticar'),
+                    ('total_vazias', 'Vazias'),
+                    ('total_recem_paridas', 'Recém-paridas'),
+                ]
+                secoes.append(("Situação Reprodutiva", tabela(
+                    ['Indicador', 'Total'], [[rotulo, _fmt_pdf(stats.get(c), 0)] for c, rotulo in rotulos]
+                )))
+        finally:
+            cur.close()
+            conn.close()
+
+        destino = os.path.join(diretorio, f"{job_id}.pdf")
+        tmp = f"{destino}.tmp"
+        doc = SimpleDocTemplate(tmp, pagesize=landscape(A4), title=f"Relatório do rebanho - {tipo}")
+        story = [
+            Paragraph("Controle de Gado - Relatório do Rebanho", estilos['Title']),
+            Paragraph(f"Gerado em {datetime.now().strftime('%d/%m/%Y %H:%M')}", estilos['Normal']),
+            Spacer(1, 12)
+        ]
+        for i, (titulo, conteudo) in enumerate(secoes):
+            if i:
+                story.append(PageBreak())
+            story += [Paragraph(titulo, estilos['Heading2']), Spacer(1, 6), conteudo]
+        doc.build(story)
+        os.replace(tmp, destino)
+
+        job.update({
+            'status': 'concluido',
+            'concluido_em': agora_iso(),
+            'tamanho_bytes': os.path.getsize(destino)
+        })
+    except Exception as e:
+        job.update({'status': 'erro', 'concluido_em': agora_iso(), 'erro': str(e)})
+
+    atual = ler_job(diretorio, job_id)
+    if atual and atual.get('status') == 'erro' and job['status'] == 'concluido':
+        # Passou do tempo limite e a API já respondeu erro: não volta a concluido
+        try:
+            os.remove(os.path.join(diretorio, f"{job_id}.pdf"))
+        except FileNotFoundError:
+            pass
+        return atual['status']
+    gravar_job(diretorio, job)
+    return job['status']
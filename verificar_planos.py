@@ -0,0 +1,199 @@
+"""
+Verificação de planos de query das views de relatório e das queries principais
+
+Roda EXPLAIN (FORMAT JSON) em cada view / query dos endpoints mais usados
+sobre um rebanho sintético grande e falha (exit 1) quando um plano:
+
+- faz Seq Scan numa tabela que deveria ser acessada por índice, ou
+- passa do orçamento de custo estimado ou de linhas devolvidas.
+
+Rode depois de qualquer alteração de schema (views, índices, scripts como
+fix_views_and_tables.sql) para garantir que nada voltou a varrer tabelas
+inteiras.
+
+Uso:
+    python verificar_planos.py                  # usa os dados existentes
+    python verificar_planos.py --gerar 20000    # garante um rebanho sintético de 20 mil animais
+    python verificar_planos.py --mostrar-planos
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import psycopg2
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'port': os.getenv('DB_PORT', '5432'),
+    'database': os.getenv('DB_NAME', 'controle_gado'),
+    'user': os.getenv('DB_USER', 'postgres'),
+    'password': os.getenv('DB_PASSWORD', 'postgres')
+}
+
+# Tabelas de histórico: crescem com anos de uso e nunca devem ser varridas
+# inteiras pelas queries do dia a dia
+HISTORICO = ('pesagens', 'sanidade', 'eventos_reprodutivos', 'movimentacoes')
+
+# nome, SQL (com %s), parâmetros, tabelas proibidas em Seq Scan,
+# custo máximo estimado, linhas máximas estimadas (None = sem limite)
+VERIFICACOES = [
+    # Views de relatório
+    ('vw_rebanho_ativo (página por cursor)',
+     "SELECT * FROM vw_rebanho_ativo WHERE status = %s AND brinco > %s ORDER BY brinco LIMIT %s",
+     ('ativo', 'SIM-001000', 101), HISTORICO + ('animais',), 500, 101),
+    ('vw_rebanho_ativo (por brinco)',
+     "SELECT * FROM vw_rebanho_ativo WHERE brinco = %s",
+     ('SIM-000042',), HISTORICO + ('animais',), 50, 1),
+    ('vw_performance_animais (top GMD)',
+     "SELECT * FROM vw_performance_animais ORDER BY gmd DESC LIMIT %s",
+     (50,), HISTORICO + ('animais', 'animais_pesagem_resumo'), 500, 50),
+    ('vw_aplicacoes_proximas (30 dias)',
+     "SELECT * FROM vw_aplicacoes_proximas WHERE proxima_aplicacao <= CURRENT_DATE + %s ORDER BY proxima_aplicacao",
+     (30,), HISTORICO + ('sanidade_agenda',), None, None),
+    ('v_proximos_eventos (30 dias)',
+     "SELECT * FROM v_proximos_eventos WHERE data_prevista <= CURRENT_DATE + %s ORDER BY data_prevista",
+     (30,), HISTORICO, None, None),
+    ('v_femeas_reprodutivas',
+     "SELECT * FROM v_femeas_reprodutivas ORDER BY brinco",
+     (), HISTORICO, None, None),
+    ('v_stats_reproducao',
+     "SELECT * FROM v_stats_reproducao",
+     (), HISTORICO, None, 1),
+
+    # Queries dos endpoints principais
+    ('verify_token (sessão por token)',
+     """SELECT s.*, u.nome, u.email, u.nivel_acesso FROM sessoes s
+        INNER JOIN usuarios u ON s.usuario_id = u.id
+        WHERE s.token = %s AND s.expires_at > NOW() AND u.ativo = TRUE""",
+     ('x' * 43,), (), 50, 1),
+    ('GET /api/animais/{id}',
+     """SELECT a.*, pr.ultimo_peso, pr.data_ultimo_peso FROM animais a
+        LEFT JOIN animais_pesagem_resumo pr ON pr.animal_id = a.id WHERE a.id = %s""",
+     (42,), ('animais', 'animais_pesagem_resumo'), 50, 1),
+    ('GET /api/pesagens/{animal_id}',
+     "SELECT * FROM pesagens WHERE animal_id = %s ORDER BY data_pesagem DESC",
+     (42,), HISTORICO, 200, 100),
+    ('GET /api/eventos-reprodutivos/{animal_id}',
+     "SELECT * FROM eventos_reprodutivos WHERE animal_id = %s ORDER BY data_evento DESC",
+     (42,), HISTORICO, 200, 100),
+    ('GET /api/relatorios/resumo',
+     "SELECT * FROM rebanho_resumo WHERE id = %s",
+     (1,), (), 50, 1),
+    ('GET /api/sanidade/proximas (30 dias + atrasadas)',
+     """SELECT g.*, a.brinco, a.lote FROM sanidade_agenda g
+        INNER JOIN animais a ON a.id = g.animal_id
+        WHERE g.proxima_aplicacao <= CURRENT_DATE + %s
+        ORDER BY g.proxima_aplicacao, a.brinco""",
+     (30,), HISTORICO + ('sanidade_agenda',), None, None),
+    ('plano de acasalamento (desfechos por touro)',
+     """SELECT ia.touro_id, COUNT(*) FROM eventos_reprodutivos e
+        CROSS JOIN LATERAL (
+            SELECT i.touro_id, i.data_evento FROM eventos_reprodutivos i
+            WHERE i.animal_id = e.animal_id AND i.tipo_evento = 'inseminacao'
+              AND i.data_evento < e.data_evento AND i.data_evento >= e.data_evento - %s
+            ORDER BY i.data_evento DESC LIMIT 1
+        ) ia
+        WHERE e.tipo_evento IN ('parto', 'aborto') AND ia.touro_id IS NOT NULL
+        GROUP BY ia.touro_id""",
+     (320,), HISTORICO, 50000, None),
+    ('GET /api/femeas-reprodutivas',
+     """SELECT f.*, r.data_ultima_cobertura, r.data_prevista_parto, r.data_ultimo_parto
+        FROM v_femeas_reprodutivas f
+        LEFT JOIN animais_reproducao_resumo r ON r.animal_id = f.id
+        ORDER BY f.brinco""",
+     (), HISTORICO, None, None),
+    ('GET /api/sync (página por cursor)',
+     """SELECT id, xid::text AS xid_texto, tabela, registro_id FROM sync_log
+        WHERE (xid, id) > (%s::text::xid8, %s::bigint)
+          AND xid < pg_snapshot_xmin(pg_current_snapshot())
+        ORDER BY xid, id LIMIT %s""",
+     (0, 0, 5001), ('sync_log',), None, 5001),
+]
+
+
+def _percorrer(plano):
+    """Todos os nós do plano (EXPLAIN FORMAT JSON), em profundidade"""
+    yield plano
+    for filho in plano.get('Plans', []):
+        yield from _percorrer(filho)
+
+
+def verificar(cur, nome, sql, params, proibidas, custo_max, linhas_max, mostrar):
+    cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+    resultado = cur.fetchone()[0]
+    if isinstance(resultado, str):
+        resultado = json.loads(resultado)
+    raiz = resultado[0]['Plan']
+
+    falhas = []
+    for no in _percorrer(raiz):
+        if no['Node Type'] == 'Seq Scan' and no.get('Relation Name') in proibidas:
+            falhas.append(f"Seq Scan em {no['Relation Name']}")
+    if custo_max is not None and raiz['Total Cost'] > custo_max:
+        falhas.append(f"custo {raiz['Total Cost']:.0f} > {custo_max}")
+    if linhas_max is not None and raiz['Plan Rows'] > linhas_max:
+        falhas.append(f"linhas estimadas {raiz['Plan Rows']} > {linhas_max}")
+
+    marca = '❌' if falhas else '✓'
+    print(f"{marca} {nome:<45} custo={raiz['Total Cost']:>10.1f} linhas={raiz['Plan Rows']:>7}"
+          + (f"  ← {'; '.join(falhas)}" if falhas else ''))
+    if mostrar or falhas:
+        cur.execute("EXPLAIN " + sql, params)
+        for linha in cur.fetchall():
+            print(f"      {linha[0]}")
+    return not falhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verifica regressões nos planos das views e queries principais")
+    parser.add_argument('--gerar', type=int, metavar='N',
+                        help="Garante N animais sintéticos (gerar_rebanho_sintetico.py) antes de verificar")
+    parser.add_argument('--minimo-animais', type=int, default=10000,
+                        help="Falha se o banco tiver menos animais que isso (padrão: 10000)")
+    parser.add_argument('--mostrar-planos', action='store_true', help="Imprime todos os planos")
+    args = parser.parse_args()
+
+    if args.gerar:
+        conn = psycopg2.connect(**DB_CONFIG)
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM animais WHERE brinco LIKE %s", ('SIM-%',))
+        existentes = cur.fetchone()[0]
+        conn.close()
+        if existentes < args.gerar:
+            gerador = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gerar_rebanho_sintetico.py')
+            subprocess.run([sys.executable, gerador, '--recriar', '--animais', str(args.gerar)], check=True)
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    conn.autocommit = True
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT COUNT(*) FROM animais")
+        total = cur.fetchone()[0]
+        if total < args.minimo_animais:
+            print(f"❌ Só {total} animais no banco; planos em tabelas pequenas não dizem nada. "
+                  f"Use --gerar {args.minimo_animais}")
+            return 1
+
+        for tabela in ('animais', 'animais_pesagem_resumo', 'sessoes', 'sync_log', 'sanidade_agenda',
+                       'animais_reproducao_resumo') + HISTORICO:
+            cur.execute(f"ANALYZE {tabela}")
+
+        print(f"Verificando planos com {total} animais...\n")
+        ok = True
+        for verificacao in VERIFICACOES:
+            ok = verificar(cur, *verificacao, args.mostrar_planos) and ok
+
+        print("\n✓ Nenhuma regressão de plano" if ok else "\n❌ Há planos fora do orçamento")
+        return 0 if ok else 1
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())